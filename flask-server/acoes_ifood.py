@@ -0,0 +1,192 @@
+# ===========================
+# IFOOD - DESPACHANTE DE AÇÕES (confirm, dispatch, ...)
+# ===========================
+# A rota /ifood/action deixava o handheld esperando o POST no iFood (até 20s)
+# e um toque duplo mandava a ação duas vezes. Agora:
+#   - enviar()  : aceita na hora, grava a ação numa FilaDuravel (chave =
+#                 order_id, então as ações de um pedido saem em ordem) e
+#                 atualiza pedidos.estado de forma otimista
+#   - coalescer : a mesma ação do mesmo pedido pendente (ou concluída há menos
+#                 de ACOES_JANELA_S) não é enfileirada de novo
+#   - workers   : ACOES_WORKERS threads enviam (concorrência limitada). Cada
+#                 lease faz UMA tentativa HTTP (tentativas=1) e a retentativa
+#                 é o backoff da fila; o lease dura mais que o pior caso dessa
+#                 tentativa (cliente.prazo_total(1)), então a mesma ação nunca
+#                 está com dois workers. 4xx é definitivo, vai para os mortos
+#                 e desfaz o estado otimista
+#   - notificar : hook (evento, dados) para o canal de socket do app
+import os
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from cache_ifood import CacheTTL
+from fila_duravel import FilaDuravel
+
+ACOES_WORKERS    = max(1, int(os.getenv("IFOOD_ACOES_WORKERS", "4")))
+ACOES_TENTATIVAS = int(os.getenv("IFOOD_ACOES_TENTATIVAS", "6"))
+ACOES_JANELA_S   = float(os.getenv("IFOOD_ACOES_JANELA", "30"))  # toque duplo após sucesso
+ACOES_VIS_S      = float(os.getenv("IFOOD_ACOES_VISIBILIDADE", "120"))  # piso; ver _visibilidade()
+ACOES_FOLGA_S    = 30.0  # lease além do prazo da tentativa (gravar resultado, relógio)
+
+TABELA_ACOES  = "ifood_fila_acoes"
+TABELA_MORTAS = "ifood_acoes_mortas"
+EVENTO_SOCKET = "ifood_acao"
+
+def _fila(db, visibilidade: float = ACOES_VIS_S) -> FilaDuravel:
+    return FilaDuravel(db, TABELA_ACOES, TABELA_MORTAS, visibilidade=visibilidade, tentativas_max=ACOES_TENTATIVAS)
+
+def _visibilidade(cliente) -> float:
+    "Lease de uma ação: maior que o pior caso de uma tentativa no cliente (timeout, 401 + reenvio)."
+    prazo = getattr(cliente, "prazo_total", None)
+    return max(ACOES_VIS_S, prazo(1) + ACOES_FOLGA_S) if prazo else ACOES_VIS_S
+
+def ensure_schema(db):
+    _fila(db).ensure_schema()
+
+def _definitivo(status_code: int) -> bool:
+    "4xx (transição inválida, pedido inexistente...) não adianta repetir; 408/429 sim."
+    return 400 <= status_code < 500 and status_code not in (408, 429)
+
+class DespachanteAcoes:
+    def __init__(self, cliente, db, atualizar_estado: Callable[[str, str], Any],
+                 ler_estado: Callable[[str], Optional[str]],
+                 notificar: Optional[Callable[[str, dict], None]] = None, workers: int = ACOES_WORKERS):
+        self.cliente = cliente
+        self.db = db
+        self.atualizar_estado = atualizar_estado
+        self.ler_estado = ler_estado
+        self.notificar = notificar
+        self.workers = workers
+        self.fila = _fila(db, _visibilidade(cliente))
+        self._lock = threading.Lock()
+        self._pendentes: Dict[Tuple[str, str], int] = {}  # (order_id, action) -> id na fila
+        self._recentes = CacheTTL(ACOES_JANELA_S, 5000, "acoes_recentes")
+        self._parar = threading.Event()
+        self._threads = []
+        self.stats = {"aceitas": 0, "coalescidas": 0, "enviadas": 0, "ok": 0, "retentativas": 0, "falhas": 0}
+
+    # ---------------- Entrada ----------------
+    def enviar(self, order_id: str, action: str, body: Optional[dict] = None,
+               estado: Optional[str] = None) -> Dict[str, Any]:
+        "Enfileira a ação e devolve na hora: {status: pendente|coalescida, id}."
+        chave = (order_id, action)
+        with self._lock:
+            mid = self._pendentes.get(chave)
+            if mid is None and self._recentes.obter(chave) is not None:
+                mid = 0  # acabou de ser enviada com sucesso
+            if mid is not None:
+                self.stats["coalescidas"] += 1
+                return {"status": "coalescida", "id": mid}
+            anterior = self.ler_estado(order_id) if estado else None
+            payload = {"order_id": order_id, "action": action, "body": body or {},
+                       "estado": estado, "estado_anterior": anterior}
+            # estado e aviso ANTES de publicar: um worker pode pegar a ação na
+            # hora, e a falha dele precisa achar o estado otimista para desfazer
+            if estado:
+                try:
+                    self.atualizar_estado(order_id, estado)  # otimista; desfeito se o iFood recusar
+                except Exception as e:
+                    print("[ifood][acoes] falha ao atualizar estado local:", e)
+            self._avisar(payload, "pendente")
+            try:
+                mid = self.fila.publicar(order_id, payload)
+            except Exception:
+                self._desfazer_estado(payload)
+                raise
+            self._pendentes[chave] = mid
+            self.stats["aceitas"] += 1
+        return {"status": "pendente", "id": mid}
+
+    # ---------------- Envio ----------------
+    def _executar(self, msg):
+        p = msg.payload
+        self.stats["enviadas"] += 1
+        self._avisar(p, "enviando", id=msg.id, tentativa=msg.tentativas + 1)
+        try:
+            # uma tentativa por lease: quem repete é a fila, com backoff
+            resp = self.cliente.post(f"/order/v1.0/orders/{p['order_id']}/{p['action']}", json_body=p["body"],
+                                     tentativas=1, prazo=self.fila.visibilidade - ACOES_FOLGA_S)
+            if resp.ok:
+                self.fila.confirmar([msg])
+                self._concluir(p, msg.id, "ok", status_code=resp.status_code)
+                return
+            erro = f"HTTP {resp.status_code}: {(resp.text or '')[:200]}"
+            if _definitivo(resp.status_code):
+                self.fila.falhar(msg, erro, definitivo=True)
+                self._concluir(p, msg.id, "erro", status_code=resp.status_code, erro=erro)
+                return
+        except Exception as e:
+            erro = str(e)
+        if self.fila.falhar(msg, erro):
+            self._concluir(p, msg.id, "erro", erro=erro)
+        else:
+            self.stats["retentativas"] += 1
+            self._avisar(p, "retentando", id=msg.id, tentativa=msg.tentativas + 1, erro=erro)
+
+    def _concluir(self, p: dict, mid: int, status: str, **extra):
+        chave = (p["order_id"], p["action"])
+        with self._lock:
+            self._pendentes.pop(chave, None)
+            if status == "ok":
+                self.stats["ok"] += 1
+                self._recentes.gravar(chave, mid)
+            else:
+                self.stats["falhas"] += 1
+        if status != "ok":
+            print(f"[ifood][acoes] {p['action']} {p['order_id']} falhou: {extra.get('erro')}")
+            self._desfazer_estado(p)
+        self._avisar(p, status, id=mid, **extra)
+
+    def _desfazer_estado(self, p: dict):
+        "Volta ao estado anterior, a menos que outra coisa já tenha mudado o pedido."
+        if not p.get("estado") or p.get("estado_anterior") is None:
+            return
+        try:
+            if self.ler_estado(p["order_id"]) == p["estado"]:
+                self.atualizar_estado(p["order_id"], p["estado_anterior"])
+        except Exception as e:
+            print("[ifood][acoes] falha ao desfazer estado local:", e)
+
+    def _avisar(self, p: dict, status: str, **extra):
+        if self.notificar is None:
+            return
+        try:
+            self.notificar(EVENTO_SOCKET, {"order_id": p["order_id"], "action": p["action"],
+                                           "status": status, "estado": p.get("estado"), **extra})
+        except Exception as e:
+            print("[ifood][acoes] falha ao notificar:", e)
+
+    def _loop(self):
+        while not self._parar.is_set():
+            msgs = self.fila.reservar(1)  # uma por worker: o limite de concorrência é o nº de workers
+            if not msgs:
+                self.fila.esperar(1.0)
+                continue
+            self._executar(msgs[0])
+
+    # ---------------- Ciclo de vida ----------------
+    def iniciar(self):
+        # ações que ficaram na fila (restart) continuam coalescendo
+        with self._lock:
+            for r in self.db.execute(f"SELECT id, payload FROM {TABELA_ACOES}"):
+                p = json.loads(r["payload"])
+                self._pendentes[(p["order_id"], p["action"])] = r["id"]
+        self._parar.clear()
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for i in range(len(self._threads), self.workers):
+            t = threading.Thread(target=self._loop, name=f"ifood-acoes-{i}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def parar(self, timeout: float = 10.0):
+        self._parar.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def status(self, order_id: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            pendentes = [{"order_id": o, "action": a, "id": i} for (o, a), i in self._pendentes.items()
+                         if order_id is None or o == order_id]
+        return {**self.stats, "workers": sum(1 for t in self._threads if t.is_alive()),
+                "pendentes": pendentes, "fila": self.fila.status()}
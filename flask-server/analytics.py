@@ -0,0 +1,288 @@
+# ===========================
+# ANALYTICS - SÉRIES VETORIZADAS + GRÁFICOS SOB DEMANDA
+# ===========================
+# A tela de Analytics dependia de um static/grafico.png regravado pelo
+# servidor com pandas/matplotlib a cada consulta: lento, um arquivo só para
+# todos (dois gerentes ao mesmo tempo sobrescreviam o gráfico um do outro).
+# Agora:
+#   - calcular()  : uma leitura de pedidos_todos e uma de pagamentos no
+#                   intervalo; faturamento por hora/dia, top itens, mix de
+#                   opções (pedidos.opcoes; cada texto distinto é lido uma vez)
+#                   e formas de pagamento saem de groupby do pandas, em listas
+#                   colunares ({"hora": [...], "valor": [...]})
+#   - Analytics   : cache por (de, ate, carrinho) validado pela versão dos
+#                   agregados de faturamento do intervalo (faturamento.py): um
+#                   pedido/pagamento novo no intervalo invalida, leitura
+#                   repetida custa um SELECT O(dias). Consultas simultâneas da
+#                   mesma chave calculam uma vez só
+#   - grafico()   : PNG renderizado em memória num pool de processos, só
+#                   quando pedido, e guardado no mesmo cache; nada vai para
+#                   static/
+# Filtro de carrinho: pedidos com remetente 'Carrinho:<nome>'; pagamentos das
+# comandas (dia, comanda) que têm pedidos do carrinho.
+#
+# Uso no servidor do socket:
+#   analytics = Analytics(db)
+#   @socketio.on('analytics')
+#   def on_analytics(data):
+#       emit('analytics_enviar', analytics.resposta_socket(data))
+# e via HTTP: GET /analytics?de=&ate=&carrinho= e /analytics/grafico/<tipo>.png
+import os
+import io
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import faturamento
+import particao_pedidos
+from cache_ifood import CacheTTL
+from opcoes_canonicas import _load_json_relaxed
+
+ANALYTICS_TTL       = float(os.getenv("ANALYTICS_TTL", "300"))    # teto, para o que a versão não cobre
+ANALYTICS_CACHE_MAX = int(os.getenv("ANALYTICS_CACHE_MAX", "256"))
+ANALYTICS_PROCESSOS = int(os.getenv("ANALYTICS_PROCESSOS", "2"))  # 0 = renderiza na própria thread
+ANALYTICS_TIMEOUT   = float(os.getenv("ANALYTICS_TIMEOUT", "30"))
+ANALYTICS_TOP       = int(os.getenv("ANALYTICS_TOP", "10"))
+PREFIXO_CARRINHO    = "Carrinho:"
+
+GRAFICOS = ("hora", "dias", "itens", "opcoes", "pagamentos")
+
+# ---------------- Cálculo (pandas) ----------------
+def _pares_opcoes(texto: str) -> List[Tuple[str, str]]:
+    "[(grupo, opção)] escolhidos num pedidos.opcoes; texto inválido não conta."
+    dados, _ = _load_json_relaxed(texto)
+    if not isinstance(dados, list):
+        return []
+    return [(str(g.get("nome") or ""), str(o.get("nome") or ""))
+            for g in dados if isinstance(g, dict)
+            for o in (g.get("options") or []) if isinstance(o, dict)]
+
+def _colunar(df, colunas: List[str]) -> Dict[str, list]:
+    return {c: df[c].tolist() for c in colunas}
+
+def calcular(db, de: Optional[str], ate: Optional[str], carrinho: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Séries do intervalo [de, ate] (dias AAAA-MM-DD, inclusive) para um
+    carrinho (None/'' = todos). Pedidos cancelados ficam de fora, como nos
+    agregados de faturamento.
+    """
+    import pandas as pd
+
+    conn = db.conexao()
+    onde, args = faturamento._filtro(de, ate)
+    sql = (f"SELECT dia, inicio, pedido, quantidade, preco, estado, comanda, opcoes "
+           f"FROM {particao_pedidos.VIEW_TODOS} WHERE {onde}")
+    if carrinho:
+        sql += " AND remetente = ?"
+        args = args + [PREFIXO_CARRINHO + carrinho]
+    todos = pd.DataFrame(conn.execute(sql, args).fetchall(),
+                         columns=["dia", "inicio", "pedido", "quantidade", "preco", "estado", "comanda", "opcoes"])
+    ped = todos[~todos["estado"].isin(faturamento.FATURAMENTO_CANCELADOS)].copy()
+    ped["quantidade"] = pd.to_numeric(ped["quantidade"], errors="coerce").fillna(0)
+    ped["preco"] = pd.to_numeric(ped["preco"], errors="coerce").fillna(0)
+    ped["hora"] = (pd.to_numeric(ped["inicio"].astype("string").str.extract(r"^(\d{1,2}):", expand=False),
+                                 errors="coerce")
+                   .fillna(faturamento.HORA_DESCONHECIDA).astype(int))
+
+    por_hora = (ped.groupby("hora").agg(valor=("preco", "sum"), itens=("quantidade", "sum"))
+                   .reset_index().round({"valor": 2}))
+    por_dia = (ped.groupby("dia").agg(valor=("preco", "sum"), itens=("quantidade", "sum"))
+                  .reset_index().round({"valor": 2}))
+    itens = (ped.groupby("pedido").agg(quantidade=("quantidade", "sum"), valor=("preco", "sum"))
+                .reset_index().sort_values(["valor", "quantidade"], ascending=False)
+                .head(ANALYTICS_TOP).round({"valor": 2}))
+
+    # mix de opções: cada texto distinto é lido uma vez e explodido em (grupo, opção)
+    com_opcoes = ped.loc[ped["opcoes"].astype("string").str.startswith("[").fillna(False)
+                         & (ped["opcoes"] != "[]"), ["opcoes", "quantidade"]]
+    pares = {t: _pares_opcoes(t) for t in com_opcoes["opcoes"].unique()}
+    mix = com_opcoes.assign(par=com_opcoes["opcoes"].map(pares)).explode("par").dropna(subset=["par"])
+    mix = pd.DataFrame({"grupo": [p[0] for p in mix["par"]], "opcao": [p[1] for p in mix["par"]],
+                        "quantidade": mix["quantidade"].to_numpy()})
+    mix = (mix.groupby(["grupo", "opcao"]).agg(quantidade=("quantidade", "sum")).reset_index()
+              .sort_values("quantidade", ascending=False))
+
+    onde, args = faturamento._filtro(de, ate)
+    pag = pd.DataFrame(conn.execute(f"SELECT dia, comanda, forma_de_pagamento, tipo, valor FROM pagamentos "
+                                    f"WHERE {onde}", args).fetchall(),
+                       columns=["dia", "comanda", "forma", "tipo", "valor"])
+    if carrinho:
+        pag = pag.merge(todos[["dia", "comanda"]].drop_duplicates(), on=["dia", "comanda"])
+    pag["valor"] = pd.to_numeric(pag["valor"], errors="coerce").fillna(0)
+    pag["forma"] = pag["forma"].fillna("")
+    pag["tipo"] = pag["tipo"].fillna("")
+    recebido = pag[~pag["tipo"].isin(faturamento.FATURAMENTO_TIPOS_FORA)]
+    formas = (recebido.groupby("forma").agg(valor=("valor", "sum"), pagamentos=("valor", "size"))
+                      .reset_index().sort_values("valor", ascending=False).round({"valor": 2}))
+    tipos = pag.groupby("tipo")["valor"].sum().round(2)
+
+    return {
+        "de": de, "ate": ate, "carrinho": carrinho or None,
+        "total": {"previsto": round(float(ped["preco"].sum()), 2), "recebido": round(float(recebido["valor"].sum()), 2),
+                  "itens": int(ped["quantidade"].sum()),
+                  "comandas": int(ped[["dia", "comanda"]].drop_duplicates().shape[0])},
+        "hora": _colunar(por_hora, ["hora", "valor", "itens"]),
+        "dias": _colunar(por_dia, ["dia", "valor", "itens"]),
+        "itens": _colunar(itens, ["pedido", "quantidade", "valor"]),
+        "opcoes": _colunar(mix, ["grupo", "opcao", "quantidade"]),
+        "pagamentos": _colunar(formas, ["forma", "valor", "pagamentos"]),
+        "tipos": {str(k): float(v) for k, v in tipos.items()},
+    }
+
+# ---------------- Gráficos (pool de processos) ----------------
+def _iniciar_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401  (import caro: uma vez por processo)
+
+def renderizar(tipo: str, serie: Dict[str, list], titulo: str) -> bytes:
+    "PNG de uma série de calcular(). Roda no worker; só recebe a série (pequena)."
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 4.5), dpi=100)
+    try:
+        if tipo == "hora":
+            ax.bar([str(h) if h >= 0 else "?" for h in serie["hora"]], serie["valor"], color="#3bb273")
+            ax.set_xlabel("hora")
+            ax.set_ylabel("R$")
+        elif tipo == "dias":
+            ax.plot(serie["dia"], serie["valor"], marker="o", color="#3bb273")
+            ax.set_ylabel("R$")
+            ax.tick_params(axis="x", labelrotation=45)
+        elif tipo == "itens":
+            ax.barh(serie["pedido"][::-1], serie["valor"][::-1], color="#3bb273")
+            ax.set_xlabel("R$")
+        elif tipo == "opcoes":
+            n = ANALYTICS_TOP
+            rotulos = [f"{g}: {o}" for g, o in zip(serie["grupo"][:n], serie["opcao"][:n])]
+            ax.barh(rotulos[::-1], serie["quantidade"][:n][::-1], color="#3b82f6")
+            ax.set_xlabel("quantidade")
+        elif tipo == "pagamentos":
+            if any(serie["valor"]):
+                ax.pie(serie["valor"], labels=[f or "—" for f in serie["forma"]], autopct="%1.0f%%")
+            ax.axis("equal")
+        else:
+            raise ValueError(f"gráfico desconhecido: {tipo!r}")
+        ax.set_title(titulo)
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png")
+        return buf.getvalue()
+    finally:
+        plt.close(fig)
+
+# ---------------- Cache por (intervalo, carrinho) ----------------
+def versao(db, de: Optional[str], ate: Optional[str]) -> Optional[str]:
+    """
+    Impressão digital do intervalo pelos agregados de faturamento (O(dias)).
+    None se os agregados não estão instalados: vale só o TTL.
+    """
+    onde, args = faturamento._filtro(de, ate)
+    try:
+        r = db.execute(f"SELECT COUNT(*) AS n, TOTAL(faturamento) AS f, TOTAL(faturamento_previsto) AS p, "
+                       f"TOTAL(total_pedidos) AS t FROM {faturamento.TABELA_DIA} WHERE {onde}", *args)[0]
+    except Exception:
+        return None
+    return f"{r['n']}:{r['f']:.2f}:{r['p']:.2f}:{r['t']:.0f}"
+
+class Analytics:
+    def __init__(self, db, ttl: float = ANALYTICS_TTL, max_itens: int = ANALYTICS_CACHE_MAX,
+                 processos: int = ANALYTICS_PROCESSOS):
+        self.db = db
+        self.processos = processos
+        self.cache = CacheTTL(ttl, max_itens, "analytics")
+        self._lock = threading.Lock()
+        # chave -> [lock, threads usando]; sai do dict quando a última solta
+        self._calculando: Dict[tuple, list] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _entrar(self, chave: tuple) -> threading.Lock:
+        with self._lock:
+            t = self._calculando.get(chave)
+            if t is None:
+                t = self._calculando[chave] = [threading.Lock(), 0]
+            t[1] += 1
+            return t[0]
+
+    def _sair(self, chave: tuple):
+        # só a última thread remove: quem ainda espera no lock continua com o
+        # mesmo objeto, e quem chega depois não cria um segundo lock em paralelo
+        with self._lock:
+            t = self._calculando[chave]
+            t[1] -= 1
+            if not t[1]:
+                del self._calculando[chave]
+
+    def _obter(self, chave: tuple, v: Optional[str], produzir):
+        e = self.cache.obter_entrada(chave)
+        if e is not None and not e.vencida and e.etag == v:
+            return e.valor
+        trava = self._entrar(chave)
+        try:
+            with trava:  # dois gerentes na mesma tela: um calcula, o outro reaproveita
+                e = self.cache.obter_entrada(chave)
+                if e is not None and not e.vencida and e.etag == v:
+                    return e.valor
+                valor = produzir()
+                self.cache.gravar(chave, valor, etag=v)
+                return valor
+        finally:
+            self._sair(chave)
+
+    def series(self, de: Optional[str], ate: Optional[str], carrinho: Optional[str] = None) -> Dict[str, Any]:
+        "Payload JSON do intervalo (com a versão usada), do cache quando possível."
+        carrinho = carrinho or None
+        v = versao(self.db, de, ate)
+        dados = self._obter(("series", de, ate, carrinho), v, lambda: calcular(self.db, de, ate, carrinho))
+        return {**dados, "versao": v}
+
+    def grafico(self, tipo: str, de: Optional[str], ate: Optional[str], carrinho: Optional[str] = None) -> bytes:
+        "PNG do gráfico `tipo` (GRAFICOS), renderizado no pool só se não estiver no cache."
+        if tipo not in GRAFICOS:
+            raise ValueError(f"gráfico desconhecido: {tipo!r} (use {', '.join(GRAFICOS)})")
+        dados = self.series(de, ate, carrinho)
+        titulo = f"{tipo} | {de or '...'} a {ate or '...'}" + (f" | {carrinho}" if carrinho else "")
+
+        def _render():
+            if self.processos <= 0:
+                return renderizar(tipo, dados[tipo], titulo)
+            return self._executor().submit(renderizar, tipo, dados[tipo], titulo).result(timeout=ANALYTICS_TIMEOUT)
+
+        return self._obter(("grafico", tipo, de, ate, carrinho or None), dados["versao"], _render)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: o servidor tem threads (workers, token, ações); fork com lock
+                # tomado por outra thread trava o filho
+                self._pool = ProcessPoolExecutor(self.processos, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_iniciar_worker)
+            return self._pool
+
+    def resposta_socket(self, data: Optional[dict]) -> Dict[str, Any]:
+        """
+        Aceita o payload da AnalyticsScreen: {date_from, date_to, carrinho}
+        (faturamento_range) ou {change, carrinho} (faturamento: dia de serviço
+        atual + change dias).
+        """
+        data = data or {}
+        de, ate = data.get("date_from"), data.get("date_to")
+        if not de and not ate:
+            dia = date.fromisoformat(particao_pedidos.dia_de_servico())
+            de = ate = (dia + timedelta(days=int(data.get("change") or 0))).isoformat()
+        elif de and ate and de > ate:
+            de, ate = ate, de
+        return self.series(de, ate, data.get("carrinho"))
+
+    def parar(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> Dict[str, Any]:
+        return {"cache": self.cache.status(), "processos": self.processos, "pool_ativo": self._pool is not None}
@@ -0,0 +1,189 @@
+# ===========================
+# BANCO - acesso compartilhado ao SQLite (dados.db)
+# ===========================
+# Todos os scripts do flask-server abrem o banco por aqui. Cada thread tem sua
+# própria conexão (nada de conexão única disputada entre polling, workers e
+# sockets), já configurada com WAL, busy_timeout e cache. O sqlite3 mantém um
+# cache de statements preparados por conexão (cached_statements), então a
+# mesma SQL executada de novo não é recompilada.
+#
+# Interface compatível com cs50.SQL: db.execute(sql, *args) (ou **kwargs para
+# parâmetros nomeados) devolve
+#   SELECT/PRAGMA  -> lista de dicts
+#   INSERT/REPLACE -> lastrowid (None se nada foi inserido, ex.: OR IGNORE)
+#   UPDATE/DELETE  -> linhas afetadas
+#   outros         -> True
+# e IntegrityError vira ValueError, como no cs50. Ao contrário do cs50, não há
+# sqlparse nem compilação SQLAlchemy por chamada: o tipo do statement é
+# classificado uma vez por texto de SQL e o sqlite3 reaproveita o statement
+# preparado.
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Sequence
+
+BUSY_TIMEOUT_MS  = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+MMAP_SIZE        = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE_KIB   = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "20000"))
+STATEMENT_CACHE  = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),           # leitores não bloqueiam o escritor
+    ("busy_timeout", BUSY_TIMEOUT_MS), # espera o lock em vez de 'database is locked'
+    ("synchronous", "NORMAL"),         # seguro em WAL; fsync só no checkpoint
+    ("mmap_size", MMAP_SIZE),
+    ("cache_size", -CACHE_SIZE_KIB),   # negativo = KiB
+    ("temp_store", "MEMORY"),
+    ("foreign_keys", "ON"),            # mesmo comportamento do cs50.SQL
+)
+
+# ---------------- Classificação de statements ----------------
+_LINHAS, _LASTROWID, _ROWCOUNT, _OK = range(4)
+_TIPOS_MAX = 4096
+_tipos: Dict[str, int] = {}
+
+def _tipo(sql: str) -> int:
+    t = _tipos.get(sql)
+    if t is None:
+        partes = sql.lstrip().split(None, 1)
+        verbo = partes[0].upper() if partes else ""
+        if verbo in ("INSERT", "REPLACE"):
+            t = _LASTROWID
+        elif verbo in ("UPDATE", "DELETE"):
+            t = _ROWCOUNT
+        elif verbo in ("SELECT", "PRAGMA", "WITH", "VALUES", "EXPLAIN"):
+            t = _LINHAS
+        else:
+            t = _OK
+        if len(_tipos) < _TIPOS_MAX:
+            _tipos[sql] = t
+    return t
+
+class _Guarda:
+    "Fica no threading.local ao lado da conexão; quando a thread termina ela é coletada e o finalize fecha a conexão."
+    __slots__ = ("__weakref__",)
+
+def _fechar_conexao(conn: sqlite3.Connection, conexoes: set, lock: threading.Lock):
+    with lock:
+        conexoes.discard(conn)
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+class Banco:
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._local = threading.local()
+        # só as conexões de threads vivas, para fechar() no encerramento: quando a
+        # thread termina (o servidor Flask abre uma por request) o finalize da
+        # _Guarda tira a conexão daqui e a fecha, junto com os fds do WAL/shm.
+        self._conexoes: set = set()
+        self._lock = threading.Lock()
+
+    # ---------------- Conexão por thread ----------------
+    def conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.caminho,
+                timeout=BUSY_TIMEOUT_MS / 1000.0,
+                isolation_level=None,          # autocommit; transações explícitas via transacao()
+                check_same_thread=False,       # fechar() e o fim da thread fecham de outra thread
+                cached_statements=STATEMENT_CACHE,
+            )
+            for nome, valor in PRAGMAS:
+                conn.execute(f"PRAGMA {nome}={valor}")
+            guarda = _Guarda()
+            weakref.finalize(guarda, _fechar_conexao, conn, self._conexoes, self._lock).atexit = False
+            with self._lock:
+                self._conexoes.add(conn)
+            self._local.conn = conn
+            self._local.guarda = guarda
+        return conn
+
+    def fechar(self):
+        "Fecha as conexões de todas as threads (ex.: no encerramento do processo)."
+        with self._lock:
+            conexoes = list(self._conexoes)
+        for conn in conexoes:
+            _fechar_conexao(conn, self._conexoes, self._lock)
+        self._local = threading.local()
+
+    # ---------------- Execução ----------------
+    def execute(self, sql: str, *args: Any, **kwargs: Any):
+        conn = getattr(self._local, "conn", None) or self.conexao()
+        try:
+            cur = conn.execute(sql, kwargs if kwargs else args)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(str(e)) from e
+
+        desc = cur.description
+        if desc is not None:
+            rows = cur.fetchall()
+            if not rows:
+                return []
+            cols = [d[0] for d in desc]
+            return [dict(zip(cols, row)) for row in rows]
+
+        t = _tipo(sql)
+        if t == _LASTROWID:
+            return cur.lastrowid if cur.rowcount > 0 else None
+        if t == _ROWCOUNT:
+            return cur.rowcount
+        if t == _LINHAS:
+            return []
+        return True
+
+    def executemany(self, sql: str, linhas: Iterable[Sequence[Any]]) -> int:
+        conn = getattr(self._local, "conn", None) or self.conexao()
+        try:
+            return conn.executemany(sql, linhas).rowcount
+        except sqlite3.IntegrityError as e:
+            raise ValueError(str(e)) from e
+
+    @contextmanager
+    def transacao(self):
+        """
+        BEGIN IMMEDIATE ... COMMIT (ROLLBACK em exceção). Pega o lock de escrita
+        no início, então o busy_timeout vale para a transação inteira. Aninhada
+        vira SAVEPOINT.
+        """
+        conn = self.conexao()
+        if conn.in_transaction:
+            nome = f"sp_{threading.get_ident()}_{id(conn)}_{getattr(self._local, 'nivel', 0)}"
+            self._local.nivel = getattr(self._local, "nivel", 0) + 1
+            conn.execute(f"SAVEPOINT {nome}")
+            try:
+                yield self
+            except Exception:
+                conn.execute(f"ROLLBACK TO {nome}")
+                conn.execute(f"RELEASE {nome}")
+                raise
+            finally:
+                self._local.nivel -= 1
+            conn.execute(f"RELEASE {nome}")
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+# Um Banco por arquivo no processo: módulos diferentes que abrem o mesmo
+# dados.db compartilham as conexões por thread.
+_bancos: Dict[str, Banco] = {}
+_bancos_lock = threading.Lock()
+
+def conectar(caminho: str) -> Banco:
+    chave = os.path.abspath(caminho)
+    with _bancos_lock:
+        banco = _bancos.get(chave)
+        if banco is None:
+            banco = _bancos[chave] = Banco(caminho)
+        return banco
@@ -0,0 +1,156 @@
+# ===========================
+# Benchmark: analytics (loop em Python + PNG em static/ x analytics.py)
+#   python benchmarks/bench_analytics.py [dias] [linhas_por_dia] [janela_dias]
+# ===========================
+# Usa o histórico sintético do bench_faturamento (com carrinhos e opções
+# copiadas de data/dados.db) e mede, para a última `janela_dias`:
+#   - legado    : soma linha a linha sobre db.execute (dicts) + um gráfico
+#                 regravado em static/grafico.png a cada consulta
+#   - séries    : calcular() frio (pandas) e Analytics.series() com cache
+#   - gráfico   : PNG frio no pool de processos e repetido (cache)
+#   - concorrência: 8 threads pedindo a mesma tela => quantos cálculos
+# e confere que o legado e o pandas dão os mesmos números.
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import analytics
+import faturamento
+import particao_pedidos
+from banco import Banco
+from bench_faturamento import ORIGEM, _gerar
+
+def _enfeitar(caminho: str):
+    "Carrinhos e opções reais nas linhas sintéticas."
+    modelos = [r[0] for r in sqlite3.connect(ORIGEM).execute(
+        "SELECT DISTINCT opcoes FROM pedidos WHERE opcoes LIKE '[%' AND opcoes != '[]'")]
+    carrinhos = [r[0] for r in sqlite3.connect(ORIGEM).execute(
+        "SELECT DISTINCT remetente FROM pedidos WHERE remetente LIKE 'Carrinho:%'")] or ["Carrinho:NossoPoint"]
+    rnd = random.Random(2)
+    conn = sqlite3.connect(caminho)
+    ids = [r[0] for r in conn.execute("SELECT id FROM pedidos")]
+    conn.executemany("UPDATE pedidos SET remetente = ?, comanda = ?, opcoes = ? WHERE id = ?",
+                     ((rnd.choice(carrinhos), str(rnd.randint(1, 60)),
+                       rnd.choice(modelos) if modelos and rnd.random() < 0.3 else "[]", i) for i in ids))
+    conn.execute("UPDATE pagamentos SET comanda = abs(random() % 60) + 1")
+    conn.commit()
+    conn.close()
+    return carrinhos[0][len(analytics.PREFIXO_CARRINHO):]
+
+def _legado(db, de: str, ate: str, carrinho: str, png: str) -> dict:
+    "O caminho antigo: dicts do db.execute somados em Python e um PNG no disco por consulta."
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from opcoes_canonicas import _load_json_relaxed
+
+    hora, itens, mix, formas = defaultdict(float), defaultdict(float), defaultdict(float), defaultdict(float)
+    comandas = set()
+    for r in db.execute(f"SELECT * FROM {particao_pedidos.VIEW_TODOS} WHERE dia BETWEEN ? AND ? AND remetente = ?",
+                        de, ate, analytics.PREFIXO_CARRINHO + carrinho):
+        comandas.add((r["dia"], r["comanda"]))
+        if r["estado"] in faturamento.FATURAMENTO_CANCELADOS:
+            continue
+        h = int(r["inicio"].split(":")[0]) if r["inicio"] and ":" in r["inicio"] else -1
+        hora[h] += r["preco"] or 0
+        itens[r["pedido"]] += r["preco"] or 0
+        dados, _ = _load_json_relaxed(r["opcoes"])
+        for g in dados or []:
+            for o in g.get("options") or []:
+                mix[(g.get("nome"), o.get("nome"))] += r["quantidade"] or 0
+    for r in db.execute("SELECT * FROM pagamentos WHERE dia BETWEEN ? AND ?", de, ate):
+        if (r["dia"], r["comanda"]) in comandas and (r["tipo"] or "") not in faturamento.FATURAMENTO_TIPOS_FORA:
+            formas[r["forma_de_pagamento"] or ""] += r["valor"] or 0
+    fig, ax = plt.subplots(figsize=(8, 4.5), dpi=100)
+    ax.bar([str(h) for h in sorted(hora)], [hora[h] for h in sorted(hora)])
+    fig.savefig(png)
+    plt.close(fig)
+    return {"hora": hora, "itens": itens, "mix": mix, "formas": formas}
+
+def _conferir(leg: dict, novo: dict) -> int:
+    "Quantos valores diferem entre o legado e o pandas."
+    difs = 0
+    par = [(dict(zip(novo["hora"]["hora"], novo["hora"]["valor"])), leg["hora"]),
+           (dict(zip(novo["pagamentos"]["forma"], novo["pagamentos"]["valor"])), leg["formas"]),
+           (dict(zip(zip(novo["opcoes"]["grupo"], novo["opcoes"]["opcao"]), novo["opcoes"]["quantidade"])), leg["mix"])]
+    for a, b in par:
+        difs += sum(abs(a.get(k, 0) - b.get(k, 0)) > 0.01 for k in set(a) | set(b))
+    top = sorted(leg["itens"].items(), key=lambda kv: -kv[1])[:analytics.ANALYTICS_TOP]
+    difs += sum(abs(v - round(leg["itens"][k], 2)) > 0.01 for k, v in zip(novo["itens"]["pedido"], novo["itens"]["valor"]))
+    difs += abs(sum(v for _, v in top) - sum(novo["itens"]["valor"])) > 0.05
+    return difs
+
+def main():
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    por_dia = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    janela = int(sys.argv[3]) if len(sys.argv) > 3 else 90
+    pasta = tempfile.mkdtemp(prefix="bench_analytics_")
+    caminho = os.path.join(pasta, "dados.db")
+    ultimo = _gerar(caminho, dias, por_dia)
+    carrinho = _enfeitar(caminho)
+    db = Banco(caminho)
+    faturamento.instalar(db)
+    de = (date.fromisoformat(ultimo) - timedelta(days=janela - 1)).isoformat()
+    print(f"{dias * por_dia} pedidos | janela {de}..{ultimo} | carrinho {carrinho!r}")
+
+    _legado(db, de, ultimo, carrinho, os.path.join(pasta, "grafico.png"))  # import do matplotlib fora da conta
+    t0 = time.perf_counter()
+    leg = _legado(db, de, ultimo, carrinho, os.path.join(pasta, "grafico.png"))
+    t_leg = time.perf_counter() - t0
+    print(f"  legado (loop + PNG em disco)   : {t_leg * 1000:8.1f}ms por consulta")
+
+    t0 = time.perf_counter()
+    novo = analytics.calcular(db, de, ultimo, carrinho)
+    t_calc = time.perf_counter() - t0
+    print(f"  calcular() frio (pandas)       : {t_calc * 1000:8.1f}ms  ({t_leg / t_calc:.1f}x)  "
+          f"{_conferir(leg, novo)} diferença(s) com o legado")
+
+    a = analytics.Analytics(db)
+    a.series(de, ultimo, carrinho)
+    t0 = time.perf_counter()
+    for _ in range(100):
+        a.series(de, ultimo, carrinho)
+    t_cache = (time.perf_counter() - t0) / 100
+    print(f"  series() com cache             : {t_cache * 1000:8.3f}ms  ({t_leg / t_cache:.0f}x)")
+
+    t0 = time.perf_counter()
+    png = a.grafico("hora", de, ultimo, carrinho)
+    t_png = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    a.grafico("itens", de, ultimo, carrinho)
+    t_png2 = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    a.grafico("hora", de, ultimo, carrinho)
+    t_png_cache = time.perf_counter() - t0
+    print(f"  gráfico no pool                : {t_png * 1000:8.1f}ms 1º (sobe o pool), {t_png2 * 1000:6.1f}ms "
+          f"outro tipo, {t_png_cache * 1000:6.3f}ms do cache ({len(png)} bytes)")
+
+    # pedido novo no intervalo invalida pela versão; 8 threads na mesma tela calculam uma vez
+    db.execute("INSERT INTO pedidos (pedido, quantidade, preco, categoria, inicio, estado, dia, remetente) "
+               "VALUES ('bench', 1, 10, '2', '20:00', 'A Fazer', ?, ?)", ultimo,
+               analytics.PREFIXO_CARRINHO + carrinho)
+    chamadas = {"n": 0}
+    original = analytics.calcular
+    def _contar(*args, **kw):
+        chamadas["n"] += 1
+        return original(*args, **kw)
+    analytics.calcular = _contar
+    ts = [threading.Thread(target=a.series, args=(de, ultimo, carrinho)) for _ in range(8)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    analytics.calcular = original
+    print(f"  8 consultas simultâneas        : {chamadas['n']} cálculo(s) após pedido novo no intervalo")
+    a.parar()
+
+if __name__ == "__main__":
+    main()
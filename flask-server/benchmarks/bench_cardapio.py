@@ -0,0 +1,58 @@
+# ===========================
+# Benchmark: getCardapio (consulta + json.dumps por pedido x CacheCardapio)
+#   python benchmarks/bench_cardapio.py [requisicoes] [caminho_do_banco]
+# ===========================
+# Roda numa cópia do banco (padrão data/dados.db). Mede o caminho antigo
+# (SELECT do cardápio + serialização a cada abertura do app), o snapshot
+# versionado (bytes prontos), a resposta "unchanged" e a recarga após escrita.
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from banco import Banco
+from cache_cardapio import CacheCardapio
+
+def _medir(nome: str, n: int, fn, base=None):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    dt = (time.perf_counter() - t0) / n
+    extra = f"  ({base / dt:7.1f}x)" if base else ""
+    print(f"  {nome:28s}: {dt * 1e6:9.1f} µs/req{extra}")
+    return dt
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    origem = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(__file__), "..", "data", "dados.db")
+    tmp = os.path.join(tempfile.mkdtemp(prefix="bench_cardapio_"), "dados.db")
+    shutil.copy(origem, tmp)
+    db = Banco(tmp)
+    cache = CacheCardapio(db)
+    linhas = db.execute("SELECT COUNT(*) AS n FROM cardapio")[0]["n"]
+    snap = cache.obter()
+    print(f"{n} requisições | {linhas} itens | JSON {len(snap.json)/1024:.1f} KiB, gzip {len(snap.gzip)/1024:.1f} KiB")
+
+    def antigo():
+        rows = db.execute("SELECT * FROM cardapio ORDER BY categoria_id, item")
+        json.dumps({"dataCardapio": rows}, ensure_ascii=False).encode("utf-8")
+
+    base = _medir("consulta + json.dumps", n, antigo)
+    _medir("snapshot (bytes prontos)", n, lambda: cache.obter().json, base)
+    _medir("snapshot gzip", n, lambda: cache.obter().gzip, base)
+    _medir("versão igual -> unchanged", n, lambda: cache.resposta_socket(None, snap.versao), base)
+
+    def escrita_e_leitura():
+        db.execute("UPDATE cardapio SET preco = preco WHERE id = (SELECT MIN(id) FROM cardapio)")
+        cache.obter().json
+    _medir("escrita + recarga", max(1, n // 10), escrita_e_leitura, base)
+    print(f"  stats: {cache.status()['recargas']} recargas, {cache.stats['hits']} hits")
+    db.fechar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# ===========================
+# Benchmark: busca de pedidos iFood (requests sequencial x ClienteIFood concorrente)
+#   python benchmarks/bench_cliente_ifood.py [n_pedidos] [latencia_ms] [taxa_erro]
+# ===========================
+# Roda contra o servidor falso (benchmarks/ifood_fake.py): mede o tempo total
+# para buscar N pedidos e quantos falharam de vez.
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import requests
+
+from ifood_cliente import ClienteIFood
+from ifood_fake import iniciar_servidor
+
+def _sequencial(base_url: str, order_ids):
+    "Caminho antigo: requests.Session, um GET por vez, sem retentativa."
+    s = requests.Session()
+    falhas = 0
+    t0 = time.perf_counter()
+    for oid in order_ids:
+        r = s.get(f"{base_url}/order/v1.0/orders/{oid}", headers={"Authorization": "Bearer tok-fake"}, timeout=20)
+        if r.status_code != 200:
+            falhas += 1
+        else:
+            r.json()
+    return time.perf_counter() - t0, falhas
+
+def _concorrente(base_url: str, order_ids):
+    cli = ClienteIFood(lambda: "tok-fake", lambda _token: None, base_url=base_url)
+    try:
+        t0 = time.perf_counter()
+        res = cli.buscar_pedidos(order_ids)
+        dt = time.perf_counter() - t0
+        return dt, sum(isinstance(r, Exception) for r in res), dict(cli.stats)
+    finally:
+        cli.fechar()
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latencia = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.03
+    taxa = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    srv, base_url = iniciar_servidor(latencia=latencia, taxa_erro=taxa)
+    order_ids = [f"order-{i:08d}" for i in range(n)]
+
+    print(f"{n} pedidos | latência {latencia*1000:.0f}ms | erro injetado {taxa:.0%}")
+    dt_seq, f_seq = _sequencial(base_url, order_ids)
+    print(f"  requests sequencial : {dt_seq:8.2f}s  ({n/dt_seq:7.1f} pedidos/s, {f_seq} falhas)")
+    dt_conc, f_conc, stats = _concorrente(base_url, order_ids)
+    print(f"  ClienteIFood        : {dt_conc:8.2f}s  ({n/dt_conc:7.1f} pedidos/s, {f_conc} falhas, "
+          f"{stats['retentativas']} retentativas)")
+    print(f"  speedup             : {dt_seq/dt_conc:8.1f}x")
+    srv.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# ===========================
+# Benchmark: DSL de opções do manipule.py (ad hoc x dsl_opcoes)
+#   python benchmarks/bench_dsl_opcoes.py [repeticoes]
+# ===========================
+# Sobre o dados_cardapio inteiro (lido sem executar o manipule.py):
+#   - compilar   : split em cascata (como os consumidores faziam) x parse numa
+#                  passada x opcoes_json memoizado
+#   - preço      : reinterpretar a string a cada item do pedido x TabelaPrecos
+# Confere que as duas leituras dão os mesmos grupos antes de medir. A leitura
+# numa passada valida e aponta a posição do erro, então custa um pouco mais que
+# o split solto; o ganho vem de compilar uma vez (memo/TabelaPrecos).
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dsl_opcoes import TabelaPrecos, compilar_cardapio, dados_do_manipule, opcoes_json, parse_instrucoes, parse_opcoes
+
+def _adhoc_opcoes(texto):
+    "Leitura ad hoc: split por ')' , depois '(' , '-' e '+'."
+    if not texto or texto == "None":
+        return []
+    grupos = []
+    for bloco in texto.split(")"):
+        if "(" not in bloco:
+            continue
+        nome, corpo = bloco.split("(", 1)
+        ops = []
+        for tok in corpo.split("-"):
+            tok = tok.strip()
+            if not tok:
+                continue
+            partes = tok.split("+")
+            valor = float(partes[-1]) if len(partes) > 1 else 0.0
+            ops.append({"nome": "+".join(partes[:-1]).strip() if len(partes) > 1 else tok,
+                        "valor_extra": valor, "esgotado": 0})
+        grupos.append({"nome": nome.strip(), "ids": "", "options": ops, "max_selected": 1, "obrigatorio": 1})
+    return grupos
+
+def _adhoc_instrucoes(texto):
+    "Leitura ad hoc: split por 'Passo' e depois por ':' (sem tratar os casos tortos)."
+    if not texto or texto == "None":
+        return {"modalidade": None, "passos": []}
+    cabeca, *partes = texto.split("Passo")
+    passos = []
+    for p in partes:
+        num, _, corpo = p.partition(":")
+        passos.append({"numero": int(num), "texto": corpo.strip(" -")})
+    return {"modalidade": cabeca.replace("Modalidade:", "").strip(" -(") or None, "passos": passos}
+
+def _adhoc_preco(row, escolhas):
+    total = row["preco"]
+    for g in _adhoc_opcoes(row["opcoes"]):
+        if g["nome"] in escolhas:
+            for o in g["options"]:
+                if o["nome"] == escolhas[g["nome"]]:
+                    total += o["valor_extra"]
+    return total
+
+def _medir(nome: str, n: int, fn, base=None):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    dt = (time.perf_counter() - t0) / n
+    extra = f"  ({base / dt:6.1f}x)" if base else ""
+    print(f"  {nome:30s}: {dt * 1e6:9.1f} µs{extra}")
+    return dt
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    menu = dados_do_manipule()
+    # o split solto não sabe de grupos opcionais: compara nomes e opções
+    def _estrutura(gs):
+        return [(g["nome"], g["options"]) for g in gs]
+    for r in menu:
+        assert _estrutura(_adhoc_opcoes(r["opcoes"])) == _estrutura(parse_opcoes(r["opcoes"])), r["item"]
+    com_opcoes = [r for r in menu if parse_opcoes(r["opcoes"])]
+    print(f"{len(menu)} itens ({len(com_opcoes)} com opções) | {n} repetições")
+
+    print("compilar o cardápio inteiro (por cardápio):")
+    base = _medir("ad hoc (split em cascata)", n, lambda: [(_adhoc_opcoes(r["opcoes"]), _adhoc_instrucoes(r["instrucoes"])) for r in menu])
+    _medir("parse numa passada", n, lambda: [(parse_opcoes(r["opcoes"]), parse_instrucoes(r["instrucoes"])) for r in menu], base)
+    _medir("compilar_cardapio (+ preços)", n, lambda: compilar_cardapio(menu), base)
+    _medir("opcoes_json memoizado", n, lambda: [opcoes_json(r["opcoes"]) for r in menu], base)
+
+    rnd = random.Random(1)
+    pedidos = []
+    for _ in range(1000):
+        i = rnd.randrange(len(com_opcoes))
+        r = com_opcoes[i]
+        pedidos.append((i, r, {g["nome"]: rnd.choice(g["options"])["nome"] for g in parse_opcoes(r["opcoes"])}))
+    # por posição: o dados_cardapio tem nomes de item repetidos
+    tabelas = [TabelaPrecos(r["preco"], parse_opcoes(r["opcoes"])) for r in com_opcoes]
+    for i, r, esc in pedidos:
+        assert abs(_adhoc_preco(r, esc) - tabelas[i].preco(esc)) < 1e-9
+    print(f"preço de {len(pedidos)} itens de pedido (por lote):")
+    base = _medir("ad hoc (reinterpreta a string)", n, lambda: [_adhoc_preco(r, e) for _, r, e in pedidos])
+    _medir("TabelaPrecos.preco", n, lambda: [tabelas[i].preco(e) for i, _, e in pedidos], base)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# ===========================
+# Micro-benchmark: banco.Banco x cs50.SQL nas consultas do ifoodHomologacao.py
+#   python benchmarks/bench_executor.py [iteracoes]
+# ===========================
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from banco import Banco
+
+SCHEMA = [
+    "CREATE TABLE ifood_events (event_id TEXT PRIMARY KEY, order_id TEXT, code TEXT, received_at TEXT)",
+    "CREATE TABLE pedidos (id INTEGER PRIMARY KEY AUTOINCREMENT, pedido TEXT, quantidade INTEGER, preco REAL, "
+    "categoria INTEGER, inicio TEXT, estado TEXT, extra TEXT, nome TEXT, dia TEXT, order_id TEXT)",
+    "CREATE INDEX idx_pedidos_order_id ON pedidos (order_id)",
+]
+
+# (nome, sql, gerador de argumentos)
+CONSULTAS = [
+    ("idempotencia SELECT", "SELECT 1 FROM ifood_events WHERE event_id=? LIMIT 1",
+     lambda i: (f"evt-{i % 500}",)),
+    ("ifood_events INSERT", "INSERT OR IGNORE INTO ifood_events (event_id, order_id, code, received_at) "
+                            "VALUES (?,?,?,datetime('now'))",
+     lambda i: (f"evt-{i}", f"order-{i % 500}", "PLC")),
+    ("pedidos INSERT item", "INSERT OR IGNORE INTO pedidos (pedido, quantidade, preco, categoria, inicio, estado, "
+                            "extra, nome, dia, order_id) VALUES (?,?,?,?,?,?,?,?,?,?)",
+     lambda i: ("fritas", 1, 38.0, 3, "18:00:00", "A Fazer", "", "Cliente", "2025-10-22", f"order-{i % 500}")),
+    ("UPDATE estado", "UPDATE pedidos SET estado=? WHERE order_id=?",
+     lambda i: ("Confirmado", f"order-{i % 500}")),
+]
+
+def _abrir(tipo: str, caminho: str):
+    if tipo == "cs50":
+        from cs50 import SQL
+        open(caminho, "a").close()  # cs50.SQL exige o arquivo existente
+        return SQL("sqlite:///" + caminho)
+    return Banco(caminho)
+
+def _rodar(tipo: str, n: int):
+    caminho = os.path.join(tempfile.mkdtemp(prefix=f"exec_{tipo}_"), "dados.db")
+    db = _abrir(tipo, caminho)
+    for sql in SCHEMA:
+        db.execute(sql)
+    resultados = {}
+    for nome, sql, args in CONSULTAS:
+        t0 = time.perf_counter()
+        for i in range(n):
+            db.execute(sql, *args(i))
+        resultados[nome] = n / (time.perf_counter() - t0)
+    return resultados
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    banco = _rodar("banco", n)
+    try:
+        cs50 = _rodar("cs50", n)
+    except ImportError:
+        cs50 = None
+        print("cs50 não instalado: medindo só o banco.Banco")
+
+    print(f"{'consulta':<22} {'banco ops/s':>12} {'cs50 ops/s':>12} {'ganho':>7}")
+    for nome, _, _ in CONSULTAS:
+        c = cs50[nome] if cs50 else None
+        ganho = f"{banco[nome] / c:6.1f}x" if c else "     -"
+        print(f"{nome:<22} {banco[nome]:12.0f} {c if c else 0:12.0f} {ganho}")
+
+if __name__ == "__main__":
+    main()
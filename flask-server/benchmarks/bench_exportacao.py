@@ -0,0 +1,95 @@
+# ===========================
+# Benchmark: exportação/importação de estoque (print de dicts x exportacao.py)
+#   python benchmarks/bench_exportacao.py [linhas] [formatos]
+# ===========================
+# Escala o estoque_geral real de data/dados.db para `linhas` (padrão 1M) num
+# banco temporário, como um histórico de contagens, e mede para cada formato
+# (ndjson,csv,parquet) a ida e volta completa: exportar, verificar checksums,
+# importar num banco vazio. A base é o ramo else do manipule.py (print de um
+# dict literal por linha, aqui redirecionado para arquivo), que não tem volta
+# automática nem conferência.
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from banco import Banco
+from exportacao import exportar, importar, verificar
+
+ORIGEM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "dados.db")
+
+def _gerar(caminho: str, linhas: int):
+    base = sqlite3.connect(ORIGEM).execute("SELECT item, quantidade, estoque_ideal FROM estoque_geral").fetchall()
+    rnd = random.Random(1)
+    conn = sqlite3.connect(caminho)
+    conn.execute("CREATE TABLE estoque_geral (item TEXT, quantidade INTEGER, estoque_ideal INTEGER)")
+    def linha(i):
+        item, q, ideal = base[i % len(base)]
+        q = rnd.randint(0, 200) if i % 7 else round(rnd.uniform(0, 50), 2)  # contagens fracionadas também
+        return (f"{item} #{i // len(base)}", q, ideal)
+    conn.executemany("INSERT INTO estoque_geral VALUES (?, ?, ?)", (linha(i) for i in range(linhas)))
+    conn.commit()
+    conn.close()
+
+def _legado(db, caminho: str):
+    "O ramo else do manipule.py."
+    with open(caminho, "w", encoding="utf-8") as f, contextlib.redirect_stdout(f):
+        for row in db.execute('SELECT * FROM estoque_geral'):
+            print('{', end='')
+            print(f"'item':'{row.get('item')}'", end=',')
+            print(f"'quantidade':{row.get('quantidade', None)}", end=',')
+            print(f"'estoque_ideal':{row.get('estoque_ideal', None)}", end='},\n')
+
+def _diferencas(a: str, b: str) -> int:
+    "Linhas (com o tipo armazenado) que não voltaram iguais, nos dois sentidos."
+    conn = sqlite3.connect(a)
+    conn.execute("ATTACH ? AS imp", (b,))
+    sel = "SELECT item, quantidade, estoque_ideal, typeof(quantidade), typeof(estoque_ideal) FROM {}estoque_geral"
+    n = sum(conn.execute(f"SELECT COUNT(*) FROM ({sel.format(x)} EXCEPT {sel.format(y)})").fetchone()[0]
+            for x, y in (("", "imp."), ("imp.", "")))
+    conn.close()
+    return n
+
+def _tamanho(pasta: str) -> float:
+    return sum(os.path.getsize(os.path.join(pasta, f)) for f in os.listdir(pasta)) / 2 ** 20
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    formatos = sys.argv[2].split(",") if len(sys.argv) > 2 else ["ndjson", "csv", "parquet"]
+    pasta = tempfile.mkdtemp(prefix="bench_export_")
+    origem = os.path.join(pasta, "origem.db")
+    _gerar(origem, linhas)
+    db = Banco(origem)
+    print(f"{linhas} linhas de estoque_geral | chunks de {os.getenv('EXPORT_CHUNK', '10000')}")
+
+    t0 = time.perf_counter()
+    _legado(db, os.path.join(pasta, "legado.txt"))
+    dt = time.perf_counter() - t0
+    print(f"  {'print de dicts':14s}: exportar {dt:6.2f}s  ({linhas / dt:9.0f} linhas/s)  "
+          f"{os.path.getsize(os.path.join(pasta, 'legado.txt')) / 2 ** 20:6.1f} MiB  (sem importação)")
+
+    for formato in formatos:
+        destino = os.path.join(pasta, formato)
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            t0 = time.perf_counter()
+            exportar(db, destino, formato, ["estoque_geral"])
+            t_exp = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            verificar(destino)
+            t_ver = time.perf_counter() - t0
+            novo = Banco(os.path.join(pasta, f"import_{formato}.db"))
+            t0 = time.perf_counter()
+            n = importar(novo, destino)["estoque_geral"]
+            t_imp = time.perf_counter() - t0
+        difs = _diferencas(origem, os.path.join(pasta, f"import_{formato}.db"))
+        print(f"  {formato:14s}: exportar {t_exp:6.2f}s  ({linhas / t_exp:9.0f} linhas/s)  {_tamanho(destino):6.1f} MiB  "
+              f"verificar {t_ver:5.2f}s  importar {t_imp:5.2f}s  ({n} linhas, {difs} diferenças)")
+        novo.fechar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# ===========================
+# Benchmark: extração do pedido iFood (extrator antigo x extracao_ifood)
+#   python benchmarks/bench_extracao.py [n_pedidos] [repeticoes]
+# ===========================
+# Para cada tamanho de pedido do corpus mede extrair + montar as linhas do
+# banco (o que pedido_detalhes faz), e confere que a saída é idêntica byte a
+# byte: json.dumps do dicionário público e repr das linhas gravadas.
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import extracao_legado as legado
+from extracao_ifood import PedidoExtraido, extrair_pedido
+from corpus_ifood import TAMANHOS, gerar_corpus_variado
+
+def _antigo(order):
+    d = legado.extrair_pedido_ifood(order)
+    return d, legado._linhas_pedido(d)
+
+def _novo(order):
+    p = extrair_pedido(order)
+    return p, p.linhas()
+
+def _conferir(corpus) -> int:
+    divergentes = 0
+    for order in corpus:
+        d_old, l_old = _antigo(order)
+        p_new, l_new = _novo(order)
+        a = json.dumps(d_old, ensure_ascii=False).encode("utf-8")
+        b = json.dumps(p_new.para_dict(), ensure_ascii=False).encode("utf-8")
+        ref = repr(l_old).encode("utf-8")
+        l_obj = p_new.linhas()                               # depois de materializar os objetos
+        l_dict = PedidoExtraido.de_dict(d_old).linhas()      # caminho de quem ainda passa dict
+        if a != b or any(repr(x).encode("utf-8") != ref for x in (l_new, l_obj, l_dict)):
+            divergentes += 1
+            if divergentes <= 3:
+                print("  DIVERGÊNCIA em", order.get("id"))
+    return divergentes
+
+def _medir(fn, corpus, repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        for order in corpus:
+            fn(order)
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    corpus = gerar_corpus_variado(n)
+
+    divergentes = _conferir(corpus)
+    print(f"{n} pedidos | saída idêntica: {'sim' if not divergentes else f'NÃO ({divergentes})'}")
+    if divergentes:
+        sys.exit(1)
+
+    por_tamanho = {t: corpus[k::len(TAMANHOS)] for k, t in enumerate(TAMANHOS)}
+    print(f"  {'itens x compl.':>14} | {'antigo µs/ped':>13} | {'novo µs/ped':>11} | speedup")
+    for (itens, comps), sub in por_tamanho.items():
+        a = _medir(_antigo, sub, repeticoes) / len(sub) * 1e6
+        b = _medir(_novo, sub, repeticoes) / len(sub) * 1e6
+        print(f"  {itens:>7} x {comps:<4} | {a:13.1f} | {b:11.1f} | {a / b:6.2f}x")
+    a = _medir(_antigo, corpus, repeticoes)
+    b = _medir(_novo, corpus, repeticoes)
+    print(f"  {'corpus todo':>14} | {a / n * 1e6:13.1f} | {b / n * 1e6:11.1f} | {a / b:6.2f}x")
+
+if __name__ == "__main__":
+    main()
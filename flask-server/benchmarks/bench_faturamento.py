@@ -0,0 +1,135 @@
+# ===========================
+# Benchmark: dashboard de faturamento (agregação crua x agregados por trigger)
+#   python benchmarks/bench_faturamento.py [dias] [linhas_por_dia]
+# ===========================
+# Gera um histórico sintético (pedidos reais de data/dados.db repetidos, com
+# cancelamentos, iFood e pagamentos) num banco temporário e mede:
+#   - escrita  : INSERT de pedidos um a um (como o app faz) sem e com triggers
+#   - backfill : recálculo vetorizado (pandas) do histórico inteiro
+#   - leitura  : o resumo do dashboard para 7, 30 e todos os dias, somando
+#                pedidos_todos/pagamentos a cada vez x lendo os agregados
+#   - conferência: os dois caminhos dão o mesmo resultado (verificar)
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import contextlib
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import faturamento
+import particao_pedidos
+from banco import Banco
+
+ORIGEM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "dados.db")
+ESTADOS = ["A Fazer", "Em Preparo", "Pronto", "Pronto", "Pronto", "Cancelado"]
+
+def _gerar(caminho: str, dias: int, por_dia: int):
+    base = sqlite3.connect(ORIGEM).execute("SELECT pedido, preco_unitario, categoria FROM pedidos "
+                                           "WHERE preco_unitario > 0").fetchall()
+    rnd = random.Random(1)
+    conn = sqlite3.connect(caminho)
+    for nome, ddl in sqlite3.connect(ORIGEM).execute(
+            "SELECT name, sql FROM sqlite_master WHERE name IN ('pedidos', 'pagamentos', 'categorias', "
+            "'faturamento_diario')"):
+        conn.execute(ddl)
+    conn.execute("INSERT INTO categorias SELECT * FROM (SELECT 1, 'produto' UNION ALL SELECT 2, 'barman' "
+                 "UNION ALL SELECT 3, 'cozinha')")
+    inicio = date(2024, 1, 1)
+    pedidos, pagamentos = [], []
+    for d in range(dias):
+        dia = (inicio + timedelta(days=d)).isoformat()
+        for _ in range(por_dia):
+            nome, unit, cat = rnd.choice(base)
+            q = rnd.randint(1, 3)
+            ifood = rnd.random() < 0.2
+            pedidos.append((nome, q, round(unit * q, 2), cat, f"{rnd.randint(11, 23)}:{rnd.randint(0, 59):02d}",
+                            rnd.choice(ESTADOS), dia, f"ifood-{d}-{_}" if ifood else None))
+        for _ in range(por_dia // 4):
+            pagamentos.append((round(rnd.uniform(10, 300), 2), rnd.choice(["credito", "pix", "dinheiro"]),
+                               rnd.choice(["normal"] * 8 + ["desconto", "caixinha"]), dia))
+    conn.executemany("INSERT INTO pedidos (pedido, quantidade, preco, categoria, inicio, estado, dia, order_id) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", pedidos)
+    conn.executemany("INSERT INTO pagamentos (valor, forma_de_pagamento, tipo, dia) VALUES (?, ?, ?, ?)", pagamentos)
+    # a agregação crua com os índices por dia que o servidor cria
+    conn.execute("CREATE INDEX idx_pedidos_dia ON pedidos (dia)")
+    conn.execute("CREATE INDEX idx_pagamentos_dia ON pagamentos (dia)")
+    conn.commit()
+    conn.close()
+    return (inicio + timedelta(days=dias - 1)).isoformat()
+
+def _cru(db, de: str, ate: str) -> dict:
+    "O que o socket fazia: agregar as tabelas de origem a cada pedido de faturamento."
+    e = faturamento._expr_pedido("p")
+    g = faturamento._expr_pagamento("g")
+    ped = db.execute(f"SELECT p.dia, SUM({e['valor']}) AS previsto, SUM({e['ifood']}) AS ifood, "
+                     f"SUM({e['itens']}) AS itens FROM {particao_pedidos.VIEW_TODOS} p "
+                     f"WHERE p.dia BETWEEN ? AND ? GROUP BY p.dia", de, ate)
+    pag = db.execute(f"SELECT g.dia, SUM({g['valor']}) AS valor FROM pagamentos g "
+                     f"WHERE g.dia BETWEEN ? AND ? GROUP BY g.dia", de, ate)
+    hora = db.execute(f"SELECT {e['hora']} AS hora, SUM({e['valor']}) AS valor FROM {particao_pedidos.VIEW_TODOS} p "
+                      f"WHERE p.dia BETWEEN ? AND ? GROUP BY 1", de, ate)
+    cat = db.execute(f"SELECT {e['categoria']} AS categoria, SUM({e['valor']}) AS valor "
+                     f"FROM {particao_pedidos.VIEW_TODOS} p WHERE p.dia BETWEEN ? AND ? GROUP BY 1", de, ate)
+    return {"pedidos": ped, "pagamentos": pag, "hora": hora, "categoria": cat}
+
+def _medir(f, n: int = 5) -> float:
+    f()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        f()
+    return (time.perf_counter() - t0) / n
+
+def _inserir(db, n: int, dia: str) -> float:
+    "n pedidos em autocommit, um por vez (caminho do app)."
+    t0 = time.perf_counter()
+    for i in range(n):
+        db.execute("INSERT INTO pedidos (pedido, quantidade, preco, categoria, inicio, estado, dia) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?)", "bench", 1, 10.0, "2", "20:00", "A Fazer", dia)
+    return (time.perf_counter() - t0) / n * 1e6
+
+def main():
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    por_dia = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    pasta = tempfile.mkdtemp(prefix="bench_faturamento_")
+    caminho = os.path.join(pasta, "dados.db")
+    ultimo = _gerar(caminho, dias, por_dia)
+    db = Banco(caminho)
+    particao_pedidos.ensure_particao(db)
+    print(f"{dias} dias x {por_dia} linhas = {dias * por_dia} pedidos, {dias * (por_dia // 4)} pagamentos")
+
+    sem = _inserir(db, 2000, "2030-01-01")
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        faturamento.ensure_schema(db)
+    com = _inserir(db, 2000, "2030-01-02")
+    db.execute("DELETE FROM pedidos WHERE pedido = 'bench'")
+    print(f"  INSERT em pedidos (autocommit)   : {sem:7.1f}us sem triggers, {com:7.1f}us com ({com / sem:.2f}x)")
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        t0 = time.perf_counter()
+        rel = faturamento.backfill(db)
+        dt = time.perf_counter() - t0
+    print(f"  backfill (pandas)                : {dt:7.2f}s para {rel['dias']} dias "
+          f"({dias * por_dia / dt:,.0f} pedidos/s)")
+
+    for janela in (7, 30, dias):
+        de = (date.fromisoformat(ultimo) - timedelta(days=janela - 1)).isoformat()
+        t_cru = _medir(lambda: _cru(db, de, ultimo))
+        t_agr = _medir(lambda: faturamento.resumo(db, de, ultimo))
+        print(f"  resumo de {janela:4d} dia(s)             : cru {t_cru * 1000:8.2f}ms  "
+              f"agregados {t_agr * 1000:7.2f}ms  ({t_cru / t_agr:6.1f}x)")
+
+    # escrita depois do backfill: cancelamentos, arquivamento e pagamentos passam pelos triggers
+    db.execute("UPDATE pedidos SET estado = 'Cancelado' WHERE id % 97 = 0")
+    db.execute("INSERT INTO pagamentos (valor, tipo, dia) VALUES (123.45, 'normal', ?)", ultimo)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        particao_pedidos.arquivar_pedidos(db, ultimo)
+    db.execute("UPDATE pedidos_arquivo SET estado = 'Cancelado' WHERE id % 89 = 0")
+    difs = faturamento.verificar(db)
+    print(f"  conferência após escrita/arquivo : {len(difs)} dia(s) divergente(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# ===========================
+# Benchmark: fila de eventos (queue.SimpleQueue x FilaDuravel em SQLite)
+#   python benchmarks/bench_fila_eventos.py [n_eventos] [workers] [custo_ms]
+# ===========================
+# Mede publicar + consumir N eventos (chaves = 200 pedidos) com W consumidores.
+# A FilaDuravel roda com lease de 1 e em lote, para mostrar o efeito do lote.
+# custo_ms simula o trabalho por evento (um PLACED real faz GET no iFood e
+# grava o pedido: dezenas de ms); com custo 0 mede só o overhead da fila.
+import os
+import sys
+import time
+import queue
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from banco import Banco
+from fila_duravel import FilaDuravel
+from corpus_ifood import gerar_pedido
+
+def _eventos(n: int):
+    return [{"id": f"evt-{i}", "code": "PLC", "fullCode": "PLACED", "orderId": f"order-{i % 200:08d}",
+             "createdAt": gerar_pedido(i % 200, n_itens=1, n_complementos=0)["createdAt"]} for i in range(n)]
+
+def _simple_queue(eventos, workers: int, custo: float) -> float:
+    q: "queue.SimpleQueue" = queue.SimpleQueue()
+    feitos = [0]
+    lock = threading.Lock()
+
+    def consumir():
+        while True:
+            evt = q.get()
+            if evt is None:
+                return
+            if custo:
+                time.sleep(custo)
+            with lock:
+                feitos[0] += 1
+
+    t0 = time.perf_counter()
+    ts = [threading.Thread(target=consumir) for _ in range(workers)]
+    for t in ts:
+        t.start()
+    for evt in eventos:
+        q.put(evt)
+    for _ in ts:
+        q.put(None)
+    for t in ts:
+        t.join()
+    return time.perf_counter() - t0
+
+def _fila_duravel(eventos, workers: int, lote: int, publicar_em_lote: bool, custo: float) -> float:
+    tmp = tempfile.mkdtemp(prefix="bench_fila_")
+    db = Banco(os.path.join(tmp, "dados.db"))
+    fila = FilaDuravel(db)
+    fila.ensure_schema()
+    total = len(eventos)
+    feitos = [0]
+    lock = threading.Lock()
+    fim = threading.Event()
+
+    def consumir():
+        while not fim.is_set():
+            msgs = fila.reservar(lote)
+            if not msgs:
+                fila.esperar(0.05)
+                continue
+            if custo:
+                time.sleep(custo * len(msgs))
+            fila.confirmar(msgs)
+            with lock:
+                feitos[0] += len(msgs)
+                if feitos[0] >= total:
+                    fim.set()
+
+    t0 = time.perf_counter()
+    ts = [threading.Thread(target=consumir) for _ in range(workers)]
+    for t in ts:
+        t.start()
+    if publicar_em_lote:
+        for i in range(0, total, 100):
+            fila.publicar_lote([(e["orderId"], e) for e in eventos[i:i + 100]])
+    else:
+        for e in eventos:
+            fila.publicar(e["orderId"], e)
+    fim.wait()
+    dt = time.perf_counter() - t0
+    for t in ts:
+        t.join()
+    db.fechar()
+    return dt
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    custo = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.0
+    eventos = _eventos(n)
+    print(f"{n} eventos, 200 pedidos, {workers} consumidores, {custo*1000:.1f}ms de trabalho por evento")
+    base = _simple_queue(eventos, workers, custo)
+    print(f"  SimpleQueue (memória)          : {base:7.3f}s  {n/base:10.0f} ev/s")
+    for nome, lote, em_lote in [("durável, publica 1, lease 1", 1, False),
+                                ("durável, publica 1, lease 32", 32, False),
+                                ("durável, publica 100, lease 32", 32, True)]:
+        dt = _fila_duravel(eventos, workers, lote, em_lote, custo)
+        print(f"  {nome:31s}: {dt:7.3f}s  {n/dt:10.0f} ev/s  ({dt/base:6.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# ===========================
+# Benchmark: migração de cardapio.opcoes (loop do deleteAll x MigracaoJSON)
+#   python benchmarks/bench_migracao.py [linhas] [processos]
+# ===========================
+# Gera um cardápio sintético (JSON das linhas reais de data/dados.db repetido,
+# com esgotado=1 para que toda linha mude) e aplica o transform do deleteAll:
+#   - legado    : tudo em memória + um UPDATE em autocommit por linha
+#   - motor     : MigracaoJSON com 1 processo e com `processos`
+#   - retomada  : interrompe no meio (KeyboardInterrupt) e roda de novo; confere
+#                 que nada ficou para trás (só o chunk em voo é transformado de novo)
+import os
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from banco import Banco
+from deleteAll import garantir_obrigatorio_e_reabrir
+from migracao_json import MigracaoJSON
+from opcoes_canonicas import _load_json_relaxed
+
+ORIGEM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "dados.db")
+_contagem = {"n": 0, "parar_em": None}
+
+def _transform_interrompido(data):
+    _contagem["n"] += 1
+    if _contagem["parar_em"] is not None and _contagem["n"] >= _contagem["parar_em"]:
+        raise KeyboardInterrupt
+    return garantir_obrigatorio_e_reabrir(data)
+
+def _modelos():
+    conn = sqlite3.connect(ORIGEM)
+    modelos = []
+    for (texto,) in conn.execute("SELECT opcoes FROM cardapio WHERE opcoes LIKE '[%' AND opcoes != '[]'"):
+        grupos = json.loads(texto)
+        for g in grupos:
+            for o in g.get("options") or []:
+                o["esgotado"] = 1
+        modelos.append(json.dumps(grupos, ensure_ascii=False))
+    conn.close()
+    return modelos
+
+def _banco(pasta: str, nome: str, linhas: int, modelos) -> str:
+    caminho = os.path.join(pasta, nome)
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE cardapio (id INTEGER PRIMARY KEY AUTOINCREMENT, item TEXT, opcoes TEXT)")
+    conn.executemany("INSERT INTO cardapio (item, opcoes) VALUES (?, ?)",
+                     ((f"item {i}", modelos[i % len(modelos)]) for i in range(linhas)))
+    conn.commit()
+    conn.close()
+    return caminho
+
+def _legado(db):
+    "O loop antigo do deleteAll.main()."
+    rows = db.execute("SELECT id, item, opcoes FROM cardapio")
+    for row in rows:
+        data, _ = _load_json_relaxed(row["opcoes"])
+        antes = json.dumps(data, ensure_ascii=False)
+        novo = json.dumps(garantir_obrigatorio_e_reabrir(data), ensure_ascii=False)
+        if novo != antes:
+            db.execute("UPDATE cardapio SET opcoes = ? WHERE id = ?", novo, row["id"])
+
+def _conferir(db) -> int:
+    "Linhas que ainda têm alguma opção esgotada."
+    return db.execute("SELECT COUNT(*) AS n FROM cardapio WHERE opcoes LIKE '%\"esgotado\": 1%'")[0]["n"]
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    processos = int(sys.argv[2]) if len(sys.argv) > 2 else min(4, os.cpu_count() or 1)
+    modelos = _modelos()
+    pasta = tempfile.mkdtemp(prefix="bench_migracao_")
+    print(f"{linhas} linhas | {len(modelos)} modelos de JSON | {processos} processos")
+
+    db = Banco(_banco(pasta, "legado.db", linhas, modelos))
+    t0 = time.perf_counter()
+    _legado(db)
+    base = time.perf_counter() - t0
+    print(f"  legado (autocommit por linha)  : {base:7.2f}s  {linhas / base:9.0f} linhas/s  restantes {_conferir(db)}")
+
+    for n in sorted({1, processos}):
+        db = Banco(_banco(pasta, f"motor_{n}.db", linhas, modelos))
+        rel = MigracaoJSON(db, "bench", garantir_obrigatorio_e_reabrir, processos=n).executar()
+        print(f"  motor, {n} processo(s)          : {rel['segundos']:7.2f}s  {rel['linhas_por_s']:9.0f} linhas/s  "
+              f"restantes {_conferir(db)}  ({base / rel['segundos']:.1f}x)")
+
+    db = Banco(_banco(pasta, "retomada.db", linhas, modelos))
+    _contagem["parar_em"] = linhas // 2
+    try:
+        MigracaoJSON(db, "bench", _transform_interrompido, processos=1, chunk=1000).executar()
+    except KeyboardInterrupt:
+        ck = db.execute("SELECT ultimo_id, lidas, status FROM migracoes_json WHERE nome = 'bench'")[0]
+        print(f"  interrompida: checkpoint {ck['ultimo_id']} ({ck['lidas']} gravadas, {ck['status']})")
+    _contagem["parar_em"] = None
+    rel = MigracaoJSON(db, "bench", _transform_interrompido, processos=1, chunk=1000).executar()
+    print(f"  retomada de {rel['retomada_de']}: {rel['lidas']} lidas no total, restantes {_conferir(db)}, "
+          f"transform chamado {_contagem['n']}x para {linhas} linhas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# ===========================
+# Benchmark: motivos de cancelamento (GET ao vivo x MotivosCancelamento)
+#   python benchmarks/bench_motivos.py [aberturas] [pedidos] [latencia_ms]
+# ===========================
+# Simula o caixa abrindo o diálogo de cancelamento `aberturas` vezes sobre
+# `pedidos` pedidos, contra o servidor falso:
+#   - ao vivo : caminho antigo, um GET cancellationReasons por abertura
+#   - cache   : prefetch no PLACED e leitura da memória
+#   - lento   : pedido novo sem prefetch com o iFood a 5s; serve a última
+#               lista do merchant depois do timeout do cache
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ifood_cliente import ClienteIFood
+from ifood_fake import iniciar_servidor
+from motivos_ifood import MotivosCancelamento
+
+def _percentil(v, q):
+    return v[min(len(v) - 1, int(q * len(v)))]
+
+def _linha(nome: str, tempos):
+    tempos = sorted(tempos)
+    ms = lambda s: f"{s * 1000:9.3f}ms"
+    print(f"  {nome:8s}: p50 {ms(_percentil(tempos, 0.5))}  p95 {ms(_percentil(tempos, 0.95))}  "
+          f"max {ms(tempos[-1])}")
+    return _percentil(tempos, 0.5)
+
+def main():
+    aberturas = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    n_pedidos = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    latencia = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.15
+    srv, base_url = iniciar_servidor(latencia=latencia)
+    cli = ClienteIFood(lambda: "tok-fake", lambda _token: None, base_url=base_url)
+    pedidos = [f"order-{i:08d}" for i in range(n_pedidos)]
+    sorteio = [random.choice(pedidos) for _ in range(aberturas)]
+    print(f"{aberturas} aberturas do diálogo | {n_pedidos} pedidos | latência do iFood {latencia*1000:.0f}ms")
+
+    tempos = []
+    for oid in sorteio:
+        t0 = time.perf_counter()
+        r = cli.get(f"/order/v1.0/orders/{oid}/cancellationReasons")
+        r.raise_for_status()
+        r.json()
+        tempos.append(time.perf_counter() - t0)
+    p50_vivo = _linha("ao vivo", tempos)
+
+    motivos = MotivosCancelamento(cli)
+    for oid in pedidos:  # PLACED processado
+        motivos.prefetch(oid, "merchant-bench")
+    while motivos.status()["em_voo"]:  # prefetch roda em background, em paralelo
+        time.sleep(0.01)
+    tempos = []
+    for oid in sorteio:
+        t0 = time.perf_counter()
+        motivos.obter(oid, "merchant-bench")
+        tempos.append(time.perf_counter() - t0)
+    p50_cache = _linha("cache", tempos)
+
+    srv.latencia = 5.0
+    t0 = time.perf_counter()
+    _, origem = motivos.obter("order-99999999", "merchant-bench")
+    _linha("lento", [time.perf_counter() - t0])
+    print(f"            origem: {origem} (timeout {motivos.timeout:.1f}s)")
+    print(f"  speedup p50 cache x ao vivo: {p50_vivo / p50_cache:,.0f}x")
+    st = motivos.status()
+    print(f"  buscas no iFood: {st['buscas']} | hit_rate {st['por_pedido']['hit_rate']}")
+    srv.shutdown()
+
+if __name__ == "__main__":
+    main()
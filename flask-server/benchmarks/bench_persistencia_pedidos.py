@@ -0,0 +1,76 @@
+# ===========================
+# Benchmark: persistência de pedidos iFood (linha a linha x transação única)
+#   python benchmarks/bench_persistencia_pedidos.py [n_pedidos] [itens_por_pedido]
+# ===========================
+import os
+import sys
+import time
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="bench_ifood_")
+os.environ["IFOOD_DB_PATH"] = os.path.join(_tmp, "dados.db")
+os.environ["IFOOD_POLLING_START"] = "0"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ifoodHomologacao as ifood
+from corpus_ifood import gerar_corpus
+
+def _salvar_linha_a_linha(data: dict):
+    "Caminho antigo de pedido_detalhes: um db.execute (autocommit) por linha."
+    itens, pagamentos, beneficios = ifood._linhas_pedido(data)
+    for row in itens:
+        ifood.db.execute(f"INSERT OR IGNORE INTO pedidos ({', '.join(ifood.PEDIDOS_COLS)}) "
+                         f"VALUES ({','.join('?' * len(ifood.PEDIDOS_COLS))})", *row)
+    for row in pagamentos:
+        ifood.db.execute(f"INSERT INTO ifood_pedidos_payments ({', '.join(ifood.PAYMENTS_COLS)}) "
+                         f"VALUES ({','.join('?' * len(ifood.PAYMENTS_COLS))})", *row)
+    for row in beneficios:
+        ifood.db.execute(f"INSERT INTO ifood_pedidos_benefits ({', '.join(ifood.BENEFITS_COLS)}) "
+                         f"VALUES ({','.join('?' * len(ifood.BENEFITS_COLS))})", *row)
+
+def _limpar():
+    for tabela in ("pedidos", "ifood_pedidos_payments", "ifood_pedidos_benefits"):
+        ifood.db.execute(f"DELETE FROM {tabela}")
+
+def _contar_linhas(extraidos) -> int:
+    total = 0
+    for data in extraidos:
+        i, p, b = ifood._linhas_pedido(data)
+        total += len(i) + len(p) + len(b)
+    return total
+
+def _medir(nome: str, fn, linhas: int):
+    _limpar()
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    print(f"{nome:<28} {dt:8.3f}s  {linhas / dt:10.0f} linhas/s")
+    return dt
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_itens = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    extraidos = [ifood.extrair_pedido_ifood(o) for o in gerar_corpus(n, n_itens=n_itens)]
+    linhas = _contar_linhas(extraidos)
+    print(f"{n} pedidos x {n_itens} itens = {linhas} linhas ({ifood.DATABASE_PATH})")
+
+    antes = _medir("antes (linha a linha)", lambda: [_salvar_linha_a_linha(d) for d in extraidos], linhas)
+    depois = _medir("salvar_pedido (1 tx/pedido)", lambda: [ifood.salvar_pedido(d) for d in extraidos], linhas)
+    lote = _medir("salvar_pedidos_em_lote", lambda: ifood.salvar_pedidos_em_lote(extraidos), linhas)
+    print(f"ganho por pedido: {antes / depois:.1f}x | ganho em lote: {antes / lote:.1f}x")
+
+    # replay (queda / retentativa da fila durável): nada pode duplicar
+    contar = lambda: {t: ifood.db.execute(f"SELECT COUNT(*) AS n FROM {t}")[0]["n"]
+                      for t in ("pedidos", "ifood_pedidos_payments", "ifood_pedidos_benefits")}
+    antes_replay = contar()
+    ifood.salvar_pedidos_em_lote(extraidos + extraidos[: n // 2])
+    for d in extraidos[: n // 4]:
+        ifood.salvar_pedido(d)
+    depois_replay = contar()
+    print(f"replay: {antes_replay} -> {depois_replay}")
+    if depois_replay != antes_replay:
+        print("FALHA: o replay reinseriu linhas de pedidos já gravados")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
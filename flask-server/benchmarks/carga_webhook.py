@@ -0,0 +1,93 @@
+# ===========================
+# Carga: replay de lotes assinados no /webhook_ifood (SLA de 5s do iFood)
+#   python benchmarks/carga_webhook.py [requisicoes] [concorrencia] [eventos_por_lote]
+# ===========================
+# Sobe o app Flask num servidor werkzeug com threads (banco temporário),
+# dispara lotes de eventos assinados com HMAC via aiohttp e reporta vazão e
+# p50/p95/p99 do tempo de resposta contra o SLA.
+import os
+import sys
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+
+_tmp = tempfile.mkdtemp(prefix="carga_webhook_")
+os.environ["IFOOD_DB_PATH"] = os.path.join(_tmp, "dados.db")
+os.environ["IFOOD_POLLING_START"] = "0"
+os.environ.setdefault("IFOOD_WEBHOOK_SECRET", "segredo-de-carga")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import aiohttp
+from werkzeug.serving import make_server
+
+import ifoodHomologacao as ifood
+
+SLA_S = 5.0
+SEGREDO = os.environ["IFOOD_WEBHOOK_SECRET"].encode("utf-8")
+CODIGOS = ["PLC", "CFM", "RTP", "DSP"]
+
+def _lote(r: int, k: int) -> bytes:
+    eventos = [{"id": f"evt-{r}-{j}", "code": CODIGOS[j % len(CODIGOS)], "fullCode": "CONFIRMED",
+                "orderId": f"order-{(r * k + j) % 5000:08d}", "merchantId": "merchant-carga",
+                "createdAt": "2025-10-01T18:00:00.000Z", "metadata": {"origem": "carga", "seq": j}}
+               for j in range(k)]
+    return json.dumps(eventos).encode("utf-8")
+
+def _percentil(v, q):
+    return v[min(len(v) - 1, int(q * len(v)))]
+
+async def _disparar(url: str, corpos, concorrencia: int):
+    sem = asyncio.Semaphore(concorrencia)
+    tempos, status = [], {}
+    conector = aiohttp.TCPConnector(limit=concorrencia)
+    async with aiohttp.ClientSession(connector=conector) as sessao:
+        async def um(corpo: bytes):
+            assinatura = hmac.new(SEGREDO, corpo, hashlib.sha256).hexdigest()
+            async with sem:
+                t0 = time.perf_counter()
+                async with sessao.post(url, data=corpo, headers={"X-IFood-Signature": assinatura,
+                                                                 "Content-Type": "application/json"}) as r:
+                    await r.read()
+                tempos.append(time.perf_counter() - t0)
+                status[r.status] = status.get(r.status, 0) + 1
+        t0 = time.perf_counter()
+        await asyncio.gather(*(um(c) for c in corpos))
+        return time.perf_counter() - t0, sorted(tempos), status
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concorrencia = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    ifood._process_ifood_event = lambda evt: None  # mede só a ingestão (sem GET no iFood)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # sem log por requisição
+    srv = make_server("127.0.0.1", 0, ifood.app, threaded=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{srv.server_port}/webhook_ifood"
+
+    corpos = [_lote(r, k) for r in range(n)]
+    tamanho = sum(map(len, corpos)) / n
+    print(f"{n} requisições | {k} eventos/lote ({tamanho/1024:.1f} KiB) | concorrência {concorrencia}")
+    dt, tempos, status = asyncio.run(_disparar(url, corpos, concorrencia))
+
+    ms = lambda s: f"{s * 1000:8.1f}ms"
+    fora = sum(1 for t in tempos if t > SLA_S)
+    print(f"  vazão     : {n/dt:8.1f} req/s  ({n*k/dt:,.0f} eventos/s)")
+    print(f"  p50       : {ms(_percentil(tempos, 0.50))}")
+    print(f"  p95       : {ms(_percentil(tempos, 0.95))}")
+    print(f"  p99       : {ms(_percentil(tempos, 0.99))}")
+    print(f"  max       : {ms(tempos[-1])}")
+    print(f"  > SLA 5s  : {fora} ({fora / n:.2%})")
+    print(f"  status    : {status}")
+    srv.shutdown()
+    ifood.stop_event_workers(30)
+    st = ifood.event_worker_stats()
+    print(f"  fila      : {st['enqueued']} enfileirados, {st['processed']} processados")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# ===========================
+# Corpus sintético de pedidos iFood (mesmo formato de GET orders/{id})
+# ===========================
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+_PRODUTOS = ["fritas", "calabresa acebolada", "frango", "isca de peixe", "camarao", "lula",
+             "caipirinhas", "caipiroskas", "heineken", "coca", "agua", "acai 500ml"]
+_COMPLEMENTOS = [("Tamanho", "300g"), ("Tamanho", "500g"), ("Tamanho", "1kg"),
+                 ("Adicionais", "cheddar e bacon"), ("Adicionais", "cebola empanada"),
+                 ("Frutas", "limao"), ("Frutas", "morango"), ("Destilado", "51")]
+_PAGAMENTOS = [("CREDIT", "VISA"), ("DEBIT", "MASTERCARD"), ("PIX", None), ("CASH", None)]
+
+def gerar_pedido(i: int, n_itens: int = 3, n_complementos: int = 2, agendado: bool = False) -> dict:
+    "Gera um pedido determinístico (mesmo i => mesmo JSON)."
+    rnd = random.Random(i)
+    created = datetime(2025, 10, 1, 18, 0, tzinfo=timezone.utc) + timedelta(minutes=i)
+    itens = []
+    subtotal = 0
+    for k in range(n_itens):
+        unit = rnd.randint(500, 9000)
+        qtd = rnd.randint(1, 3)
+        opts = []
+        for c in range(n_complementos):
+            grupo, nome = _COMPLEMENTOS[(i + k + c) % len(_COMPLEMENTOS)]
+            opt = {"name": nome, "groupName": grupo, "quantity": 1, "price": rnd.randint(0, 2000)}
+            if c % 2:
+                opt["customizations"] = [{"name": "sem sal", "groupName": "Obs", "quantity": 1, "price": 0}]
+            opts.append(opt)
+        item = {"name": _PRODUTOS[(i + k) % len(_PRODUTOS)], "quantity": qtd, "unitPrice": unit,
+                "totalPrice": unit * qtd, "options": opts}
+        if rnd.random() < 0.4:
+            item["observations"] = "capricha no gelo"
+        itens.append(item)
+        subtotal += unit * qtd
+
+    forma, bandeira = _PAGAMENTOS[i % len(_PAGAMENTOS)]
+    order = {
+        "id": f"order-{i:08d}",
+        "displayId": f"{i % 10000:04d}",
+        "createdAt": created.isoformat().replace("+00:00", "Z"),
+        "orderTiming": "SCHEDULED" if agendado else "IMMEDIATE",
+        "customer": {"name": f"Cliente {i}", "documentNumber": f"{rnd.randint(0, 10**11):011d}"},
+        "items": itens,
+        "total": {"subTotal": subtotal, "orderAmount": subtotal + 599},
+        "payments": {"methods": [{"name": forma, "inPerson": False, "liability": "IFOOD",
+                                  "amount": {"value": subtotal + 599},
+                                  "card": {"brand": bandeira, "provider": "ADYEN"} if bandeira else {}}]},
+        "benefits": {"benefits": [{"target": "ORDER", "sponsorships": [
+            {"liability": "IFOOD", "amount": {"value": 300}},
+            {"liability": "MERCHANT", "amount": {"value": 200}}]}]} if i % 3 == 0 else {},
+        "verificationCodes": {"takeout": f"{i % 9999:04d}"} if i % 2 else {},
+        "delivery": {
+            "observations": "interfone quebrado" if i % 5 == 0 else None,
+            "deliveryAddress": {"streetName": "Av. Atlântica", "streetNumber": str(100 + i % 900),
+                                "neighborhood": "Centro", "city": "Santos", "state": "SP",
+                                "postalCode": "11000-000", "complement": None, "reference": None},
+        },
+    }
+    if agendado:
+        order["delivery"]["deliveryDateTime"] = (created + timedelta(hours=2)).isoformat().replace("+00:00", "Z")
+    return order
+
+def gerar_corpus(n: int, n_itens: int = 3, n_complementos: int = 2) -> List[dict]:
+    return [gerar_pedido(i, n_itens, n_complementos, agendado=(i % 7 == 0)) for i in range(n)]
+
+# (itens, complementos por item): pedido de balcão até pedido de festa
+TAMANHOS = [(1, 0), (2, 1), (3, 2), (6, 3), (12, 4), (30, 6)]
+
+def _casos_de_borda(pedido: dict, i: int) -> dict:
+    "Variações que o iFood manda de verdade: campos nulos/ausentes, retirada, sem pagamento."
+    caso = i % 6
+    if caso == 1:
+        pedido.pop("delivery", None)          # retirada no balcão
+        pedido["takeout"] = {"mode": "DEFAULT", "takeoutDateTime": pedido["createdAt"]}
+    elif caso == 2:
+        pedido["customer"] = None
+        pedido["verificationCodes"] = {"pickup": "9876"}
+    elif caso == 3:
+        pedido["items"][0].pop("options", None)
+        pedido["items"][0]["observations"] = None
+        pedido["payments"] = {}
+    elif caso == 4:
+        pedido["createdAt"] = "data inválida"
+        pedido["items"][0]["options"] = [{"name": None, "quantity": None, "price": 0}]
+    elif caso == 5:
+        pedido["createdAt"] = pedido["createdAt"].replace("Z", "-03:00")
+        pedido["delivery"]["deliveryAddress"]["streetNumber"] = None
+    return pedido
+
+def gerar_corpus_variado(n: int) -> List[dict]:
+    "Corpus com tamanhos de TAMANHOS e casos de borda, determinístico."
+    out = []
+    for i in range(n):
+        n_itens, n_comp = TAMANHOS[i % len(TAMANHOS)]
+        out.append(_casos_de_borda(gerar_pedido(i, n_itens, n_comp, agendado=(i % 7 == 0)), i))
+    return out
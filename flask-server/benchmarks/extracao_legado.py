@@ -0,0 +1,149 @@
+# ===========================
+# Cópia congelada do extrator antigo (referência para bench_extracao.py)
+# ===========================
+# extrair_pedido_ifood / _linhas_pedido / parse_iso_br como estavam antes do
+# extracao_ifood.py. Não usar no app: serve só para medir e comparar saída.
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+try:
+    import zoneinfo
+    tz_sp = zoneinfo.ZoneInfo("America/Sao_Paulo")
+except Exception:
+    from datetime import timezone, timedelta
+    tz_sp = timezone(timedelta(hours=-3))
+
+def parse_iso_br(dt_str: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    if not dt_str:
+        return None, None
+    try:
+        dt = datetime.fromisoformat(dt_str.replace("Z", "+00:00")).astimezone(tz_sp)
+        return dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S")
+    except Exception:
+        return None, None
+
+def extrair_pedido_ifood(order: dict) -> dict:
+    total_block = order.get("total") or {}
+    delivery    = order.get("delivery") or {}
+    addr        = delivery.get("deliveryAddress") or {}
+
+    pedido_data, pedido_hora         = parse_iso_br(order.get("createdAt"))
+    agendamento_data, agendamento_h  = parse_iso_br(delivery.get("deliveryDateTime"))
+
+    # Payments
+    payments_out = []
+    methods = (order.get("payments") or {}).get("methods", [])
+    for pm in methods:
+        card   = pm.get("card") or {}
+        amount = (pm.get("amount") or {}).get("value") or 0
+        payments_out.append({
+            "nome": pm.get("name"),
+            "presencial": 1 if pm.get("inPerson") else 0,
+            "bandeira": card.get("brand"),
+            "adquirente": card.get("provider"),
+            "valor": amount/100.0,
+            "liability": pm.get("liability"),
+        })
+
+    # Benefits / Subsídios
+    beneficios_out = []
+    benefits = (order.get("benefits") or {}).get("benefits", [])
+    for b in benefits:
+        for s in (b.get("sponsorships") or []):
+            val = (s.get("amount") or {}).get("value") or 0
+            beneficios_out.append({
+                "alvo": b.get("target"),
+                "responsavel": s.get("liability"),
+                "valor": val/100.0
+            })
+
+    # Itens + complementos
+    itens_out: List[dict] = []
+    for it in order.get("items", []):
+        item_dict = {
+            "produto": it.get("name"),
+            "quantidade": it.get("quantity", 1),
+            "preco_unit": it.get("unitPrice"),
+            "preco_total": it.get("totalPrice"),
+            "observacoes": it.get("observations"),
+            "complementos": []
+        }
+        for opt in it.get("options", []):
+            comp = {
+                "nome": opt.get("name"),
+                "grupo": opt.get("groupName"),
+                "quantidade": opt.get("quantity", 1),
+                "preco": opt.get("price"),
+                "customizacoes": []
+            }
+            for cust in opt.get("customizations", []):
+                comp["customizacoes"].append({
+                    "nome": cust.get("name"),
+                    "grupo": cust.get("groupName"),
+                    "quantidade": cust.get("quantity", 1),
+                    "preco": cust.get("price"),
+                })
+            item_dict["complementos"].append(comp)
+        itens_out.append(item_dict)
+
+    verification_codes = order.get("verificationCodes") or {}
+    pickup_code = verification_codes.get("takeout") or verification_codes.get("pickup") or verification_codes.get("code")
+
+    return {
+        "pedido_id": order.get("id"),
+        "display_id": order.get("displayId"),
+        "cliente_nome": (order.get("customer") or {}).get("name"),
+        "cliente_documento": (order.get("customer") or {}).get("documentNumber"),
+        "produtos": itens_out,
+        "valor_sem_taxas": total_block.get("subTotal"),
+        "valor_com_taxas": total_block.get("orderAmount"),
+        "endereco": {
+            "rua": addr.get("streetName"),
+            "numero": addr.get("streetNumber"),
+            "bairro": addr.get("neighborhood"),
+            "cidade": addr.get("city"),
+            "estado": addr.get("state"),
+            "cep": addr.get("postalCode"),
+            "complemento": addr.get("complement"),
+            "referencia": addr.get("reference"),
+        },
+        "pedido_data": pedido_data,
+        "pedido_hora": pedido_hora,
+        "orderTiming": order.get("orderTiming"),
+        "agendamento_data": agendamento_data,
+        "agendamento_hora": agendamento_h,
+        "delivery_observations": delivery.get("observations"),
+        "payments": payments_out,
+        "beneficios": beneficios_out,
+        "pickup_code": pickup_code,
+        "takeout": order.get("takeout") or {},
+    }
+
+def _linhas_pedido(data: dict) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+    "Converte o resultado de extrair_pedido_ifood nas linhas de pedidos/payments/benefits."
+    # Endereço (ou retirada)
+    end = data.get("endereco") or {}
+    endereco = " ".join(s for s in [end.get("rua"), str(end.get("numero") or "").strip()] if s).strip()
+    endereco = endereco or "Retirada no balcão"
+
+    hora_entrega = data["agendamento_hora"] or data["pedido_hora"]
+    order_id = data["pedido_id"]
+
+    # Observações / complementos (um registro por item do pedido)
+    itens = []
+    for row in data.get("produtos", []):
+        extra = (row.get("observacoes") or "")
+        for comp in row.get("complementos", []):
+            extra += f"\n{comp.get('quantidade',1)} {comp.get('nome','')}"
+        itens.append((
+            row["produto"], row["quantidade"], row["preco_total"], 3,
+            data["pedido_hora"], "A Fazer", extra, data["cliente_nome"],
+            data["pedido_data"], data["orderTiming"], endereco, order_id,
+            "IFOOD", hora_entrega, (data.get("cliente_documento") or ""), (data.get("pickup_code") or "")
+        ))
+
+    pagamentos = [(order_id, p["nome"], p["presencial"], p["bandeira"], p["adquirente"], p["valor"], p["liability"])
+                  for p in data.get("payments", [])]
+    beneficios = [(order_id, b["alvo"], b["responsavel"], b["valor"])
+                  for b in data.get("beneficios", [])]
+    return itens, pagamentos, beneficios
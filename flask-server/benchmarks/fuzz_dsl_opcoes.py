@@ -0,0 +1,120 @@
+# ===========================
+# Fuzz: DSL de opções/instruções (dsl_opcoes.py)
+#   python benchmarks/fuzz_dsl_opcoes.py [casos] [semente]
+# ===========================
+# Três frentes, todas sem tocar no banco:
+#   - ida e volta : grupos aleatórios -> renderizar_opcoes -> parse_opcoes
+#                   devolve os mesmos nomes, valores, obrigatorio e max_selected
+#   - mutação     : strings reais do dados_cardapio com caracteres inseridos,
+#                   trocados ou apagados; o parser só pode devolver grupos ou
+#                   levantar ErroDSL, e o que ele aceita é estável
+#                   (parse(render(parse(x))) == parse(x))
+#   - instruções  : parse_instrucoes nunca levanta e mantém a ordem dos passos
+# Sai com código 1 e imprime a entrada mínima de cada falha.
+import os
+import sys
+import random
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dsl_opcoes import ErroDSL, dados_do_manipule, parse_instrucoes, parse_opcoes, renderizar_opcoes
+
+LETRAS = "abcdefghijklmnopqrstuvwxyzçãéí0123456789 "
+RUIDO = "()-+ ,.:aP1éx\t"
+
+def _nome(rnd: random.Random, extra: str = "") -> str:
+    while True:
+        s = "".join(rnd.choice(LETRAS + extra) for _ in range(rnd.randint(1, 14))).strip()
+        if s:
+            return s
+
+def _grupos(rnd: random.Random) -> list:
+    grupos = []
+    for _ in range(rnd.randint(0, 4)):
+        ops = []
+        for _ in range(rnd.randint(1, 8)):
+            v = rnd.choice([0.0, 0.0, float(rnd.randint(1, 200)), rnd.randint(1, 400) / 4])
+            ops.append({"nome": _nome(rnd, "+"), "valor_extra": v, "esgotado": 0})
+        # nomes com caracteres de marca e de grupos de acréscimo; flags fora do padrão
+        # (no fim do nome: '{' ou '[' no começo do texto é JSON)
+        nome = rnd.choice([_nome(rnd, "-") + rnd.choice(["?", "!", " {2}", "?{1}", "{", "}"]),
+                           _nome(rnd, "-"), "Adicionais", "Extras"])
+        grupos.append({"nome": nome, "ids": "", "options": ops,
+                       "max_selected": rnd.choice([0, 1, 1, 2, len(ops)]), "obrigatorio": rnd.choice([0, 1])})
+    return grupos
+
+def _mutar(rnd: random.Random, s: str) -> str:
+    s = list(s)
+    for _ in range(rnd.randint(1, 4)):
+        op, pos = rnd.random(), rnd.randint(0, len(s))
+        if op < 0.4 or not s:
+            s.insert(pos, rnd.choice(RUIDO))
+        elif op < 0.7:
+            s[min(pos, len(s) - 1)] = rnd.choice(RUIDO)
+        else:
+            del s[min(pos, len(s) - 1)]
+    return "".join(s)
+
+def main():
+    casos = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    semente = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    rnd = random.Random(semente)
+    menu = dados_do_manipule()
+    opcoes = [r["opcoes"] for r in menu if r.get("opcoes") not in (None, "", "None")]
+    instrucoes = [r["instrucoes"] for r in menu if r.get("instrucoes") not in (None, "", "None")]
+    falhas = []
+
+    def falha(frente, entrada, detalhe):
+        falhas.append((frente, entrada, detalhe))
+
+    # ---------------- Ida e volta ----------------
+    for _ in range(casos):
+        g = _grupos(rnd)
+        texto = renderizar_opcoes(g)
+        try:
+            volta = parse_opcoes(texto)
+        except Exception:
+            falha("ida e volta", texto, traceback.format_exc(limit=1))
+            continue
+        if volta != g:
+            falha("ida e volta", texto, f"{g!r}\n  != {volta!r}")
+
+    # ---------------- Mutação ----------------
+    aceitas = recusadas = 0
+    for _ in range(casos):
+        texto = _mutar(rnd, rnd.choice(opcoes))
+        try:
+            g = parse_opcoes(texto)
+        except ErroDSL:
+            recusadas += 1
+            continue
+        except Exception:
+            falha("mutação", texto, traceback.format_exc(limit=1))
+            continue
+        aceitas += 1
+        try:
+            if parse_opcoes(renderizar_opcoes(g)) != g:
+                falha("mutação", texto, "parse(render(parse(x))) != parse(x)")
+        except Exception:
+            falha("mutação", texto, traceback.format_exc(limit=1))
+
+    # ---------------- Instruções ----------------
+    for _ in range(casos):
+        texto = _mutar(rnd, rnd.choice(instrucoes)) if rnd.random() < 0.8 else _nome(rnd, RUIDO)
+        try:
+            r = parse_instrucoes(texto)
+        except Exception:
+            falha("instruções", texto, traceback.format_exc(limit=1))
+            continue
+        if not r["passos"] or any(not isinstance(p["numero"], int) for p in r["passos"]):
+            falha("instruções", texto, repr(r))
+
+    print(f"{casos} casos por frente (semente {semente}) | mutação: {aceitas} aceitas, {recusadas} recusadas")
+    for frente, entrada, detalhe in falhas[:20]:
+        print(f"  FALHA [{frente}] {entrada!r}\n  {detalhe}")
+    print(f"{len(falhas)} falhas")
+    sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+    main()
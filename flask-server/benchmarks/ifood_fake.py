@@ -0,0 +1,144 @@
+# ===========================
+# Servidor falso da API do iFood (stdlib) para benchmarks locais
+#   python benchmarks/ifood_fake.py [porta] [latencia_ms] [taxa_erro]
+# ===========================
+# Atende token, events:polling, acknowledgment, orders/{id} (corpus_ifood),
+# cancellationReasons e ações, com latência fixa e injeção de 429/500.
+# orders/{id} manda ETag e responde 304 a If-None-Match igual.
+import json
+import hashlib
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import urlparse
+
+from corpus_ifood import gerar_pedido
+
+_MOTIVOS = [{"cancelCodeId": "501", "description": "Problemas de sistema"},
+            {"cancelCodeId": "503", "description": "Item indisponível"}]
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status: int, corpo=None, headers=None):
+        dados = b"" if corpo is None else json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _ler_corpo(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _falhar(self) -> bool:
+        srv = self.server
+        srv.contadores["requisicoes"] += 1
+        if srv.latencia:
+            time.sleep(srv.latencia)
+        if srv.taxa_erro and random.random() < srv.taxa_erro:
+            if random.random() < 0.5:
+                srv.contadores["429"] += 1
+                self._responder(429, {"message": "too many requests"}, {"Retry-After": "0.05"})
+            else:
+                srv.contadores["500"] += 1
+                self._responder(500, {"message": "erro interno"})
+            return True
+        return False
+
+    def do_POST(self):
+        self._ler_corpo()
+        if self._falhar():
+            return
+        caminho = urlparse(self.path).path
+        if caminho.endswith("/oauth/token"):
+            self._responder(200, {"accessToken": "tok-fake", "expiresIn": 21600})
+        elif caminho.endswith("/events/acknowledgment"):
+            self._responder(202)
+        elif caminho.startswith("/order/v1.0/orders/"):
+            order_id = caminho.split("/")[4]
+            if not order_id.rsplit("-", 1)[-1].isdigit():
+                return self._responder(404, {"message": "order not found"})
+            self.server.contadores["acoes"] += 1
+            self._responder(202)
+        else:
+            self._responder(404, {"message": "not found"})
+
+    def do_GET(self):
+        if self._falhar():
+            return
+        caminho = urlparse(self.path).path
+        if caminho.endswith("/events:polling"):
+            merchants = [m for m in (self.headers.get("x-polling-merchants") or "").split(",") if m]
+            if set(merchants) & self.server.merchants_recusados:
+                return self._responder(403, {"message": "merchant not authorized"})
+            self._responder(200, self.server.eventos(merchants))
+        elif caminho.endswith("/cancellationReasons"):
+            self._responder(200, _MOTIVOS)
+        elif caminho.startswith("/order/v1.0/orders/"):
+            order_id = caminho.rsplit("/", 1)[-1]
+            try:
+                i = int(order_id.rsplit("-", 1)[-1])
+            except ValueError:
+                return self._responder(404, {"message": "order not found"})
+            pedido = gerar_pedido(i)
+            etag = '"' + hashlib.sha1(json.dumps(pedido).encode("utf-8")).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.server.contadores["304"] += 1
+                return self._responder(304, headers={"ETag": etag})
+            self._responder(200, pedido, {"ETag": etag})
+        else:
+            self._responder(404, {"message": "not found"})
+
+class ServidorFake(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, latencia: float = 0.0, taxa_erro: float = 0.0, eventos_por_poll: int = 0):
+        super().__init__(endereco, _Handler)
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.eventos_por_poll = eventos_por_poll
+        self.contadores = {"requisicoes": 0, "429": 0, "500": 0, "304": 0, "acoes": 0}
+        self.merchants_recusados = set()  # merchants que fazem o polling responder 403
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def eventos(self, merchants=()):
+        "eventos_por_poll eventos por merchant do header (ou no total, sem header)."
+        merchants = list(merchants) or ["merchant-fake"]
+        n = self.eventos_por_poll * len(merchants)
+        with self._lock:
+            ini, self._seq = self._seq, self._seq + n
+        agora = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        return [{"id": f"evt-{i}", "code": "PLC", "fullCode": "PLACED", "orderId": f"order-{i:08d}",
+                 "merchantId": merchants[(i - ini) % len(merchants)], "createdAt": agora}
+                for i in range(ini, ini + n)]
+
+def iniciar_servidor(porta: int = 0, latencia: float = 0.0, taxa_erro: float = 0.0,
+                     eventos_por_poll: int = 0) -> Tuple[ServidorFake, str]:
+    "Sobe o servidor numa thread daemon. Devolve (servidor, base_url)."
+    srv = ServidorFake(("127.0.0.1", porta), latencia, taxa_erro, eventos_por_poll)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+if __name__ == "__main__":
+    import sys
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    latencia = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    taxa = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    srv, url = iniciar_servidor(porta, latencia, taxa, eventos_por_poll=5)
+    print(f"[fake] iFood falso em {url} (latência {latencia*1000:.0f}ms, erro {taxa:.0%})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,137 @@
+# ===========================
+# Stress de escritores concorrentes no dados.db
+#   python benchmarks/stress_banco.py [threads_escrita] [threads_leitura] [processos] [segundos]
+# Compara o journaling padrão (rollback journal, uma conexão por thread) com
+# banco.Banco (WAL + busy_timeout). Sai com código 1 se o Banco tiver
+# qualquer 'database is locked'.
+# ===========================
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from banco import Banco
+
+class _Padrao:
+    "Conexão por thread com os defaults do sqlite3 (journal DELETE, synchronous FULL)."
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+
+    def _c(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.caminho, timeout=0.1, isolation_level=None)
+        return conn
+
+    def execute(self, sql, *args):
+        cur = self._c().execute(sql, args)
+        return cur.fetchall() if cur.description else cur.rowcount
+
+    def transacao(self):
+        banco = self
+        class _Tx:
+            def __enter__(self):
+                banco._c().execute("BEGIN")
+            def __exit__(self, tipo, *_):
+                conn = banco._c()
+                try:
+                    conn.execute("ROLLBACK" if tipo else "COMMIT")
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+        return _Tx()
+
+def _preparar(caminho):
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("CREATE TABLE IF NOT EXISTS pedidos (id INTEGER PRIMARY KEY AUTOINCREMENT, pedido TEXT, "
+                 "quantidade INTEGER, estado TEXT, dia TEXT)")
+    conn.commit()
+    conn.close()
+
+def _carga(db, segundos, n_escrita, n_leitura):
+    stats = {"escritas": 0, "leituras": 0, "locked": 0, "outros": 0, "lat": []}
+    lock = threading.Lock()
+    fim = time.monotonic() + segundos
+
+    def escritor(k):
+        i = 0
+        while time.monotonic() < fim:
+            t0 = time.perf_counter()
+            try:
+                with db.transacao():
+                    db.execute("INSERT INTO pedidos (pedido, quantidade, estado, dia) VALUES (?,?,?,?)",
+                               f"item{k}-{i}", 1, "A Fazer", "2025-10-22")
+                    db.execute("UPDATE pedidos SET estado=? WHERE id=(SELECT MAX(id) FROM pedidos)", "Em Preparo")
+                with lock:
+                    stats["escritas"] += 1
+                    stats["lat"].append(time.perf_counter() - t0)
+            except sqlite3.OperationalError as e:
+                with lock:
+                    stats["locked" if "locked" in str(e) or "busy" in str(e) else "outros"] += 1
+            i += 1
+
+    def leitor():
+        while time.monotonic() < fim:
+            try:
+                db.execute("SELECT COUNT(*) FROM pedidos WHERE dia=? AND estado<>?", "2025-10-22", "Pronto")
+                with lock:
+                    stats["leituras"] += 1
+            except sqlite3.OperationalError as e:
+                with lock:
+                    stats["locked" if "locked" in str(e) else "outros"] += 1
+
+    ts = [threading.Thread(target=escritor, args=(k,)) for k in range(n_escrita)]
+    ts += [threading.Thread(target=leitor) for _ in range(n_leitura)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return stats
+
+def _processo(modo, caminho, segundos, n_escrita, n_leitura, fila):
+    db = Banco(caminho) if modo == "banco" else _Padrao(caminho)
+    st = _carga(db, segundos, n_escrita, n_leitura)
+    fila.put(st)
+
+def _rodar(modo, caminho, segundos, n_escrita, n_leitura, processos):
+    fila = multiprocessing.Queue()
+    ps = [multiprocessing.Process(target=_processo, args=(modo, caminho, segundos, n_escrita, n_leitura, fila))
+          for _ in range(processos)]
+    for p in ps:
+        p.start()
+    total = {"escritas": 0, "leituras": 0, "locked": 0, "outros": 0, "lat": []}
+    for _ in ps:
+        st = fila.get()
+        for k in total:
+            total[k] += st[k]
+    for p in ps:
+        p.join()
+    lat = sorted(total["lat"]) or [0.0]
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000
+    print(f"{modo:<8} escritas/s={total['escritas'] / segundos:9.0f}  leituras/s={total['leituras'] / segundos:9.0f}"
+          f"  locked={total['locked']:6d}  outros={total['outros']}  p99_escrita={p99:7.1f}ms")
+    return total
+
+def main():
+    n_escrita = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    n_leitura = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    processos = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    segundos = float(sys.argv[4]) if len(sys.argv) > 4 else 5
+    print(f"{processos} processo(s) x ({n_escrita} escritores + {n_leitura} leitores), {segundos}s")
+
+    for modo in ("padrao", "banco"):
+        caminho = os.path.join(tempfile.mkdtemp(prefix="stress_"), "dados.db")
+        _preparar(caminho)
+        total = _rodar(modo, caminho, segundos, n_escrita, n_leitura, processos)
+    sys.exit(1 if total["locked"] or total["outros"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# ===========================
+# CARDÁPIO - SNAPSHOT VERSIONADO (read-through)
+# ===========================
+# Cada getCardapio/get_cardapio de cada celular consultava e serializava o
+# cardápio inteiro de novo. Agora:
+#   - cardapio_versao : contador único no banco, incrementado por TRIGGERS em
+#                       cardapio e opcoes. Qualquer escrita (deleteAll.py,
+#                       /opcoes/bulk-update, /opcoes/sync-json, SQL manual)
+#                       invalida, inclusive vinda de outro processo
+#   - CacheCardapio   : por carrinho, guarda linhas + JSON já serializado (e o
+#                       gzip, feito uma vez sob demanda) da versão atual; cada
+#                       leitura custa só o SELECT da versão (chave primária)
+#   - cliente manda a versão que tem: igual => resposta "unchanged" (sem corpo)
+#
+# Uso no servidor do socket:
+#   cache_cardapio = CacheCardapio(db)
+#   @socketio.on('getCardapio')
+#   def get_cardapio(data):
+#       emit('respostaCardapio', cache_cardapio.resposta_socket(data.get('carrinho'), data.get('versao')))
+# e, numa rota HTTP: return cache_cardapio.resposta_http(request, carrinho)
+import os
+import gzip
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+TABELA_VERSAO = "cardapio_versao"
+TABELAS_VERSIONADAS = ("cardapio", "opcoes")
+GZIP_NIVEL = int(os.getenv("CARDAPIO_GZIP_NIVEL", "6"))
+
+def ensure_schema(db) -> List[str]:
+    "Cria o contador e os triggers nas tabelas que existirem. Retorna as tabelas cobertas."
+    db.execute(f"CREATE TABLE IF NOT EXISTS {TABELA_VERSAO} (id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL)")
+    db.execute(f"INSERT OR IGNORE INTO {TABELA_VERSAO} (id, versao) VALUES (1, 1)")
+    existentes = {r["name"] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    cobertas = []
+    for tabela in TABELAS_VERSIONADAS:
+        if tabela not in existentes:
+            continue
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            # FOR EACH STATEMENT não existe no SQLite: um UPDATE em massa incrementa
+            # N vezes, o que não importa (só a igualdade da versão é usada)
+            db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_versao_{op.lower()}
+            AFTER {op} ON {tabela}
+            BEGIN
+              UPDATE {TABELA_VERSAO} SET versao = versao + 1 WHERE id = 1;
+            END""")
+        cobertas.append(tabela)
+    return cobertas
+
+def versao_atual(db) -> int:
+    r = db.execute(f"SELECT versao FROM {TABELA_VERSAO} WHERE id = 1")
+    return r[0]["versao"] if r else 0
+
+def incrementar_versao(db) -> int:
+    "Para escritas que não passam pelas tabelas versionadas (ex.: imagens, categorias)."
+    db.execute(f"UPDATE {TABELA_VERSAO} SET versao = versao + 1 WHERE id = 1")
+    return versao_atual(db)
+
+def carregar_cardapio(db, carrinho: Optional[str]) -> List[dict]:
+    "Carregador padrão: o cardápio inteiro (o cardápio não varia por carrinho no schema atual)."
+    return db.execute("SELECT * FROM cardapio ORDER BY categoria_id, item")
+
+class Snapshot:
+    __slots__ = ("versao", "linhas", "json", "_gzip")
+
+    def __init__(self, versao: int, linhas: List[dict]):
+        self.versao = versao
+        self.linhas = linhas
+        self.json = json.dumps({"dataCardapio": linhas, "versao": versao},
+                               ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._gzip: Optional[bytes] = None
+
+    @property
+    def gzip(self) -> bytes:
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.json, GZIP_NIVEL, mtime=0)
+        return self._gzip
+
+class CacheCardapio:
+    def __init__(self, db, carregar: Callable[[Any, Optional[str]], List[dict]] = carregar_cardapio):
+        """
+        carregar(db, carrinho) -> linhas do cardápio daquele carrinho; o
+        servidor do socket pode passar a própria consulta.
+        """
+        self.db = db
+        self.carregar = carregar
+        ensure_schema(db)  # idempotente; garante os triggers antes da primeira leitura
+        self._lock = threading.Lock()
+        self._snapshots: Dict[Optional[str], Snapshot] = {}
+        self.stats = {"hits": 0, "recargas": 0, "inalterados": 0}
+
+    def obter(self, carrinho: Optional[str] = None) -> Snapshot:
+        versao = versao_atual(self.db)
+        snap = self._snapshots.get(carrinho)
+        if snap is not None and snap.versao == versao:
+            self.stats["hits"] += 1
+            return snap
+        with self._lock:  # uma recarga por vez; quem esperou reaproveita
+            snap = self._snapshots.get(carrinho)
+            if snap is None or snap.versao != versao:
+                versao = versao_atual(self.db)
+                snap = Snapshot(versao, self.carregar(self.db, carrinho))
+                self._snapshots[carrinho] = snap
+                self.stats["recargas"] += 1
+            else:
+                self.stats["hits"] += 1
+            return snap
+
+    def resposta_socket(self, carrinho: Optional[str] = None, versao_cliente: Any = None) -> dict:
+        """
+        Payload do emit('respostaCardapio'). Com a versão do cliente igual à
+        atual: {"unchanged": True, "versao": v}; senão {"dataCardapio", "versao"}
+        (a lista em memória é reaproveitada, sem nova consulta).
+        """
+        snap = self.obter(carrinho)
+        if _mesma_versao(versao_cliente, snap.versao):
+            self.stats["inalterados"] += 1
+            return {"unchanged": True, "versao": snap.versao}
+        return {"dataCardapio": snap.linhas, "versao": snap.versao}
+
+    def resposta_http(self, request, carrinho: Optional[str] = None):
+        """
+        Response do Flask com o JSON pré-serializado: ETag = versão, 304 se o
+        cliente mandar If-None-Match (ou ?versao=) igual, gzip se aceito.
+        """
+        from flask import Response
+        snap = self.obter(carrinho)
+        etag = f'"{snap.versao}"'
+        if request.headers.get("If-None-Match") == etag or _mesma_versao(request.args.get("versao"), snap.versao):
+            self.stats["inalterados"] += 1
+            return Response(status=304, headers={"ETag": etag})
+        usar_gzip = "gzip" in (request.headers.get("Accept-Encoding") or "")
+        resp = Response(snap.gzip if usar_gzip else snap.json, mimetype="application/json",
+                        headers={"ETag": etag, "Vary": "Accept-Encoding"})
+        if usar_gzip:
+            resp.headers["Content-Encoding"] = "gzip"
+        return resp
+
+    def limpar(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def status(self) -> dict:
+        return {**self.stats, "versao": versao_atual(self.db),
+                "carrinhos": {str(c): {"versao": s.versao, "linhas": len(s.linhas), "bytes": len(s.json),
+                                       "gzip_bytes": len(s._gzip) if s._gzip else None}
+                              for c, s in list(self._snapshots.items())}}
+
+def _mesma_versao(versao_cliente: Any, versao: int) -> bool:
+    try:
+        return versao_cliente is not None and int(versao_cliente) == versao
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,119 @@
+# ===========================
+# CACHE TTL + LRU (respostas do iFood)
+# ===========================
+# Dicionário ordenado com expiração por entrada e limite de tamanho (sai o
+# menos usado). Entradas vencidas não são apagadas na leitura: obter_entrada()
+# as devolve marcadas como vencidas, para quem quiser revalidar (ETag) ou
+# servir o último valor conhecido quando o iFood estiver lento.
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class Entrada:
+    __slots__ = ("valor", "expira_em", "etag", "gravado_em")
+
+    def __init__(self, valor: Any, expira_em: float, etag: Optional[str]):
+        self.valor = valor
+        self.expira_em = expira_em
+        self.etag = etag
+        self.gravado_em = time.monotonic()
+
+    @property
+    def vencida(self) -> bool:
+        return time.monotonic() >= self.expira_em
+
+class CacheTTL:
+    def __init__(self, ttl: float, max_itens: int, nome: str = "cache"):
+        self.ttl = ttl
+        self.max_itens = max(1, max_itens)
+        self.nome = nome
+        self._lock = threading.Lock()
+        self._itens: "OrderedDict[Hashable, Entrada]" = OrderedDict()
+        # chave -> nº de invalidações (ver gravar(geracao=...)); por chave, para um
+        # evento de um pedido não descartar as buscas em voo dos outros. Guarda
+        # só as max_itens chaves invalidadas mais recentes.
+        self._geracoes: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "vencidos": 0, "revalidados": 0,
+                      "despejados": 0, "invalidados": 0, "gravados": 0}
+
+    def obter_entrada(self, chave: Hashable) -> Optional[Entrada]:
+        "Entrada (mesmo vencida) ou None. Conta hit só para entrada válida."
+        with self._lock:
+            e = self._itens.get(chave)
+            if e is None:
+                self.stats["misses"] += 1
+                return None
+            self._itens.move_to_end(chave)
+            if e.vencida:
+                self.stats["vencidos"] += 1
+            else:
+                self.stats["hits"] += 1
+            return e
+
+    def obter(self, chave: Hashable) -> Any:
+        "Valor válido ou None."
+        e = self.obter_entrada(chave)
+        return None if e is None or e.vencida else e.valor
+
+    def espiar(self, chave: Hashable) -> Any:
+        "Valor (mesmo vencido) sem mexer em LRU nem contadores."
+        e = self._itens.get(chave)
+        return None if e is None else e.valor
+
+    def geracao(self, chave: Hashable) -> int:
+        "Geração atual da chave; leia antes de buscar o valor e passe para gravar()."
+        with self._lock:
+            return self._geracoes.get(chave, 0)
+
+    def gravar(self, chave: Hashable, valor: Any, etag: Optional[str] = None, ttl: Optional[float] = None,
+               geracao: Optional[int] = None) -> bool:
+        """
+        Grava a entrada. Com `geracao` (lida antes de buscar o valor), não grava
+        se a chave foi invalidada no meio-tempo: evita recolocar um valor velho
+        que foi buscado enquanto um evento invalidava a chave.
+        """
+        with self._lock:
+            if geracao is not None and geracao != self._geracoes.get(chave, 0):
+                return False
+            self._itens[chave] = Entrada(valor, time.monotonic() + (self.ttl if ttl is None else ttl), etag)
+            self._itens.move_to_end(chave)
+            self.stats["gravados"] += 1
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.stats["despejados"] += 1
+            return True
+
+    def renovar(self, chave: Hashable, ttl: Optional[float] = None) -> bool:
+        "Estende a validade (ex.: 304 Not Modified). False se a chave sumiu."
+        with self._lock:
+            e = self._itens.get(chave)
+            if e is None:
+                return False
+            e.expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self.stats["revalidados"] += 1
+            return True
+
+    def invalidar(self, chave: Hashable) -> bool:
+        with self._lock:
+            self._geracoes[chave] = self._geracoes.get(chave, 0) + 1
+            self._geracoes.move_to_end(chave)
+            if len(self._geracoes) > self.max_itens:
+                self._geracoes.popitem(last=False)
+            if self._itens.pop(chave, None) is None:
+                return False
+            self.stats["invalidados"] += 1
+            return True
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self.stats["hits"] + self.stats["misses"] + self.stats["vencidos"]
+            return {**self.stats, "itens": len(self._itens), "max_itens": self.max_itens, "ttl_s": self.ttl,
+                    "hit_rate": round(self.stats["hits"] / consultas, 4) if consultas else None}
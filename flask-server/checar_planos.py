@@ -0,0 +1,31 @@
+# ===========================
+# Regressão de planos: falha (exit 1) se alguma consulta quente de pedidos
+# voltar a fazer SCAN. Roda sobre uma CÓPIA do banco, com as migrações aplicadas.
+#   python checar_planos.py [caminho_do_banco]   (padrão: data/dados.db)
+# ===========================
+import os
+import sys
+import shutil
+import tempfile
+
+def main():
+    origem = sys.argv[1] if len(sys.argv) > 1 else "data/dados.db"
+    tmp = tempfile.mkdtemp(prefix="planos_")
+    copia = os.path.join(tmp, "dados.db")
+    if os.path.exists(origem):
+        shutil.copy(origem, copia)
+
+    os.environ["IFOOD_DB_PATH"] = copia
+    os.environ["IFOOD_POLLING_START"] = "0"
+    import ifoodHomologacao as ifood
+
+    regressoes = ifood.verificar_planos()
+    for nome in ifood.HOT_QUERIES_PEDIDOS:
+        status = "SCAN" if nome in regressoes else "ok"
+        print(f"[{status:>4}] {nome}" + (f"  -> {regressoes[nome]}" if nome in regressoes else ""))
+    ifood.stop_event_workers(timeout=1)
+    shutil.rmtree(tmp, ignore_errors=True)
+    sys.exit(1 if regressoes else 0)
+
+if __name__ == "__main__":
+    main()
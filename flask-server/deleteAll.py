@@ -1,117 +1,74 @@
-from cs50 import SQL
+from banco import conectar
+import cache_cardapio
+import opcoes_canonicas
+from opcoes_canonicas import _to_01
+from migracao_json import MigracaoJSON
 import os
+import sys
 import shutil
-import json
 
-def _to_float(x, default=0.0):
-    try:
-        return float(x)
-    except Exception:
-        return float(default)
+def garantir_obrigatorio_e_reabrir(data):
+    "Transform da migração: 'obrigatorio' em todo grupo (default 1) e esgotado=0 em todas as opções."
+    # Esperado: lista de grupos
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise ValueError(f"Formato inesperado em opcoes: {type(data)}")
 
-def _to_01(v, default=1):
-    """
-    Converte vários formatos (bool, str, num) em 0/1.
-    'true','sim','1' -> 1 ; 'false','nao','0' -> 0 ; caso indefinido -> default.
-    """
-    if isinstance(v, bool):
-        return 1 if v else 0
-    if isinstance(v, (int, float)):
-        return 1 if float(v) != 0.0 else 0
-    if isinstance(v, str):
-        s = v.strip().lower()
-        if s in ("1", "true", "verdadeiro", "sim", "yes", "y"):
-            return 1
-        if s in ("0", "false", "falso", "nao", "não", "no", "n"):
-            return 0
-    return int(default)
+    for grupo in data:
+        if not isinstance(grupo, dict):
+            continue
 
-def _load_json_relaxed(text):
-    """
-    Tenta fazer o parse do JSON de forma tolerante:
-    - primeiro json.loads normal
-    - se falhar, troca aspas simples por duplas
-    Retorna (obj, erro) onde obj é o JSON parseado ou None.
-    """
-    if text is None:
-        return None, None
-    try:
-        return json.loads(text), None
-    except Exception as e1:
-        try:
-            return json.loads(text.replace("'", '"')), None
-        except Exception as e2:
-            return None, (e1, e2)
+        # ✅ NOVO: garante 'obrigatorio' por grupo (default 1)
+        prev_obrig = grupo.get('obrigatorio', None)
+        novo_obrig = _to_01(prev_obrig, default=1)
+        if prev_obrig is None or _to_01(prev_obrig) != novo_obrig:
+            grupo['obrigatorio'] = novo_obrig
+
+        # Mantém tolerância para a chave de opções
+        options = grupo.get('options') or grupo.get('opcoes')
+        if not isinstance(options, list):
+            continue
+
+        # Continua colocando esgotado=0 em TODAS as options
+        for opt in options:
+            if isinstance(opt, dict) and opt.get('esgotado', None) != 0:
+                opt['esgotado'] = 0
+    return data
 
 def main():
+    dry_run = "--dry-run" in sys.argv
     # escolha do caminho do banco (mantendo sua lógica)
     var = False
     db_path = "/data/dados.db" if var else "data/dados.db"
     if var and not os.path.exists(db_path):
         shutil.copy("dados.db", db_path)
 
-    db = SQL("sqlite:///" + db_path)
-
-    # Buscamos id, item e opcoes do cardápio
-    rows = db.execute("SELECT id, item, opcoes FROM cardapio")
-
-    total, alterados, pulados = 0, 0, 0
-
-    for row in rows:
-        total += 1
-        opcoes_text = row.get('opcoes')
-        if not opcoes_text:
-            pulados += 1
-            continue
-
-        data, err = _load_json_relaxed(opcoes_text)
-        if data is None:
-            print(f"[WARN] Não foi possível ler JSON de opcoes (id={row['id']}, item='{row.get('item')}').")
-            pulados += 1
-            continue
-
-        # Esperado: lista de grupos
-        if not isinstance(data, list):
-            if isinstance(data, dict):
-                data = [data]
-            else:
-                print(f"[WARN] Formato inesperado em opcoes (id={row['id']}): {type(data)}")
-                pulados += 1
-                continue
-
-        mudou = False
-
-        for grupo in data:
-            if not isinstance(grupo, dict):
-                continue
-
-            # ✅ NOVO: garante 'obrigatorio' por grupo (default 1)
-            prev_obrig = grupo.get('obrigatorio', None)
-            novo_obrig = _to_01(prev_obrig, default=1)
-            if prev_obrig is None or _to_01(prev_obrig) != novo_obrig:
-                grupo['obrigatorio'] = novo_obrig
-                mudou = True
-
-            # Mantém tolerância para a chave de opções
-            options = grupo.get('options') or grupo.get('opcoes')
-            if not isinstance(options, list):
-                continue
-
-            # Continua colocando esgotado=0 em TODAS as options
-            for opt in options:
-                if isinstance(opt, dict):
-                    if opt.get('esgotado', None) != 0:
-                        opt['esgotado'] = 0
-                        mudou = True
-
-        if mudou:
-            novo_json = json.dumps(data, ensure_ascii=False)
-            db.execute("UPDATE cardapio SET opcoes = ? WHERE id = ?", novo_json, row['id'])
-            alterados += 1
-        else:
-            pulados += 1
-
-    print(f"[OK] Processados: {total} | Atualizados: {alterados} | Sem mudanças/ignorados: {pulados}")
+    db = conectar(db_path)
+    cache_cardapio.ensure_schema(db)  # as escritas abaixo invalidam o cardápio em cache
+
+    if opcoes_canonicas.instalada(db):
+        # fonte canônica: escreve nas tabelas; os triggers regeram cardapio.opcoes
+        if dry_run:
+            g = db.execute("SELECT COUNT(*) AS n FROM opcoes_grupos WHERE obrigatorio IS NULL")[0]["n"]
+            o = db.execute("SELECT COUNT(*) AS n FROM opcoes WHERE esgotado_bool IS NOT 0")[0]["n"]
+            print(f"[DRY-RUN] Grupos sem obrigatorio: {g} | Opções esgotadas: {o}")
+            return
+        with db.transacao():
+            g = db.execute("UPDATE opcoes_grupos SET obrigatorio = 1 WHERE obrigatorio IS NULL")
+            o = db.execute("UPDATE opcoes SET esgotado_bool = 0 WHERE esgotado_bool IS NOT 0")
+        print(f"[OK] Grupos com obrigatorio inicializado: {g} | Opções reabertas (esgotado=0): {o}")
+        print(f"[OK] Versão do cardápio: {cache_cardapio.versao_atual(db)}")
+        return
+
+    # JSON legado: motor de migração (chunks por keyset, transform em processos,
+    # um commit por chunk, checkpoint em migracoes_json, diff em opcoes_audit)
+    rel = MigracaoJSON(db, "deleteAll_obrigatorio_esgotado", garantir_obrigatorio_e_reabrir,
+                       dry_run=dry_run).executar()
+    print(f"[OK] Processados: {rel['lidas']} | Atualizados: {rel['alteradas']} | "
+          f"Erros: {rel['erros']} | Conflitos com o servidor: {rel['conflitos']}"
+          f"{' | DRY-RUN (diff em opcoes_audit)' if dry_run else ''}")
+    print(f"[OK] Versão do cardápio: {cache_cardapio.versao_atual(db)}")
 
     # --- OPCIONAL: Se você TAMBÉM tem uma coluna física 'obrigatorio' em cardapio e quer preencher com 1 ---
     """
@@ -0,0 +1,285 @@
+# ===========================
+# CARDÁPIO - DSL LEGADA DE OPÇÕES E INSTRUÇÕES (manipule.py)
+# ===========================
+# O dados_cardapio do manipule.py escreve as opções e o preparo em duas
+# mini-linguagens, que cada consumidor reinterpretava do seu jeito:
+#   opcoes     : 'Tamanho(300g-500g+18-1kg+65)Adicionais(cheddar e bacon+20)'
+#                grupo(opção[+valor_extra]-opção...) repetido; '-' separa,
+#                '+' final numérico é o valor extra, opção vazia é ignorada.
+#                Grupo de acréscimo (Adicionais, Complementos, Extras...) é
+#                opcional e aceita todas as opções; os demais, obrigatórios
+#                com uma escolha. Marcas no nome mudam isso: 'Molho?(...)'
+#                opcional, 'Extras!(...)' obrigatório, 'Frutas{2}(...)' até 2
+#   instrucoes : 'Modalidade: Batido - Passo 1: ... - Passo 2: ...'
+# Aqui as duas são lidas numa passada só (regex sobre os delimitadores, sem
+# split em cascata) e compiladas para:
+#   - o JSON de grupos já usado em cardapio.opcoes / pedidos.opcoes
+#     (nome, ids, options[nome, valor_extra, esgotado], max_selected, obrigatorio)
+#   - {"modalidade", "passos": [{"numero", "texto"}]} para as instruções
+#   - TabelaPrecos: preço base + extras por (grupo_slug, opcao_slug), com
+#     mínimo/máximo do item já calculados (compilar_cardapio acusa item cujo
+#     mínimo não bate com o preço do cardápio)
+# Texto que já é JSON passa direto; DSL malformada levanta ErroDSL com a posição.
+#
+#   python dsl_opcoes.py                      (compila o dados_cardapio do manipule.py)
+#   python dsl_opcoes.py 'Tamanho(300g-500g+18)Adicionais(bacon+20)'
+import os
+import re
+import ast
+import sys
+import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from opcoes_canonicas import slug
+
+VAZIOS = ("", "none", "null", "[]")
+
+_slug = lru_cache(maxsize=4096)(slug)  # nomes de grupo/opção se repetem em todo pedido
+
+# um grupo inteiro por match: nome(corpo), corpo sem parênteses
+_GRUPO = re.compile(r"\s*([^()]*?)\s*\(([^()]*)\)\s*")
+_NUMERO = re.compile(r"\s*\d+(?:[.,]\d+)?\s*")
+_PASSO = re.compile(r"[Pp]asso\s*(\d+)\s*:\s*")
+_MODALIDADE = re.compile(r"\s*(?:[Mm]odalidade\s*:\s*)+")
+# nome do grupo + marcas opcionais: '?' opcional, '!' obrigatório, '{n}' max_selected
+_MARCAS = re.compile(r"(.*?)\s*([?!])?\s*(?:\{\s*(\d+)\s*\})?", re.S)
+
+# grupos de acréscimo (por slug): opcionais e com escolha múltipla por padrão
+GRUPOS_ADICIONAIS = frozenset(("adicionais", "adicional", "complementos", "complemento",
+                               "extras", "extra", "acrescimos", "acrescimo"))
+
+class ErroDSL(ValueError):
+    def __init__(self, msg: str, texto: str, pos: int):
+        super().__init__(f"{msg} (posição {pos}: {texto[max(0, pos - 15):pos + 15]!r})")
+        self.pos = pos
+
+def _vazio(texto: Any) -> bool:
+    return texto is None or (isinstance(texto, str) and texto.strip().lower() in VAZIOS)
+
+# ---------------- Opções ----------------
+def _padrao(nome: str, n_opcoes: int) -> Tuple[int, int]:
+    "(obrigatorio, max_selected) de um grupo sem marcas."
+    if _slug(nome) in GRUPOS_ADICIONAIS:
+        return 0, n_opcoes
+    return 1, 1
+
+def _erro_grupo(texto: str, pos: int) -> ErroDSL:
+    "Diagnóstico de onde _GRUPO parou (só roda no caminho de erro)."
+    abre, fecha = texto.find("(", pos), texto.find(")", pos)
+    if abre < 0 and fecha < 0:
+        return ErroDSL("texto fora de grupo", texto, pos)
+    if fecha >= 0 and (abre < 0 or fecha < abre):
+        return ErroDSL("')' sem '(' correspondente", texto, fecha)
+    if fecha < 0:
+        return ErroDSL("grupo sem ')'", texto, len(texto))
+    return ErroDSL("'(' dentro de um grupo", texto, texto.find("(", abre + 1))
+
+def parse_opcoes(texto: Any) -> List[dict]:
+    """
+    DSL de opções -> lista de grupos no formato do JSON legado. Vazio/'None'
+    -> []; JSON (lista ou grupo) é devolvido como está.
+    """
+    if _vazio(texto):
+        return []
+    texto = str(texto)
+    if texto.lstrip()[:1] in ("[", "{"):
+        data = json.loads(texto)
+        return data if isinstance(data, list) else [data]
+    grupos: List[dict] = []
+    pos, fim = 0, len(texto)
+    while pos < fim:
+        m = _GRUPO.match(texto, pos)
+        if m is None:
+            raise _erro_grupo(texto, pos)
+        nome, corpo = m.groups()
+        nome, marca, maximo = _MARCAS.fullmatch(nome).groups()
+        if not nome:
+            raise ErroDSL("grupo sem nome", texto, m.start(2) - 1)
+        opcoes = []
+        for token in corpo.split("-"):
+            op, mais, valor = token.rpartition("+")
+            if mais and _NUMERO.fullmatch(valor):
+                op, valor = op.strip(), float(valor.replace(",", "."))
+            else:
+                op, valor = token.strip(), 0.0
+                if not op:
+                    continue  # 'banana-' (separador sobrando)
+            if not op:
+                raise ErroDSL("opção sem nome", texto, m.start(2))
+            opcoes.append({"nome": op, "valor_extra": valor, "esgotado": 0})
+        if not opcoes:
+            raise ErroDSL(f"grupo {nome!r} sem opções", texto, m.end(2))
+        obrigatorio, max_selected = _padrao(nome, len(opcoes))
+        if marca:
+            obrigatorio = 1 if marca == "!" else 0
+        if maximo is not None:
+            max_selected = int(maximo)
+        grupos.append({"nome": nome, "ids": "", "options": opcoes, "max_selected": max_selected,
+                       "obrigatorio": obrigatorio})
+        pos = m.end()
+    return grupos
+
+def renderizar_opcoes(grupos: Iterable[dict]) -> str:
+    "Inverso de parse_opcoes (para escrever de volta no formato do manipule.py)."
+    partes = []
+    for g in grupos:
+        ops = []
+        for o in g.get("options") or []:
+            v = float(o.get("valor_extra") or 0)
+            mais = o["nome"].rfind("+")
+            # 'x+1' sem valor precisa de '+0' explícito para não virar valor 1
+            if v or (mais >= 0 and _NUMERO.fullmatch(o["nome"], mais + 1)):
+                ops.append(f"{o['nome']}+{int(v) if v.is_integer() else v}")
+            else:
+                ops.append(o["nome"])
+        partes.append(f"{g['nome']}{_renderizar_marcas(g, len(ops))}({'-'.join(ops)})")
+    return "".join(partes)
+
+def _renderizar_marcas(g: dict, n_opcoes: int) -> str:
+    "Marcas só onde o grupo foge do padrão (ou o nome já termina como uma marca)."
+    obrigatorio = int(g.get("obrigatorio", 1) or 0)
+    max_selected = int(g.get("max_selected", 1) or 0)
+    padrao_obrig, padrao_max = _padrao(g["nome"], n_opcoes)
+    ambiguo = _MARCAS.fullmatch(g["nome"]).group(1) != g["nome"]
+    marca = ("!" if obrigatorio else "?") if ambiguo or obrigatorio != padrao_obrig else ""
+    return marca + (f"{{{max_selected}}}" if ambiguo or max_selected != padrao_max else "")
+
+@lru_cache(maxsize=1024)
+def opcoes_json(texto: Any) -> str:
+    "DSL -> texto JSON de cardapio.opcoes. Memoizado: o cardápio repete muito as mesmas strings."
+    return json.dumps(parse_opcoes(texto), ensure_ascii=False)
+
+# ---------------- Instruções ----------------
+def parse_instrucoes(texto: Any) -> Dict[str, Any]:
+    """
+    'Modalidade: X - Passo 1: ... - Passo 2: ...' -> {"modalidade", "passos"}.
+    Tolerante como os dados: 'Modalidade:' repetido, passo sem '-' antes
+    ('macerarPasso 5') e passos entre parênteses. Texto sem 'Passo N:' vira
+    um passo único.
+    """
+    if _vazio(texto):
+        return {"modalidade": None, "passos": []}
+    texto = str(texto)
+    m = _MODALIDADE.match(texto)
+    if m:
+        texto = texto[m.end():]
+    marcas = list(_PASSO.finditer(texto))
+    if not marcas:
+        return {"modalidade": None, "passos": [{"numero": 1, "texto": texto.strip(" -")}]}
+    cabeca = texto[:marcas[0].start()].rstrip(" -")
+    entre_parenteses = cabeca.endswith("(")
+    modalidade = cabeca.rstrip(" -(").strip() or None
+    passos = []
+    ultimo = len(marcas) - 1
+    for i, m in enumerate(marcas):
+        corpo = texto[m.end():marcas[i + 1].start() if i < ultimo else len(texto)].strip(" -")
+        if i == ultimo and entre_parenteses and corpo.endswith(")") and corpo.count(")") > corpo.count("("):
+            corpo = corpo[:-1].rstrip()
+        passos.append({"numero": int(m.group(1)), "texto": corpo})
+    return {"modalidade": modalidade, "passos": passos}
+
+# ---------------- Tabela de preços ----------------
+class TabelaPrecos:
+    __slots__ = ("base", "extras", "obrigatorios", "minimo", "maximo")
+
+    def __init__(self, base: float, grupos: List[dict]):
+        self.base = float(base or 0)
+        self.extras: Dict[Tuple[str, str], float] = {}
+        self.obrigatorios: List[str] = []
+        minimo = maximo = self.base
+        for g in grupos:
+            gs = _slug(g.get("nome"))
+            valores = []
+            for o in g.get("options") or []:
+                v = float(o.get("valor_extra") or 0)
+                self.extras[(gs, _slug(o.get("nome")))] = v
+                valores.append(v)
+            if not valores:
+                continue
+            if int(g.get("obrigatorio", 1) or 0):
+                self.obrigatorios.append(gs)
+                minimo += min(valores)
+            maximo += sum(sorted(valores, reverse=True)[:max(1, int(g.get("max_selected", 1) or 1))])
+        self.minimo = minimo
+        self.maximo = maximo
+
+    def extra(self, grupo: str, opcao: str) -> Optional[float]:
+        return self.extras.get((_slug(grupo), _slug(opcao)))
+
+    def preco(self, escolhas: Dict[str, Any]) -> float:
+        """
+        Preço unitário para {grupo: opção | [opções]} (nome ou slug).
+        Opção desconhecida levanta KeyError.
+        """
+        total = self.base
+        for grupo, opcoes in escolhas.items():
+            gs = _slug(grupo)
+            for op in (opcoes if isinstance(opcoes, (list, tuple)) else [opcoes]):
+                v = self.extras.get((gs, _slug(op)))
+                if v is None:
+                    raise KeyError(f"opção inexistente: {grupo}/{op}")
+                total += v
+        return total
+
+    def dict(self) -> Dict[str, Any]:
+        por_grupo: Dict[str, Dict[str, float]] = {}
+        for (g, o), v in self.extras.items():
+            por_grupo.setdefault(g, {})[o] = v
+        return {"base": self.base, "minimo": self.minimo, "maximo": self.maximo,
+                "obrigatorios": self.obrigatorios, "extras": por_grupo}
+
+# ---------------- Cardápio inteiro ----------------
+def compilar_item(row: dict) -> Dict[str, Any]:
+    "Linha do dados_cardapio (ou de cardapio) -> opções, instruções e preços compilados."
+    grupos = parse_opcoes(row.get("opcoes"))
+    return {"item": row.get("item"), "opcoes": grupos,
+            "instrucoes": parse_instrucoes(row.get("instrucoes")),
+            "precos": TabelaPrecos(row.get("preco"), grupos)}
+
+def compilar_cardapio(linhas: Iterable[dict]) -> Tuple[Dict[str, Dict[str, Any]], List[dict]]:
+    """
+    Compila todas as linhas; retorna ({item: compilado}, [erros]) sem parar no
+    primeiro erro. Também é erro o item cujo preço mínimo (base + a opção mais
+    barata de cada grupo obrigatório) difere do preço do cardápio: grupo de
+    acréscimo marcado como obrigatório, ou preço base desatualizado.
+    """
+    itens, erros = {}, []
+    for row in linhas:
+        try:
+            c = itens[row.get("item")] = compilar_item(row)
+        except (ErroDSL, ValueError) as e:
+            erros.append({"item": row.get("item"), "erro": str(e)})
+            continue
+        if row.get("preco") is not None and abs(c["precos"].minimo - c["precos"].base) > 0.005:
+            erros.append({"item": row.get("item"),
+                          "erro": f"preço mínimo {c['precos'].minimo:.2f} != preço {c['precos'].base:.2f} "
+                                  f"(obrigatórios: {', '.join(c['precos'].obrigatorios)})"})
+    return itens, erros
+
+def dados_do_manipule(caminho: Optional[str] = None) -> List[dict]:
+    """
+    Lê o dados_cardapio do manipule.py sem importá-lo: o import roda o script
+    (DROP TABLE no /data/dados.db).
+    """
+    caminho = caminho or os.path.join(os.path.dirname(os.path.abspath(__file__)), "manipule.py")
+    with open(caminho, encoding="utf-8") as f:
+        arvore = ast.parse(f.read(), caminho)
+    for no in arvore.body:
+        if isinstance(no, ast.Assign) and any(getattr(t, "id", None) == "dados_cardapio" for t in no.targets):
+            return ast.literal_eval(no.value)
+    return []
+
+def main(argv: List[str]):
+    if not argv:  # sem argumentos: valida o dados_cardapio inteiro
+        itens, erros = compilar_cardapio(dados_do_manipule())
+        print(f"{len(itens)} itens compilados, {len(erros)} erros")
+        for e in erros:
+            print(f"  {e['item']}: {e['erro']}")
+        return
+    for texto in argv:
+        grupos = parse_opcoes(texto)
+        print(json.dumps({"opcoes": grupos, "precos": TabelaPrecos(0, grupos).dict()}, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,338 @@
+# ===========================
+# EXPORTAÇÃO / IMPORTAÇÃO DE CARDÁPIO E ESTOQUE (NDJSON, CSV, Parquet)
+# ===========================
+# O estoque ia de um ambiente para outro copiando o print de dicts do
+# manipule.py (ramo else). Agora cada tabela vira um arquivo + um manifesto:
+#   - streaming   : leitura por keyset de rowid em chunks (sem carregar a
+#                   tabela), escrita chunk a chunk; no Parquet, um row group
+#                   por chunk; a exportação inteira lê um snapshot só (BEGIN)
+#   - tipos       : os valores passam pela afinidade da coluna (como o SQLite
+#                   faria ao inserir), então CSV/Parquet voltam com os mesmos
+#                   tipos; NULL no CSV é \N, e um texto que é \N de verdade
+#                   (ou \\N, \\\N...) ganha uma barra a mais na escrita
+#   - checksums   : sha256 por chunk das linhas canônicas, sha256 da tabela
+#                   (sobre os chunks) e sha256 do arquivo, no manifesto.json;
+#                   a importação confere tudo antes do COMMIT
+#   - importação  : uma transação por execução; substitui (padrão) ou
+#                   acrescenta; cria a tabela com o CREATE do manifesto se
+#                   não existir
+#
+#   python exportacao.py exportar  <pasta> [--formato ndjson|csv|parquet] [--tabelas a,b] [--banco caminho]
+#   python exportacao.py importar  <pasta> [--acrescentar] [--banco caminho]
+#   python exportacao.py verificar <pasta>
+import os
+import re
+import csv
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+EXPORT_CHUNK = int(os.getenv("EXPORT_CHUNK", "10000"))
+TABELAS_PADRAO = ("cardapio", "opcoes_grupos", "opcoes", "estoque", "estoque_geral")
+FORMATOS = {"ndjson": ".ndjson", "csv": ".csv", "parquet": ".parquet"}
+NULO_CSV = "\\N"
+_PARECE_NULO = re.compile(r"\\+N")  # textos que precisam de escape para não virar NULL
+MANIFESTO = "manifesto.json"
+
+_JSON = json.JSONEncoder(ensure_ascii=False)  # json.dumps(ensure_ascii=False) cria um encoder por chamada
+
+class ErroChecksum(ValueError):
+    pass
+
+# ---------------- Tipos (afinidade do SQLite) ----------------
+def afinidade(decl: Optional[str]) -> str:
+    "Regras de https://sqlite.org/datatype3.html#determination_of_column_affinity."
+    d = (decl or "").upper()
+    if "INT" in d:
+        return "INTEGER"
+    if "CHAR" in d or "CLOB" in d or "TEXT" in d:
+        return "TEXT"
+    if "BLOB" in d or not d:
+        return "BLOB"
+    if "REAL" in d or "FLOA" in d or "DOUB" in d:
+        return "REAL"
+    return "NUMERIC"
+
+def _para_texto(v):
+    if v is None or isinstance(v, str):
+        return v
+    return repr(v) if isinstance(v, float) else str(v)
+
+def _para_numero(v, real: bool):
+    if isinstance(v, str):
+        s = v.strip()
+        try:
+            v = int(s)
+        except ValueError:
+            try:
+                v = float(s)
+            except ValueError:
+                return v  # texto que não é número fica texto (como no SQLite)
+    if real:
+        return float(v) if isinstance(v, int) else v
+    if isinstance(v, float) and v.is_integer() and abs(v) < 2 ** 63:
+        return int(v)
+    return v
+
+def conversor(afin: str) -> Callable[[Any], Any]:
+    if afin == "TEXT":
+        return _para_texto
+    if afin == "REAL":
+        return lambda v: v if v is None or type(v) is float else _para_numero(v, True)
+    if afin in ("INTEGER", "NUMERIC"):
+        return lambda v: v if v is None or type(v) is int else _para_numero(v, False)
+    return lambda v: v
+
+def _normalizar(linhas: List[list], conversores: Sequence[Callable]) -> List[list]:
+    return [[c(v) for c, v in zip(conversores, linha)] for linha in linhas]
+
+def _sha_chunk(linhas: List[list]) -> str:
+    return hashlib.sha256(json.dumps(linhas, ensure_ascii=False, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def _sha_arquivo(caminho: str) -> str:
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+# ---------------- Leitura do banco ----------------
+def _q(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+def _colunas(db, tabela: str) -> List[dict]:
+    return [{"nome": c["name"], "tipo": c["type"] or "", "afinidade": afinidade(c["type"])}
+            for c in db.execute(f"PRAGMA table_info({tabela})")]
+
+def _linhas_do_banco(db, tabela: str, nomes: List[str], chunk: int) -> Iterator[List[list]]:
+    # cursor cru (tuplas): montar um dict por linha, como o db.execute faz, dobra o custo
+    conn = db.conexao()
+    sql = f"SELECT rowid, {', '.join(_q(n) for n in nomes)} FROM {tabela} WHERE rowid > ? ORDER BY rowid LIMIT ?"
+    ultimo = -2 ** 63
+    while True:
+        rows = conn.execute(sql, (ultimo, chunk)).fetchall()
+        if not rows:
+            return
+        ultimo = rows[-1][0]
+        yield [list(r[1:]) for r in rows]
+
+def _tipo_arrow(db, tabela: str, col: dict):
+    import pyarrow as pa
+    afin = col["afinidade"]
+    if afin == "TEXT":
+        return pa.string()
+    if afin == "REAL":
+        return pa.float64()
+    classes = {r["t"] for r in db.execute(f"SELECT DISTINCT typeof({_q(col['nome'])}) AS t FROM {tabela}")} - {"null"}
+    if afin in ("INTEGER", "NUMERIC"):
+        if "text" in classes or "blob" in classes:
+            return pa.string()  # a importação reconverte os números pela afinidade
+        return pa.float64() if "real" in classes else pa.int64()
+    if len(classes) > 1:
+        raise ValueError(f"{tabela}.{col['nome']} sem tipo declarado e com valores mistos ({classes}): use ndjson")
+    return {"integer": pa.int64(), "real": pa.float64(), "blob": pa.binary()}.get(next(iter(classes), "text"), pa.string())
+
+# ---------------- Escritores / leitores por formato ----------------
+def _csv_valor(v):
+    "None -> \\N; texto da forma \\...\\N ganha uma barra (não confunde com NULL)."
+    if v is None:
+        return NULO_CSV
+    if isinstance(v, str) and _PARECE_NULO.fullmatch(v):
+        return "\\" + v
+    return v
+
+def _csv_ler(v: str):
+    "Inverso de _csv_valor."
+    if v == NULO_CSV:
+        return None
+    if _PARECE_NULO.fullmatch(v):
+        return v[1:]
+    return v
+
+class _Escritor:
+    def __init__(self, caminho: str, formato: str, nomes: List[str], tipos_arrow=None):
+        self.formato, self.nomes = formato, nomes
+        if formato == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._pa = pa
+            self._schema = pa.schema(list(zip(nomes, tipos_arrow)))
+            self._w = pq.ParquetWriter(caminho, self._schema, compression="zstd")
+            return
+        self._f = open(caminho, "w", encoding="utf-8", newline="")
+        if formato == "csv":
+            self._csv = csv.writer(self._f)
+            self._csv.writerow(nomes)
+
+    def escrever(self, linhas: List[list]):
+        if self.formato == "parquet":
+            colunas = list(zip(*linhas)) if linhas else [[] for _ in self.nomes]
+            arrays = []
+            for valores, campo in zip(colunas, self._schema):
+                if self._pa.types.is_string(campo.type):
+                    valores = [_para_texto(v) for v in valores]
+                arrays.append(self._pa.array(valores, type=campo.type))
+            self._w.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+        elif self.formato == "csv":
+            self._csv.writerows([_csv_valor(v) for v in linha] for linha in linhas)
+        else:
+            nomes, enc = self.nomes, _JSON.encode
+            self._f.write("".join(enc(dict(zip(nomes, linha))) + "\n" for linha in linhas))
+
+    def fechar(self):
+        (self._w if self.formato == "parquet" else self._f).close()
+
+def _ler_arquivo(caminho: str, formato: str, nomes: List[str], chunk: int) -> Iterator[List[list]]:
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(caminho)
+        for i in range(pf.num_row_groups):  # um row group = um chunk da exportação
+            t = pf.read_row_group(i, columns=nomes)
+            yield [list(r) for r in zip(*(t.column(n).to_pylist() for n in nomes))]
+        return
+    with open(caminho, encoding="utf-8", newline="") as f:
+        if formato == "csv":
+            leitor = csv.reader(f)
+            cab = next(leitor)
+            if cab != nomes:
+                raise ValueError(f"{caminho}: cabeçalho {cab} != manifesto {nomes}")
+            fonte = ([_csv_ler(v) for v in r] for r in leitor)
+        else:
+            fonte = ([d.get(n) for n in nomes] for d in map(json.loads, f))
+        lote = []
+        for r in fonte:
+            lote.append(r)
+            if len(lote) >= chunk:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+
+# ---------------- Exportação ----------------
+def exportar(db, pasta: str, formato: str = "ndjson", tabelas: Optional[Sequence[str]] = None,
+             chunk: int = EXPORT_CHUNK) -> Dict[str, Any]:
+    "Exporta as tabelas para `pasta` (um arquivo por tabela + manifesto.json). Retorna o manifesto."
+    if formato not in FORMATOS:
+        raise ValueError(f"formato desconhecido: {formato} (use {', '.join(FORMATOS)})")
+    os.makedirs(pasta, exist_ok=True)
+    existentes = {r["name"]: r["sql"] for r in db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table'")}
+    tabelas = [t for t in (tabelas or TABELAS_PADRAO) if t in existentes]
+    manifesto = {"criado_em": datetime.now().isoformat(timespec="seconds"), "formato": formato,
+                 "chunk": chunk, "tabelas": {}}
+    conn = db.conexao()
+    # snapshot único de leitura para todas as tabelas; dentro de uma transação
+    # do chamador (ex.: db.transacao()) o snapshot já é o dela
+    propria = not conn.in_transaction
+    if propria:
+        conn.execute("BEGIN")
+    try:
+        for tabela in tabelas:
+            cols = _colunas(db, tabela)
+            nomes = [c["nome"] for c in cols]
+            convs = [conversor(c["afinidade"]) for c in cols]
+            tipos = [_tipo_arrow(db, tabela, c) for c in cols] if formato == "parquet" else None
+            arquivo = tabela + FORMATOS[formato]
+            esc = _Escritor(os.path.join(pasta, arquivo), formato, nomes, tipos)
+            chunks, total = [], 0
+            try:
+                for lote in _linhas_do_banco(db, tabela, nomes, chunk):
+                    lote = _normalizar(lote, convs)
+                    esc.escrever(lote)
+                    chunks.append(_sha_chunk(lote))
+                    total += len(lote)
+            finally:
+                esc.fechar()
+            manifesto["tabelas"][tabela] = {
+                "arquivo": arquivo, "create": existentes[tabela], "colunas": cols, "linhas": total,
+                "chunks": chunks, "sha256": hashlib.sha256("".join(chunks).encode()).hexdigest(),
+                "arquivo_sha256": _sha_arquivo(os.path.join(pasta, arquivo))}
+            print(f"[export] {tabela}: {total} linhas -> {arquivo}")
+    finally:
+        if propria:
+            conn.execute("COMMIT")
+    with open(os.path.join(pasta, MANIFESTO), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    return manifesto
+
+# ---------------- Importação ----------------
+def _carregar_manifesto(pasta: str) -> Dict[str, Any]:
+    with open(os.path.join(pasta, MANIFESTO), encoding="utf-8") as f:
+        return json.load(f)
+
+def _chunks_conferidos(pasta: str, manifesto: dict, tabela: str) -> Iterator[List[list]]:
+    "Lê o arquivo da tabela já convertido, conferindo arquivo e chunks contra o manifesto."
+    info = manifesto["tabelas"][tabela]
+    caminho = os.path.join(pasta, info["arquivo"])
+    if _sha_arquivo(caminho) != info["arquivo_sha256"]:
+        raise ErroChecksum(f"{info['arquivo']}: sha256 do arquivo não confere")
+    nomes = [c["nome"] for c in info["colunas"]]
+    convs = [conversor(c["afinidade"]) for c in info["colunas"]]
+    total = lidos = 0
+    for lote in _ler_arquivo(caminho, manifesto["formato"], nomes, manifesto["chunk"]):
+        lote = _normalizar(lote, convs)
+        if lidos >= len(info["chunks"]) or _sha_chunk(lote) != info["chunks"][lidos]:
+            raise ErroChecksum(f"{tabela}: chunk {lidos} (linhas {total}..{total + len(lote) - 1}) não confere")
+        total += len(lote)
+        lidos += 1
+        yield lote
+    if total != info["linhas"] or lidos != len(info["chunks"]):
+        raise ErroChecksum(f"{tabela}: {total} linhas lidas, manifesto diz {info['linhas']}")
+
+def verificar(pasta: str) -> Dict[str, int]:
+    "Confere todos os checksums sem tocar no banco. Retorna {tabela: linhas}."
+    manifesto = _carregar_manifesto(pasta)
+    return {t: sum(len(l) for l in _chunks_conferidos(pasta, manifesto, t)) for t in manifesto["tabelas"]}
+
+def importar(db, pasta: str, acrescentar: bool = False, tabelas: Optional[Sequence[str]] = None) -> Dict[str, int]:
+    """
+    Importa numa transação só: qualquer checksum divergente desfaz tudo.
+    Sem `acrescentar`, as tabelas importadas são esvaziadas antes.
+    """
+    manifesto = _carregar_manifesto(pasta)
+    tabelas = [t for t in (tabelas or manifesto["tabelas"]) if t in manifesto["tabelas"]]
+    existentes = {r["name"] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    resultado = {}
+    with db.transacao():
+        for tabela in tabelas:
+            info = manifesto["tabelas"][tabela]
+            if tabela not in existentes:
+                db.execute(info["create"])
+            no_banco = {c["name"] for c in db.execute(f"PRAGMA table_info({tabela})")}
+            nomes = [c["nome"] for c in info["colunas"]]
+            idx = [i for i, n in enumerate(nomes) if n in no_banco]  # coluna que sumiu do schema é ignorada
+            if not acrescentar:
+                db.execute(f"DELETE FROM {tabela}")
+            sql = (f"INSERT INTO {tabela} ({', '.join(_q(nomes[i]) for i in idx)}) "
+                   f"VALUES ({', '.join('?' * len(idx))})")
+            n = 0
+            for lote in _chunks_conferidos(pasta, manifesto, tabela):
+                db.executemany(sql, [[linha[i] for i in idx] for linha in lote])
+                n += len(lote)
+            resultado[tabela] = n
+            print(f"[import] {tabela}: {n} linhas")
+    return resultado
+
+# ---------------- CLI ----------------
+def main(argv: List[str]):
+    from banco import conectar
+    p = argparse.ArgumentParser(prog="exportacao.py")
+    p.add_argument("acao", choices=("exportar", "importar", "verificar"))
+    p.add_argument("pasta")
+    p.add_argument("--formato", default="ndjson", choices=tuple(FORMATOS))
+    p.add_argument("--tabelas", default=None, help="lista separada por vírgula")
+    p.add_argument("--banco", default="data/dados.db")
+    p.add_argument("--acrescentar", action="store_true")
+    a = p.parse_args(argv)
+    tabelas = a.tabelas.split(",") if a.tabelas else None
+    if a.acao == "verificar":
+        print(json.dumps(verificar(a.pasta), ensure_ascii=False))
+    elif a.acao == "exportar":
+        exportar(conectar(a.banco), a.pasta, a.formato, tabelas)
+    else:
+        importar(conectar(a.banco), a.pasta, a.acrescentar, tabelas)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
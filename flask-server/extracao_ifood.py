@@ -0,0 +1,308 @@
+# ===========================
+# IFOOD - EXTRAÇÃO DO PEDIDO (GET orders/{id} -> campos da comanda)
+# ===========================
+# Caminho rápido do extrair_pedido_ifood:
+#   - acessores pré-compilados para os caminhos aninhados do JSON (sem
+#     `(x.get(..) or {}).get(..)` alocando dicts vazios a cada nível)
+#   - itens/complementos/pagamentos/benefícios em classes com __slots__
+#   - texto do `extra` montado com join (sem += por complemento)
+#   - datas via isoformat fatiado em vez de dois strftime
+# para_dict() devolve exatamente o mesmo dicionário do extrator antigo, e
+# linhas() as mesmas tuplas que eram gravadas em pedidos/payments/benefits.
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import zoneinfo
+    tz_sp = zoneinfo.ZoneInfo("America/Sao_Paulo")
+except Exception:
+    tz_sp = timezone(timedelta(hours=-3))
+
+_VAZIO: Dict[str, Any] = {}
+_LISTA_VAZIA: List[Any] = []
+
+def _acessor(*caminho: str) -> Callable[[dict], Any]:
+    "Compila um caminho aninhado (ex.: 'customer', 'name') num getter que tolera None."
+    if len(caminho) == 1:
+        k0, = caminho
+        return lambda d: d.get(k0)
+    if len(caminho) == 2:
+        k0, k1 = caminho
+        return lambda d: (d.get(k0) or _VAZIO).get(k1)
+    def get(d):
+        for k in caminho[:-1]:
+            d = d.get(k) or _VAZIO
+        return d.get(caminho[-1])
+    return get
+
+_cliente_nome      = _acessor("customer", "name")
+_cliente_documento = _acessor("customer", "documentNumber")
+_sub_total         = _acessor("total", "subTotal")
+_order_amount      = _acessor("total", "orderAmount")
+_metodos_pagamento = _acessor("payments", "methods")
+_lista_beneficios  = _acessor("benefits", "benefits")
+_valor             = _acessor("amount", "value")
+
+# (chave de saída, chave no deliveryAddress), na ordem do dicionário antigo
+_CAMPOS_ENDERECO = (("rua", "streetName"), ("numero", "streetNumber"), ("bairro", "neighborhood"),
+                    ("cidade", "city"), ("estado", "state"), ("cep", "postalCode"),
+                    ("complemento", "complement"), ("referencia", "reference"))
+
+def parse_iso_br(dt_str: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    "ISO 8601 (UTC ou com offset) -> ('YYYY-MM-DD', 'HH:MM:SS') em America/Sao_Paulo."
+    if not dt_str:
+        return None, None
+    try:
+        iso = datetime.fromisoformat(dt_str.replace("Z", "+00:00")).astimezone(tz_sp).isoformat()
+        return iso[:10], iso[11:19]
+    except Exception:
+        return None, None
+
+# ---------------- Estruturas ----------------
+@dataclass
+class Customizacao:
+    __slots__ = ("nome", "grupo", "quantidade", "preco")
+    nome: Optional[str]
+    grupo: Optional[str]
+    quantidade: Any
+    preco: Any
+
+    def para_dict(self) -> dict:
+        return {"nome": self.nome, "grupo": self.grupo, "quantidade": self.quantidade, "preco": self.preco}
+
+@dataclass
+class Complemento:
+    __slots__ = ("nome", "grupo", "quantidade", "preco", "customizacoes")
+    nome: Optional[str]
+    grupo: Optional[str]
+    quantidade: Any
+    preco: Any
+    customizacoes: List[Customizacao]
+
+    def para_dict(self) -> dict:
+        return {"nome": self.nome, "grupo": self.grupo, "quantidade": self.quantidade, "preco": self.preco,
+                "customizacoes": [c.para_dict() for c in self.customizacoes]}
+
+@dataclass
+class ItemPedido:
+    __slots__ = ("produto", "quantidade", "preco_unit", "preco_total", "observacoes", "complementos")
+    produto: Optional[str]
+    quantidade: Any
+    preco_unit: Any
+    preco_total: Any
+    observacoes: Optional[str]
+    complementos: List[Complemento]
+
+    def extra(self) -> str:
+        "Observação + uma linha por complemento ('\\n<qtd> <nome>')."
+        comps = self.complementos
+        if not comps:
+            return self.observacoes or ""
+        partes = [self.observacoes or ""]
+        partes += [f"\n{c.quantidade} {c.nome}" for c in comps]
+        return "".join(partes)
+
+    def para_dict(self) -> dict:
+        return {"produto": self.produto, "quantidade": self.quantidade, "preco_unit": self.preco_unit,
+                "preco_total": self.preco_total, "observacoes": self.observacoes,
+                "complementos": [c.para_dict() for c in self.complementos]}
+
+@dataclass
+class Pagamento:
+    __slots__ = ("nome", "presencial", "bandeira", "adquirente", "valor", "liability")
+    nome: Optional[str]
+    presencial: int
+    bandeira: Optional[str]
+    adquirente: Optional[str]
+    valor: float
+    liability: Optional[str]
+
+    def para_dict(self) -> dict:
+        return {"nome": self.nome, "presencial": self.presencial, "bandeira": self.bandeira,
+                "adquirente": self.adquirente, "valor": self.valor, "liability": self.liability}
+
+@dataclass
+class Beneficio:
+    __slots__ = ("alvo", "responsavel", "valor")
+    alvo: Optional[str]
+    responsavel: Optional[str]
+    valor: float
+
+    def para_dict(self) -> dict:
+        return {"alvo": self.alvo, "responsavel": self.responsavel, "valor": self.valor}
+
+class PedidoExtraido:
+    """
+    Campos escalares são extraídos na hora. Itens, pagamentos e benefícios só
+    viram objetos (produtos/payments/beneficios) quando alguém pede; linhas()
+    monta as tuplas do banco direto do JSON, sem estruturas intermediárias.
+    """
+    __slots__ = ("pedido_id", "display_id", "cliente_nome", "cliente_documento",
+                 "valor_sem_taxas", "valor_com_taxas", "endereco", "pedido_data", "pedido_hora",
+                 "orderTiming", "agendamento_data", "agendamento_hora", "delivery_observations",
+                 "pickup_code", "takeout", "_order", "_produtos", "_payments", "_beneficios")
+
+    def __init__(self, order: Optional[dict] = None):
+        self._order = order
+        self._produtos: Optional[List[ItemPedido]] = None
+        self._payments: Optional[List[Pagamento]] = None
+        self._beneficios: Optional[List[Beneficio]] = None
+        if order is None:
+            return
+        delivery = order.get("delivery") or _VAZIO
+        addr = delivery.get("deliveryAddress") or _VAZIO
+        codigos = order.get("verificationCodes") or _VAZIO
+        self.pedido_id = order.get("id")
+        self.display_id = order.get("displayId")
+        self.cliente_nome = _cliente_nome(order)
+        self.cliente_documento = _cliente_documento(order)
+        self.valor_sem_taxas = _sub_total(order)
+        self.valor_com_taxas = _order_amount(order)
+        self.endereco = {k: addr.get(src) for k, src in _CAMPOS_ENDERECO}
+        self.pedido_data, self.pedido_hora = parse_iso_br(order.get("createdAt"))
+        self.orderTiming = order.get("orderTiming")
+        self.agendamento_data, self.agendamento_hora = parse_iso_br(delivery.get("deliveryDateTime"))
+        self.delivery_observations = delivery.get("observations")
+        self.pickup_code = codigos.get("takeout") or codigos.get("pickup") or codigos.get("code")
+        self.takeout = order.get("takeout") or {}
+
+    # ---------------- Coleções (materializadas sob demanda) ----------------
+    @property
+    def produtos(self) -> List[ItemPedido]:
+        if self._produtos is None:
+            self._produtos = [_item(it) for it in self._order.get("items", _LISTA_VAZIA)]
+        return self._produtos
+
+    @property
+    def payments(self) -> List[Pagamento]:
+        if self._payments is None:
+            self._payments = [Pagamento(*linha) for linha in _linhas_pagamento(self._order)]
+        return self._payments
+
+    @property
+    def beneficios(self) -> List[Beneficio]:
+        if self._beneficios is None:
+            self._beneficios = [Beneficio(*linha) for linha in _linhas_beneficio(self._order)]
+        return self._beneficios
+
+    def para_dict(self) -> dict:
+        "Mesmo formato (e ordem de chaves) do extrair_pedido_ifood original."
+        return {
+            "pedido_id": self.pedido_id,
+            "display_id": self.display_id,
+            "cliente_nome": self.cliente_nome,
+            "cliente_documento": self.cliente_documento,
+            "produtos": [i.para_dict() for i in self.produtos],
+            "valor_sem_taxas": self.valor_sem_taxas,
+            "valor_com_taxas": self.valor_com_taxas,
+            "endereco": dict(self.endereco),
+            "pedido_data": self.pedido_data,
+            "pedido_hora": self.pedido_hora,
+            "orderTiming": self.orderTiming,
+            "agendamento_data": self.agendamento_data,
+            "agendamento_hora": self.agendamento_hora,
+            "delivery_observations": self.delivery_observations,
+            "payments": [p.para_dict() for p in self.payments],
+            "beneficios": [b.para_dict() for b in self.beneficios],
+            "pickup_code": self.pickup_code,
+            "takeout": self.takeout,
+        }
+
+    def linhas(self) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+        "Linhas de pedidos / ifood_pedidos_payments / ifood_pedidos_benefits."
+        end = self.endereco
+        numero = str(end.get("numero") or "").strip()
+        rua = end.get("rua")
+        endereco = " ".join(s for s in (rua, numero) if s).strip() or "Retirada no balcão"
+
+        order_id = self.pedido_id
+        pedido_hora = self.pedido_hora
+        hora_entrega = self.agendamento_hora or pedido_hora
+        nome, dia, timing = self.cliente_nome, self.pedido_data, self.orderTiming
+        documento, coleta = self.cliente_documento or "", self.pickup_code or ""
+        fixo = (pedido_hora, "A Fazer")
+        resto = (nome, dia, timing, endereco, order_id, "IFOOD", hora_entrega, documento, coleta)
+
+        if self._produtos is None:  # direto do JSON
+            itens = [(get("name"), get("quantity", 1), get("totalPrice"), 3, *fixo, _extra_json(get), *resto)
+                     for get in (it.get for it in self._order.get("items", _LISTA_VAZIA))]
+        else:
+            itens = [(it.produto, it.quantidade, it.preco_total, 3, *fixo, it.extra(), *resto)
+                     for it in self._produtos]
+        if self._payments is None:
+            pagamentos = [(order_id, *linha) for linha in _linhas_pagamento(self._order)]
+        else:
+            pagamentos = [(order_id, p.nome, p.presencial, p.bandeira, p.adquirente, p.valor, p.liability)
+                          for p in self._payments]
+        if self._beneficios is None:
+            beneficios = [(order_id, *linha) for linha in _linhas_beneficio(self._order)]
+        else:
+            beneficios = [(order_id, b.alvo, b.responsavel, b.valor) for b in self._beneficios]
+        return itens, pagamentos, beneficios
+
+    @classmethod
+    def de_dict(cls, d: dict) -> "PedidoExtraido":
+        "Reconstrói a partir do dicionário de para_dict()/extrair_pedido_ifood."
+        p = cls()
+        for campo in ("pedido_id", "display_id", "cliente_nome", "cliente_documento", "valor_sem_taxas",
+                      "valor_com_taxas", "pedido_data", "pedido_hora", "orderTiming", "agendamento_data",
+                      "agendamento_hora", "delivery_observations", "pickup_code"):
+            setattr(p, campo, d.get(campo))
+        p.endereco = d.get("endereco") or {}
+        p.takeout = d.get("takeout") or {}
+        p._produtos = [
+            ItemPedido(i.get("produto"), i.get("quantidade", 1), i.get("preco_unit"), i.get("preco_total"),
+                       i.get("observacoes"),
+                       [Complemento(c.get("nome"), c.get("grupo"), c.get("quantidade", 1), c.get("preco"),
+                                    [Customizacao(x.get("nome"), x.get("grupo"), x.get("quantidade", 1),
+                                                  x.get("preco")) for x in c.get("customizacoes", [])])
+                        for c in i.get("complementos", [])])
+            for i in d.get("produtos", [])]
+        p._payments = [Pagamento(x["nome"], x["presencial"], x["bandeira"], x["adquirente"], x["valor"],
+                                 x["liability"]) for x in d.get("payments", [])]
+        p._beneficios = [Beneficio(x["alvo"], x["responsavel"], x["valor"]) for x in d.get("beneficios", [])]
+        return p
+
+# ---------------- Extração ----------------
+def _extra_json(get) -> str:
+    "ItemPedido.extra() direto do item bruto (get = item.get)."
+    obs = get("observations") or ""
+    opcoes = get("options")
+    if not opcoes:
+        return obs
+    return obs + "".join([f"\n{o.get('quantity', 1)} {o.get('name')}" for o in opcoes])
+
+def _linhas_pagamento(order: dict) -> List[tuple]:
+    out = []
+    for pm in _metodos_pagamento(order) or _LISTA_VAZIA:
+        card = pm.get("card") or _VAZIO
+        out.append((pm.get("name"), 1 if pm.get("inPerson") else 0, card.get("brand"),
+                    card.get("provider"), (_valor(pm) or 0) / 100.0, pm.get("liability")))
+    return out
+
+def _linhas_beneficio(order: dict) -> List[tuple]:
+    out = []
+    for b in _lista_beneficios(order) or _LISTA_VAZIA:
+        alvo = b.get("target")
+        for s in (b.get("sponsorships") or _LISTA_VAZIA):
+            out.append((alvo, s.get("liability"), (_valor(s) or 0) / 100.0))
+    return out
+
+def _item(it: dict) -> ItemPedido:
+    get = it.get
+    opcoes = get("options")
+    comps = []
+    for opt in opcoes or _LISTA_VAZIA:
+        og = opt.get
+        custs = og("customizations")
+        comps.append(Complemento(
+            og("name"), og("groupName"), og("quantity", 1), og("price"),
+            [Customizacao(c.get("name"), c.get("groupName"), c.get("quantity", 1), c.get("price"))
+             for c in custs] if custs else []))
+    return ItemPedido(get("name"), get("quantity", 1), get("unitPrice"), get("totalPrice"),
+                      get("observations"), comps)
+
+def extrair_pedido(order: dict) -> PedidoExtraido:
+    "JSON bruto de GET orders/{id} -> PedidoExtraido."
+    return PedidoExtraido(order)
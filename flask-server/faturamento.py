@@ -0,0 +1,340 @@
+# ===========================
+# FATURAMENTO - AGREGADOS PRÉ-CALCULADOS (dia / hora / categoria)
+# ===========================
+# faturamento_diario vinha vazio e o pedido `faturamento` do socket somava
+# pedidos/pagamentos inteiros a cada abertura do dashboard. Agora os agregados
+# são mantidos por triggers, no mesmo commit de quem escreve:
+#   - pedidos          : INSERT/UPDATE/DELETE somam/subtraem a contribuição da
+#                        linha em faturamento_diario, faturamento_horario e
+#                        faturamento_categoria (inclui os INSERTs do iFood em
+#                        pedido_detalhes/salvar_pedidos_em_lote)
+#   - pedidos_arquivo  : o DELETE de arquivar_pedidos não conta (a linha já está
+#                        no arquivo); UPDATE/DELETE no arquivo (cancelamento
+#                        tardio) ajustam o dia antigo
+#   - pagamentos       : faturamento realizado do salão
+# Contribuição de uma linha de pedidos (cancelada = zero):
+#   faturamento_previsto += preco         total_pedidos   += quantidade
+#   faturamento          += preco se iFood (pago na plataforma, tem order_id)
+#   total_drinks / total_porcoes / total_restantes pela categoria (barman /
+#   cozinha / demais)
+# e de pagamentos: faturamento += valor, menos os tipos em FATURAMENTO_TIPOS_FORA.
+# As mesmas expressões SQL alimentam os triggers e o backfill (pandas), então
+# as duas contas não divergem. Leituras do dashboard são O(dias).
+#
+#   python faturamento.py backfill  [--de AAAA-MM-DD] [--ate AAAA-MM-DD] [--banco data/dados.db]
+#   python faturamento.py verificar [--de ...] [--ate ...]
+#   python faturamento.py resumo    [--de ...] [--ate ...]
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+import particao_pedidos
+
+FATURAMENTO_CANCELADOS = tuple(e for e in os.getenv("FATURAMENTO_CANCELADOS", "Cancelado").split(",") if e)
+FATURAMENTO_TIPOS_FORA = tuple(t for t in os.getenv("FATURAMENTO_TIPOS_FORA", "desconto,caixinha").split(",") if t)
+CATEGORIA_DRINKS  = os.getenv("FATURAMENTO_CATEGORIA_DRINKS", "2")   # categorias.id do barman
+CATEGORIA_PORCOES = os.getenv("FATURAMENTO_CATEGORIA_PORCOES", "3")  # categorias.id da cozinha
+HORA_DESCONHECIDA = -1  # `inicio` vazio ou fora do formato HH:MM
+
+TABELA_DIA       = "faturamento_diario"
+TABELA_HORA      = "faturamento_horario"
+TABELA_CATEGORIA = "faturamento_categoria"
+
+COLUNAS_DIA = ("faturamento", "faturamento_previsto", "total_pedidos", "total_drinks", "total_porcoes",
+               "total_restantes")
+COLUNAS_VALOR = ("faturamento", "faturamento_previsto", "valor")  # arredondadas a centavos a cada soma
+
+# colunas de pedidos que mudam a contribuição; UPDATE só de estado entre estados
+# não cancelados (A Fazer -> Em Preparo -> Pronto) não dispara nada
+COLUNAS_GATILHO = ("dia", "inicio", "preco", "quantidade", "estado", "categoria", "order_id")
+
+# ---------------- Expressões (triggers e backfill) ----------------
+def _lista(valores: Tuple[str, ...]) -> str:
+    return ", ".join("'" + v.replace("'", "''") + "'" for v in valores) or "NULL"
+
+def _expr_pedido(r: str) -> Dict[str, str]:
+    "Contribuição da linha `r` (NEW/OLD/alias) de pedidos, uma expressão SQL por coluna."
+    ativo = f"COALESCE({r}.estado, '') NOT IN ({_lista(FATURAMENTO_CANCELADOS)})"
+    valor = f"(CASE WHEN {ativo} THEN COALESCE({r}.preco, 0) + 0 ELSE 0 END)"
+    itens = f"(CASE WHEN {ativo} THEN COALESCE({r}.quantidade, 0) + 0 ELSE 0 END)"
+    cat = f"COALESCE(CAST({r}.categoria AS TEXT), '')"
+    return {
+        "dia": f"{r}.dia",
+        "hora": (f"(CASE WHEN {r}.inicio GLOB '[0-9][0-9]:*' THEN CAST(substr({r}.inicio, 1, 2) AS INTEGER) "
+                 f"WHEN {r}.inicio GLOB '[0-9]:*' THEN CAST(substr({r}.inicio, 1, 1) AS INTEGER) "
+                 f"ELSE {HORA_DESCONHECIDA} END)"),
+        "categoria": cat,
+        "valor": valor,
+        "itens": itens,
+        "ifood": f"(CASE WHEN COALESCE({r}.order_id, '') != '' THEN {valor} ELSE 0 END)",
+    }
+
+def _expr_pagamento(r: str) -> Dict[str, str]:
+    return {"dia": f"{r}.dia",
+            "valor": (f"(CASE WHEN COALESCE({r}.tipo, '') NOT IN ({_lista(FATURAMENTO_TIPOS_FORA)}) "
+                      f"THEN COALESCE({r}.valor, 0) + 0 ELSE 0 END)")}
+
+def _somar(tabela: str, chave: Tuple[str, ...], valores: Dict[str, str], onde: str) -> str:
+    "UPSERT que soma `valores` (coluna -> expressão) na linha de `chave`."
+    cols = [c for c in valores if c not in chave]
+    sets = ", ".join(f"{c} = ROUND({c} + excluded.{c}, 2)" if c in COLUNAS_VALOR else f"{c} = {c} + excluded.{c}"
+                     for c in cols)
+    # o WHERE também desfaz a ambiguidade INSERT ... SELECT ... ON CONFLICT do SQLite
+    return (f"INSERT INTO {tabela} ({', '.join(chave + tuple(cols))}) "
+            f"SELECT {', '.join(valores[c] if c in valores else c for c in chave + tuple(cols))} "
+            f"WHERE {onde} ON CONFLICT({', '.join(chave)}) DO UPDATE SET {sets};")
+
+def _delta_pedido(r: str, sinal: str) -> str:
+    e = _expr_pedido(r)
+    s = sinal
+    onde = f"COALESCE({r}.dia, '') != ''"
+    cat, itens = e["categoria"], e["itens"]
+    dia = {
+        "dia": e["dia"],
+        "faturamento": f"{s}{e['ifood']}",
+        "faturamento_previsto": f"{s}{e['valor']}",
+        "total_pedidos": f"{s}{itens}",
+        "total_drinks": f"{s}(CASE WHEN {cat} = '{CATEGORIA_DRINKS}' THEN {itens} ELSE 0 END)",
+        "total_porcoes": f"{s}(CASE WHEN {cat} = '{CATEGORIA_PORCOES}' THEN {itens} ELSE 0 END)",
+        "total_restantes": f"{s}(CASE WHEN {cat} NOT IN ('{CATEGORIA_DRINKS}', '{CATEGORIA_PORCOES}') "
+                           f"THEN {itens} ELSE 0 END)",
+    }
+    sql = [_somar(TABELA_DIA, ("dia",), dia, onde)]
+    for tabela, chave in ((TABELA_HORA, "hora"), (TABELA_CATEGORIA, "categoria")):
+        sql.append(_somar(tabela, ("dia", chave),
+                          {"dia": e["dia"], chave: e[chave], "valor": f"{s}{e['valor']}", "itens": f"{s}{itens}"},
+                          onde))
+    return "\n  ".join(sql)
+
+def _delta_pagamento(r: str, sinal: str) -> str:
+    e = _expr_pagamento(r)
+    return _somar(TABELA_DIA, ("dia",), {"dia": e["dia"], "faturamento": f"{sinal}{e['valor']}"},
+                  f"COALESCE({r}.dia, '') != ''")
+
+def _mudou(tabela_expr) -> str:
+    "WHEN do UPDATE: alguma expressão de contribuição mudou entre OLD e NEW."
+    velho, novo = tabela_expr("OLD"), tabela_expr("NEW")
+    return " OR ".join(f"{velho[k]} IS NOT {novo[k]}" for k in velho)
+
+# ---------------- Schema ----------------
+def _existe(db, tabela: str) -> bool:
+    return bool(db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", tabela))
+
+def ensure_schema(db):
+    """
+    Cria as tabelas de agregados e (re)cria os triggers. Recriar é idempotente
+    e aplica mudanças de FATURAMENTO_* no ambiente. Garante pedidos_arquivo,
+    que o trigger de DELETE consulta.
+    """
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABELA_DIA} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dia DATE UNIQUE NOT NULL,
+        faturamento REAL DEFAULT 0,
+        faturamento_previsto REAL DEFAULT 0,
+        total_pedidos INTEGER DEFAULT 0,
+        total_drinks INTEGER DEFAULT 0,
+        total_porcoes INTEGER DEFAULT 0,
+        total_restantes INTEGER DEFAULT 0
+    )""")
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABELA_HORA} (
+        dia   TEXT    NOT NULL,
+        hora  INTEGER NOT NULL,
+        valor REAL    DEFAULT 0,
+        itens INTEGER DEFAULT 0,
+        PRIMARY KEY (dia, hora)
+    ) WITHOUT ROWID""")
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABELA_CATEGORIA} (
+        dia       TEXT NOT NULL,
+        categoria TEXT NOT NULL,
+        valor     REAL    DEFAULT 0,
+        itens     INTEGER DEFAULT 0,
+        PRIMARY KEY (dia, categoria)
+    ) WITHOUT ROWID""")
+    particao_pedidos.ensure_particao(db)
+
+    arquivo = particao_pedidos.TABELA_ARQUIVO
+    gatilho = ", ".join(COLUNAS_GATILHO)
+    triggers = {
+        "trg_fat_pedidos_ins": f"AFTER INSERT ON pedidos BEGIN\n  {_delta_pedido('NEW', '+')}\nEND",
+        "trg_fat_pedidos_upd": (f"AFTER UPDATE OF {gatilho} ON pedidos WHEN {_mudou(_expr_pedido)} BEGIN\n"
+                                f"  {_delta_pedido('OLD', '-')}\n  {_delta_pedido('NEW', '+')}\nEND"),
+        # arquivar_pedidos copia para o arquivo antes do DELETE: a linha continua contando
+        "trg_fat_pedidos_del": (f"AFTER DELETE ON pedidos "
+                                f"WHEN NOT EXISTS (SELECT 1 FROM {arquivo} WHERE id = OLD.id) BEGIN\n"
+                                f"  {_delta_pedido('OLD', '-')}\nEND"),
+        "trg_fat_arquivo_upd": (f"AFTER UPDATE OF {gatilho} ON {arquivo} WHEN {_mudou(_expr_pedido)} BEGIN\n"
+                                f"  {_delta_pedido('OLD', '-')}\n  {_delta_pedido('NEW', '+')}\nEND"),
+        "trg_fat_arquivo_del": f"AFTER DELETE ON {arquivo} BEGIN\n  {_delta_pedido('OLD', '-')}\nEND",
+    }
+    if _existe(db, "pagamentos"):
+        triggers.update({
+            "trg_fat_pagamentos_ins": f"AFTER INSERT ON pagamentos BEGIN\n  {_delta_pagamento('NEW', '+')}\nEND",
+            "trg_fat_pagamentos_upd": (f"AFTER UPDATE OF dia, valor, tipo ON pagamentos "
+                                       f"WHEN {_mudou(_expr_pagamento)} BEGIN\n"
+                                       f"  {_delta_pagamento('OLD', '-')}\n  {_delta_pagamento('NEW', '+')}\nEND"),
+            "trg_fat_pagamentos_del": f"AFTER DELETE ON pagamentos BEGIN\n  {_delta_pagamento('OLD', '-')}\nEND",
+        })
+    else:
+        print("[faturamento] tabela pagamentos ausente: faturamento realizado só do iFood")
+    with db.transacao():
+        for nome, corpo in triggers.items():
+            db.execute(f"DROP TRIGGER IF EXISTS {nome}")
+            db.execute(f"CREATE TRIGGER {nome} {corpo}")
+
+# ---------------- Backfill (pandas) ----------------
+def _filtro(de: Optional[str], ate: Optional[str], coluna: str = "dia") -> Tuple[str, list]:
+    onde, args = [f"COALESCE({coluna}, '') != ''"], []
+    if de:
+        onde.append(f"{coluna} >= ?")
+        args.append(de)
+    if ate:
+        onde.append(f"{coluna} <= ?")
+        args.append(ate)
+    return " AND ".join(onde), args
+
+def calcular(db, de: Optional[str] = None, ate: Optional[str] = None):
+    """
+    Agregados de [de, ate] recalculados das tabelas de origem (pedidos_todos e
+    pagamentos): três DataFrames (dia, dia+hora, dia+categoria) com as colunas
+    das tabelas. Uma leitura por tabela, groupby vetorizado.
+    """
+    import numpy as np
+    import pandas as pd
+
+    conn = db.conexao()
+    e = _expr_pedido("p")
+    onde, args = _filtro(de, ate, "p.dia")
+    cols = ("dia", "hora", "categoria", "valor", "itens", "ifood")
+    ped = pd.DataFrame(conn.execute(f"SELECT {', '.join(e[c] for c in cols)} FROM "
+                                    f"{particao_pedidos.VIEW_TODOS} p WHERE {onde}", args).fetchall(),
+                       columns=list(cols))
+    for c in ("valor", "itens", "ifood"):
+        ped[c] = pd.to_numeric(ped[c], errors="coerce").fillna(0)
+    cat = ped["categoria"].astype(str)
+    ped["total_drinks"] = np.where(cat == CATEGORIA_DRINKS, ped["itens"], 0)
+    ped["total_porcoes"] = np.where(cat == CATEGORIA_PORCOES, ped["itens"], 0)
+    ped["total_restantes"] = ped["itens"] - ped["total_drinks"] - ped["total_porcoes"]
+
+    dia = (ped.rename(columns={"ifood": "faturamento", "valor": "faturamento_previsto", "itens": "total_pedidos"})
+              .groupby("dia")[list(COLUNAS_DIA)].sum())
+    if _existe(db, "pagamentos"):
+        p = _expr_pagamento("g")
+        onde, args = _filtro(de, ate, "g.dia")
+        pag = pd.DataFrame(conn.execute(f"SELECT {p['dia']}, {p['valor']} FROM pagamentos g WHERE {onde}",
+                                        args).fetchall(), columns=["dia", "faturamento"])
+        pag["faturamento"] = pd.to_numeric(pag["faturamento"], errors="coerce").fillna(0)
+        dia = dia.add(pag.groupby("dia")[["faturamento"]].sum(), fill_value=0)
+    dia = dia.reindex(columns=list(COLUNAS_DIA), fill_value=0).fillna(0)
+    dia[["faturamento", "faturamento_previsto"]] = dia[["faturamento", "faturamento_previsto"]].round(2)
+
+    hora = ped.groupby(["dia", "hora"])[["valor", "itens"]].sum().round({"valor": 2})
+    categoria = ped.groupby(["dia", "categoria"])[["valor", "itens"]].sum().round({"valor": 2})
+    return dia.reset_index(), hora.reset_index(), categoria.reset_index()
+
+def _linhas(df, colunas) -> List[tuple]:
+    "Tuplas com tipos do Python (numpy.int64 não é aceito pelo sqlite3)."
+    return [tuple(v.item() if hasattr(v, "item") else v for v in r)
+            for r in df[list(colunas)].itertuples(index=False, name=None)]
+
+def backfill(db, de: Optional[str] = None, ate: Optional[str] = None) -> Dict[str, int]:
+    """
+    Recalcula os agregados de [de, ate] (padrão: tudo) e substitui o que havia
+    no intervalo. Leitura e escrita na mesma transação: pedidos gravados no
+    meio esperam o fim e entram pelos triggers.
+    """
+    t0 = time.perf_counter()
+    with db.transacao():
+        dia, hora, categoria = calcular(db, de, ate)
+        onde, args = _filtro(de, ate)
+        for tabela in (TABELA_DIA, TABELA_HORA, TABELA_CATEGORIA):
+            db.execute(f"DELETE FROM {tabela} WHERE {onde}", *args)
+        db.executemany(f"INSERT INTO {TABELA_DIA} (dia, {', '.join(COLUNAS_DIA)}) "
+                       f"VALUES ({', '.join('?' * (len(COLUNAS_DIA) + 1))})", _linhas(dia, ("dia",) + COLUNAS_DIA))
+        db.executemany(f"INSERT INTO {TABELA_HORA} (dia, hora, valor, itens) VALUES (?, ?, ?, ?)",
+                       _linhas(hora, ("dia", "hora", "valor", "itens")))
+        db.executemany(f"INSERT INTO {TABELA_CATEGORIA} (dia, categoria, valor, itens) VALUES (?, ?, ?, ?)",
+                       _linhas(categoria, ("dia", "categoria", "valor", "itens")))
+    rel = {"dias": len(dia), "horas": len(hora), "categorias": len(categoria)}
+    print(f"[faturamento] backfill {de or '...'}..{ate or '...'}: {rel['dias']} dia(s) "
+          f"em {(time.perf_counter() - t0) * 1000:.1f}ms")
+    return rel
+
+def instalar(db) -> Dict[str, int]:
+    "ensure_schema + backfill de todo o histórico (migração de schema)."
+    ensure_schema(db)
+    return backfill(db)
+
+def verificar(db, de: Optional[str] = None, ate: Optional[str] = None) -> List[Dict[str, Any]]:
+    "Dias em que faturamento_diario difere do recálculo a partir das tabelas de origem."
+    calculado = {r["dia"]: r for r in calcular(db, de, ate)[0].to_dict("records")}
+    onde, args = _filtro(de, ate)
+    gravado = {r["dia"]: r for r in db.execute(f"SELECT dia, {', '.join(COLUNAS_DIA)} FROM {TABELA_DIA} "
+                                                f"WHERE {onde}", *args)}
+    difs = []
+    for d in sorted(set(calculado) | set(gravado)):
+        a, b = gravado.get(d) or {}, calculado.get(d) or {}
+        cols = [c for c in COLUNAS_DIA if abs((a.get(c) or 0) - (b.get(c) or 0)) > 0.005]
+        if cols:
+            difs.append({"dia": d, "colunas": {c: {"gravado": a.get(c), "calculado": b.get(c)} for c in cols}})
+    return difs
+
+# ---------------- Leitura (dashboard) ----------------
+def serie(db, de: Optional[str] = None, ate: Optional[str] = None) -> List[Dict[str, Any]]:
+    onde, args = _filtro(de, ate)
+    return db.execute(f"SELECT dia, {', '.join(COLUNAS_DIA)} FROM {TABELA_DIA} WHERE {onde} ORDER BY dia", *args)
+
+def por_hora(db, de: Optional[str] = None, ate: Optional[str] = None) -> List[Dict[str, Any]]:
+    onde, args = _filtro(de, ate)
+    return db.execute(f"SELECT hora, ROUND(SUM(valor), 2) AS valor, SUM(itens) AS itens FROM {TABELA_HORA} "
+                      f"WHERE {onde} GROUP BY hora ORDER BY hora", *args)
+
+def por_categoria(db, de: Optional[str] = None, ate: Optional[str] = None) -> List[Dict[str, Any]]:
+    onde, args = _filtro(de, ate, "f.dia")
+    return db.execute(f"SELECT f.categoria, c.categoria AS nome, ROUND(SUM(f.valor), 2) AS valor, "
+                      f"SUM(f.itens) AS itens FROM {TABELA_CATEGORIA} f "
+                      f"LEFT JOIN categorias c ON CAST(c.id AS TEXT) = f.categoria "
+                      f"WHERE {onde} GROUP BY f.categoria ORDER BY valor DESC", *args)
+
+def resumo(db, de: Optional[str] = None, ate: Optional[str] = None) -> Dict[str, Any]:
+    "Payload do pedido `faturamento` do socket: série diária, totais, hora e categoria."
+    dias = serie(db, de, ate)
+    total = {c: sum(d[c] or 0 for d in dias) for c in COLUNAS_DIA}
+    for c in ("faturamento", "faturamento_previsto"):
+        total[c] = round(total[c], 2)
+    try:
+        categorias = por_categoria(db, de, ate)
+    except Exception:
+        categorias = []  # banco sem a tabela categorias
+    return {"de": de, "ate": ate, "dias": dias, "total": total, "por_hora": por_hora(db, de, ate),
+            "por_categoria": categorias}
+
+# ---------------- CLI ----------------
+def main(argv: List[str]):
+    from banco import conectar
+    ap = argparse.ArgumentParser(description="Agregados de faturamento (dia/hora/categoria)")
+    ap.add_argument("acao", choices=("backfill", "verificar", "resumo"))
+    ap.add_argument("--de")
+    ap.add_argument("--ate")
+    ap.add_argument("--banco", default="data/dados.db")
+    a = ap.parse_args(argv)
+    db = conectar(a.banco)
+    ensure_schema(db)
+    if a.acao == "backfill":
+        backfill(db, a.de, a.ate)
+    elif a.acao == "verificar":
+        difs = verificar(db, a.de, a.ate)
+        for d in difs:
+            print(json.dumps(d, ensure_ascii=False))
+        print(f"[faturamento] {len(difs)} dia(s) divergente(s)")
+        sys.exit(1 if difs else 0)
+    else:
+        print(json.dumps(resumo(db, a.de, a.ate), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
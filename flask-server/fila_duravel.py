@@ -0,0 +1,246 @@
+# ===========================
+# FILA DURÁVEL DE EVENTOS (SQLite)
+# ===========================
+# Substitui a fila em memória dos workers: o evento só sai da tabela depois de
+# processado, então um restart não perde pedidos já confirmados (ACK) no iFood.
+#   - publicar / publicar_lote : append (INSERT, um executemany por lote)
+#   - reservar(n)              : lease em lote com visibility timeout; só a
+#                                cabeça de cada chave (orderId) é entregue e
+#                                nunca duas mensagens da mesma chave em voo
+#   - confirmar(msgs)          : apaga as processadas (um DELETE por lote)
+#   - renovar(msgs)            : estende o lease de quem ainda está processando
+#   - falhar(msg, erro)        : tentativas+1 e backoff; passou do limite (ou
+#                                erro definitivo) vai para a tabela de mortos
+# Lease vencido (worker morreu, processo caiu) volta a ficar visível sozinho.
+# Cada reserva grava um dono único (processo + nº do lease) e confirmar/falhar
+# só mexem em linhas que ainda são desse lease: quem perdeu o lease (demorou
+# mais que a visibilidade e outro worker pegou a mensagem) não apaga nem
+# reagenda o trabalho do outro.
+import os
+import json
+import time
+import socket
+import itertools
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+VISIBILIDADE_S  = float(os.getenv("IFOOD_FILA_VISIBILIDADE", "120"))
+TENTATIVAS_MAX  = int(os.getenv("IFOOD_FILA_TENTATIVAS", "5"))
+BACKOFF_BASE_S  = float(os.getenv("IFOOD_FILA_BACKOFF_BASE", "2"))
+BACKOFF_MAX_S   = float(os.getenv("IFOOD_FILA_BACKOFF_MAX", "300"))
+
+class Mensagem:
+    __slots__ = ("id", "chave", "payload", "tentativas", "criado_em", "dono")
+
+    def __init__(self, id: int, chave: str, payload: Any, tentativas: int, criado_em: float,
+                 dono: Optional[str] = None):
+        self.id = id
+        self.chave = chave
+        self.payload = payload
+        self.tentativas = tentativas
+        self.criado_em = criado_em
+        self.dono = dono  # lease que reservou a mensagem
+
+class FilaDuravel:
+    def __init__(self, db, tabela: str = "ifood_fila_eventos", tabela_mortos: str = "ifood_fila_mortos",
+                 visibilidade: float = VISIBILIDADE_S, tentativas_max: int = TENTATIVAS_MAX):
+        self.db = db
+        self.tabela = tabela
+        self.tabela_mortos = tabela_mortos
+        self.visibilidade = visibilidade
+        self.tentativas_max = tentativas_max
+        self.dono = f"{socket.gethostname()}:{os.getpid()}"
+        self._leases = itertools.count(1)
+        self._cv = threading.Condition()
+        self._sinal = 0  # incrementado a cada publicação (acorda quem espera)
+        self.stats = {"publicados": 0, "reservados": 0, "confirmados": 0, "falhas": 0, "mortos": 0,
+                      "lease_perdido": 0}
+
+        t = tabela
+        self._sql_inserir = f"INSERT INTO {t} (chave, payload, criado_em, visivel_em) VALUES (?,?,?,?)"
+        # cabeça de cada chave que está visível; como a mensagem em lease fica
+        # com visivel_em no futuro, a chave inteira fica bloqueada até confirmar
+        self._sql_cabecas = (
+            f"SELECT id, chave, payload, tentativas, criado_em FROM {t} f "
+            f"WHERE visivel_em <= ? AND id = (SELECT MIN(id) FROM {t} g WHERE g.chave = f.chave) "
+            f"ORDER BY id LIMIT ?")
+
+    def ensure_schema(self):
+        self.db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {self.tabela} (
+          id          INTEGER PRIMARY KEY AUTOINCREMENT,
+          chave       TEXT NOT NULL,
+          payload     TEXT NOT NULL,
+          tentativas  INTEGER NOT NULL DEFAULT 0,
+          criado_em   REAL NOT NULL,
+          visivel_em  REAL NOT NULL,
+          dono        TEXT,
+          ultimo_erro TEXT
+        )""")
+        self.db.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.tabela}_chave ON {self.tabela} (chave, id)")
+        self.db.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.tabela}_visivel ON {self.tabela} (visivel_em)")
+        self.db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {self.tabela_mortos} (
+          id          INTEGER PRIMARY KEY,
+          chave       TEXT,
+          payload     TEXT,
+          tentativas  INTEGER,
+          criado_em   REAL,
+          morto_em    TEXT,
+          ultimo_erro TEXT
+        )""")
+
+    # ---------------- Produção ----------------
+    def publicar(self, chave: str, payload: Any) -> int:
+        agora = time.time()
+        mid = self.db.execute(self._sql_inserir, chave, json.dumps(payload, ensure_ascii=False), agora, agora)
+        self.stats["publicados"] += 1
+        self._avisar()
+        return mid
+
+    def publicar_lote(self, itens: Sequence[Tuple[str, Any]], serializados: Optional[Sequence[str]] = None) -> int:
+        """
+        itens: [(chave, payload)]. `serializados`, se vier, traz o JSON de cada
+        payload já pronto (ex.: trecho do corpo do webhook) e evita o json.dumps.
+        """
+        if not itens:
+            return 0
+        agora = time.time()
+        if serializados is None:
+            serializados = [json.dumps(p, ensure_ascii=False) for _, p in itens]
+        with self.db.transacao():
+            self.db.executemany(self._sql_inserir,
+                                [(c, txt, agora, agora) for (c, _), txt in zip(itens, serializados)])
+        self.stats["publicados"] += len(itens)
+        self._avisar()
+        return len(itens)
+
+    def _avisar(self):
+        with self._cv:
+            self._sinal += 1
+            self._cv.notify_all()
+
+    # ---------------- Consumo ----------------
+    def reservar(self, n: int = 1, visibilidade: Optional[float] = None) -> List[Mensagem]:
+        "Pega até n mensagens (uma por chave) e as esconde por `visibilidade` segundos."
+        agora = time.time()
+        dono = f"{self.dono}:{next(self._leases)}"
+        with self.db.transacao():  # BEGIN IMMEDIATE: dois workers não pegam a mesma linha
+            rows = self.db.execute(self._sql_cabecas, agora, n)
+            if not rows:
+                return []
+            ids = [r["id"] for r in rows]
+            self.db.execute(
+                f"UPDATE {self.tabela} SET visivel_em = ?, dono = ? WHERE id IN ({','.join('?' * len(ids))})",
+                agora + (visibilidade or self.visibilidade), dono, *ids)
+        self.stats["reservados"] += len(rows)
+        return [Mensagem(r["id"], r["chave"], json.loads(r["payload"]), r["tentativas"], r["criado_em"], dono)
+                for r in rows]
+
+    def esperar(self, timeout: float) -> bool:
+        "Bloqueia até alguém publicar (ou timeout). Usado pelos workers com a fila vazia."
+        with self._cv:
+            sinal = self._sinal
+            return self._cv.wait_for(lambda: self._sinal != sinal, timeout)
+
+    def confirmar(self, msgs: Sequence[Mensagem]) -> int:
+        """
+        Apaga as mensagens processadas, só se ainda estão no lease que as
+        reservou. Retorna quantas saíram; as que faltam tinham perdido o lease.
+        """
+        if not msgs:
+            return 0
+        por_dono: Dict[Optional[str], List[int]] = {}
+        for m in msgs:
+            por_dono.setdefault(m.dono, []).append(m.id)
+        n = 0
+        for dono, ids in por_dono.items():
+            for i in range(0, len(ids), 900):
+                chunk = ids[i:i + 900]
+                n += self.db.execute(f"DELETE FROM {self.tabela} WHERE dono IS ? "
+                                     f"AND id IN ({','.join('?' * len(chunk))})", dono, *chunk) or 0
+        self.stats["confirmados"] += n
+        if n < len(msgs):
+            self.stats["lease_perdido"] += len(msgs) - n
+            print(f"[fila] {len(msgs) - n} mensagem(ns) confirmada(s) fora do lease em {self.tabela}")
+        self._avisar()  # libera a próxima mensagem das mesmas chaves
+        return n
+
+    def renovar(self, msgs: Sequence[Mensagem], visibilidade: Optional[float] = None) -> int:
+        """
+        Estende o lease de mensagens ainda em processamento por mais
+        `visibilidade` segundos. Só as que continuam com o mesmo dono; retorna
+        quantas foram renovadas.
+        """
+        if not msgs:
+            return 0
+        ate = time.time() + (visibilidade or self.visibilidade)
+        por_dono: Dict[Optional[str], List[int]] = {}
+        for m in msgs:
+            por_dono.setdefault(m.dono, []).append(m.id)
+        n = 0
+        for dono, ids in por_dono.items():
+            for i in range(0, len(ids), 900):
+                chunk = ids[i:i + 900]
+                n += self.db.execute(f"UPDATE {self.tabela} SET visivel_em = ? WHERE dono IS ? "
+                                     f"AND id IN ({','.join('?' * len(chunk))})", ate, dono, *chunk) or 0
+        return n
+
+    def falhar(self, msg: Mensagem, erro: str, definitivo: bool = False) -> bool:
+        """
+        Registra a falha. Retorna True se a mensagem foi para os mortos
+        (esgotou as tentativas ou `definitivo`); senão volta a ficar visível
+        após o backoff. Fora do lease (outro worker já a pegou) não faz nada.
+        """
+        tentativas = msg.tentativas + 1
+        self.stats["falhas"] += 1
+        erro = (erro or "")[:500]
+        if definitivo or tentativas >= self.tentativas_max:
+            with self.db.transacao():
+                self.db.execute(
+                    f"INSERT OR REPLACE INTO {self.tabela_mortos} "
+                    f"(id, chave, payload, tentativas, criado_em, morto_em, ultimo_erro) "
+                    f"SELECT id, chave, payload, ?, criado_em, datetime('now'), ? FROM {self.tabela} "
+                    f"WHERE id = ? AND dono IS ?", tentativas, erro, msg.id, msg.dono)
+                n = self.db.execute(f"DELETE FROM {self.tabela} WHERE id = ? AND dono IS ?", msg.id, msg.dono)
+            if not n:
+                self.stats["lease_perdido"] += 1
+                return False
+            self.stats["mortos"] += 1
+            self._avisar()
+            return True
+        espera = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** (tentativas - 1)))
+        n = self.db.execute(
+            f"UPDATE {self.tabela} SET tentativas = ?, visivel_em = ?, dono = NULL, ultimo_erro = ? "
+            f"WHERE id = ? AND dono IS ?", tentativas, time.time() + espera, erro, msg.id, msg.dono)
+        if not n:
+            self.stats["lease_perdido"] += 1
+        return False
+
+    # ---------------- Manutenção ----------------
+    def reprocessar_mortos(self, ids: Optional[Sequence[int]] = None) -> int:
+        "Devolve mensagens mortas para a fila (todas, ou só `ids`), zerando tentativas."
+        filtro, args = "", []
+        if ids:
+            filtro, args = f" WHERE id IN ({','.join('?' * len(ids))})", list(ids)
+        agora = time.time()
+        with self.db.transacao():
+            n = self.db.execute(f"SELECT COUNT(*) AS n FROM {self.tabela_mortos}{filtro}", *args)[0]["n"]
+            self.db.execute(
+                f"INSERT INTO {self.tabela} (chave, payload, criado_em, visivel_em) "
+                f"SELECT chave, payload, criado_em, ? FROM {self.tabela_mortos}{filtro} ORDER BY id", agora, *args)
+            self.db.execute(f"DELETE FROM {self.tabela_mortos}{filtro}", *args)
+        self._avisar()
+        return n
+
+    def status(self) -> Dict[str, Any]:
+        agora = time.time()
+        r = self.db.execute(
+            f"SELECT COUNT(*) AS total, COUNT(DISTINCT chave) AS chaves, "
+            f"SUM(CASE WHEN dono IS NOT NULL AND visivel_em > ? THEN 1 ELSE 0 END) AS em_voo, "
+            f"SUM(CASE WHEN tentativas > 0 THEN 1 ELSE 0 END) AS com_retentativa, "
+            f"MIN(criado_em) AS mais_antiga FROM {self.tabela}", agora)[0]
+        mortos = self.db.execute(f"SELECT COUNT(*) AS n FROM {self.tabela_mortos}")[0]["n"]
+        return {**self.stats, "profundidade": r["total"], "chaves": r["chaves"], "em_voo": r["em_voo"] or 0,
+                "com_retentativa": r["com_retentativa"] or 0, "mortos_total": mortos,
+                "idade_max_s": round(agora - r["mais_antiga"], 1) if r["mais_antiga"] else 0.0}
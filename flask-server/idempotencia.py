@@ -0,0 +1,237 @@
+# ===========================
+# IDEMPOTÊNCIA DE EVENTOS (ifood_events)
+# ===========================
+# Filtro em memória na frente da tabela ifood_events:
+#   1) LRU limitado com os ids mais recentes       -> duplicado certo, sem banco
+#   2) Bloom filter com todos os ids da janela     -> "nunca visto" certo, sem banco
+#   3) só o "talvez" do Bloom consulta a tabela (um SELECT ... IN por lote)
+# Ids novos ficam pendentes e são gravados com um executemany por lote
+# (gravar), NA MESMA transação que publica os eventos na fila durável: ou o
+# evento está na fila e em ifood_events, ou em nenhum dos dois (descartar()
+# tira os pendentes e a próxima entrega do iFood o trata como novo). A tabela
+# é podada pela janela de retenção, e o Bloom é reconstruído a cada poda para
+# não acumular falsos positivos. A poda roda numa thread de manutenção própria
+# (iniciar_manutencao), nunca dentro do gravar: ele acontece na thread do
+# webhook, dentro do prazo de resposta ao iFood.
+import os
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+RETENCAO_DIAS   = int(os.getenv("IFOOD_EVENTS_RETENCAO_DIAS", "7"))
+LRU_MAX         = int(os.getenv("IFOOD_DEDUP_LRU", "20000"))
+BLOOM_CAPACIDADE = int(os.getenv("IFOOD_DEDUP_BLOOM_CAPACIDADE", "200000"))
+PODA_INTERVALO_S = int(os.getenv("IFOOD_EVENTS_PODA_INTERVALO", "3600"))
+
+class BloomFilter:
+    "Bloom simples (double hashing sobre blake2b). ~1% de falso positivo na capacidade."
+    def __init__(self, capacidade: int, fp: float = 0.01):
+        self.m = max(1024, int(-capacidade * math.log(fp) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.m / capacidade * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+
+    def _posicoes(self, chave: str):
+        d = hashlib.blake2b(chave.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:], "little") | 1
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def add(self, chave: str):
+        bits = self.bits
+        for p in self._posicoes(chave):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, chave: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._posicoes(chave))
+
+class FiltroIdempotencia:
+    def __init__(self, db, linha_fn: Callable[[dict], Tuple], tabela: str = "ifood_events",
+                 retencao_dias: int = RETENCAO_DIAS, lru_max: int = LRU_MAX,
+                 capacidade_bloom: int = BLOOM_CAPACIDADE):
+        """
+        linha_fn(evt) -> (event_id, order_id, code) gravada na tabela.
+        """
+        self.db = db
+        self.linha_fn = linha_fn
+        self.tabela = tabela
+        self.retencao_dias = retencao_dias
+        self.lru_max = lru_max
+        self.capacidade_bloom = capacidade_bloom
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._pendentes: Dict[str, Tuple] = {}
+        self._bloom = BloomFilter(capacidade_bloom)
+        self._ultima_poda = 0.0
+        self._parar_manutencao = threading.Event()
+        self._manutencao: Optional[threading.Thread] = None
+        self.stats = {"lru_hits": 0, "bloom_negativos": 0, "consultas_db": 0,
+                      "duplicados_db": 0, "falsos_positivos": 0, "novos": 0,
+                      "gravados": 0, "descartados": 0, "podados": 0}
+
+    # ---------------- Estado ----------------
+    def aquecer(self):
+        "Carrega no Bloom/LRU os ids da janela de retenção (chamar no start)."
+        bloom = BloomFilter(self.capacidade_bloom)
+        rows = self.db.execute(
+            f"SELECT event_id FROM {self.tabela} WHERE received_at >= datetime('now', ?) ORDER BY received_at",
+            f"-{self.retencao_dias} days")
+        for r in rows:
+            bloom.add(r["event_id"])
+        with self._lock:
+            self._bloom = bloom
+            for pend in self._pendentes:
+                bloom.add(pend)
+            for r in rows[-self.lru_max:]:
+                self._lembrar(r["event_id"])
+
+    def _lembrar(self, eid: str):
+        lru = self._lru
+        lru[eid] = None
+        lru.move_to_end(eid)
+        if len(lru) > self.lru_max:
+            lru.popitem(last=False)
+
+    # ---------------- Filtro ----------------
+    def novos(self, eventos: List[dict]) -> List[dict]:
+        """
+        Devolve, na ordem original, só os eventos nunca vistos e os marca como
+        pendentes de gravação. Eventos sem id passam direto (sem como deduplicar).
+        """
+        with self._lock:
+            status: List[str] = []
+            talvez: List[str] = []
+            vistos_lote = set()
+            for evt in eventos:
+                eid = evt.get("id")
+                if not eid:
+                    status.append("novo")
+                elif eid in vistos_lote or eid in self._lru or eid in self._pendentes:
+                    self.stats["lru_hits"] += 1
+                    status.append("dup")
+                elif eid in self._bloom:
+                    talvez.append(eid)
+                    status.append("talvez")
+                else:
+                    self.stats["bloom_negativos"] += 1
+                    status.append("novo")
+                if eid:
+                    vistos_lote.add(eid)
+
+        existentes = set()
+        if talvez:
+            self.stats["consultas_db"] += 1
+            for i in range(0, len(talvez), 900):
+                chunk = talvez[i:i + 900]
+                ph = ",".join("?" * len(chunk))
+                rows = self.db.execute(f"SELECT event_id FROM {self.tabela} WHERE event_id IN ({ph})", *chunk)
+                existentes.update(r["event_id"] for r in rows)
+
+        saida = []
+        with self._lock:
+            for evt, st in zip(eventos, status):
+                eid = evt.get("id")
+                if st == "talvez":
+                    if eid in existentes:
+                        self.stats["duplicados_db"] += 1
+                        self._lembrar(eid)
+                        continue
+                    self.stats["falsos_positivos"] += 1
+                elif st == "dup":
+                    if eid in self._lru:
+                        self._lru.move_to_end(eid)
+                    continue
+                if eid:
+                    if eid in self._pendentes or eid in self._lru:  # marcado por outra thread no meio-tempo
+                        continue
+                    self._pendentes[eid] = self.linha_fn(evt)
+                    self._bloom.add(eid)
+                    self._lembrar(eid)
+                self.stats["novos"] += 1
+                saida.append(evt)
+        return saida
+
+    def gravar(self, eventos: List[dict], publicar: Optional[Callable[[], object]] = None) -> int:
+        """
+        Grava em ifood_events os ids de `eventos` (a saída de novos()) numa
+        transação, chamando antes `publicar()` dentro dela (ex.: publicar_lote
+        na fila durável + ids para ACK). Se qualquer parte falhar, nada é
+        gravado, os ids deixam de ser pendentes e a exceção sobe: a
+        reentrega do mesmo evento volta a ser "novo".
+        Só os ids deste lote são gravados; os pendentes de outras threads
+        esperam a publicação delas. Não poda: ver iniciar_manutencao().
+        """
+        ids = [e.get("id") for e in eventos if e.get("id")]
+        with self._lock:
+            linhas = [self._pendentes[i] for i in ids if i in self._pendentes]
+        try:
+            with self.db.transacao():
+                if publicar is not None:
+                    publicar()
+                if linhas:
+                    self.db.executemany(
+                        f"INSERT OR IGNORE INTO {self.tabela} (event_id, order_id, code, received_at) "
+                        f"VALUES (?,?,?,datetime('now'))", linhas)
+        except Exception:
+            self.descartar(ids)
+            raise
+        with self._lock:
+            for i in ids:
+                self._pendentes.pop(i, None)
+        self.stats["gravados"] += len(linhas)
+        return len(linhas)
+
+    def descartar(self, ids: List[str]):
+        """
+        Esquece ids marcados por novos() que não chegaram a ser publicados.
+        Saem do LRU e dos pendentes; no Bloom ficam (não dá para remover) e
+        só custam uma consulta à tabela na reentrega.
+        """
+        with self._lock:
+            for i in ids:
+                if self._pendentes.pop(i, None) is not None:
+                    self._lru.pop(i, None)
+                    self.stats["descartados"] += 1
+
+    def podar(self, retencao_dias: Optional[int] = None) -> int:
+        "Apaga eventos mais velhos que a janela e reconstrói o Bloom."
+        dias = self.retencao_dias if retencao_dias is None else retencao_dias
+        self._ultima_poda = time.monotonic()
+        n = self.db.execute(f"DELETE FROM {self.tabela} WHERE received_at < datetime('now', ?)", f"-{dias} days")
+        self.stats["podados"] += n or 0
+        if n:
+            self.aquecer()
+        return n or 0
+
+    # ---------------- Manutenção (poda em background) ----------------
+    def iniciar_manutencao(self, intervalo_s: float = PODA_INTERVALO_S):
+        "Thread daemon que poda a tabela (e reconstrói o Bloom) a cada intervalo_s."
+        if self._manutencao is not None and self._manutencao.is_alive():
+            return
+        self._parar_manutencao.clear()
+
+        def _loop():
+            while not self._parar_manutencao.wait(max(1.0, intervalo_s - (time.monotonic() - self._ultima_poda))):
+                try:
+                    self.podar()
+                except Exception as e:
+                    self._ultima_poda = time.monotonic()  # tenta de novo no próximo intervalo
+                    print("[dedup] erro na poda:", e)
+
+        self._manutencao = threading.Thread(target=_loop, name="dedup-poda", daemon=True)
+        self._manutencao.start()
+
+    def parar_manutencao(self, timeout: float = 5.0):
+        self._parar_manutencao.set()
+        if self._manutencao is not None:
+            self._manutencao.join(timeout)
+            self._manutencao = None
+
+    def status(self) -> dict:
+        with self._lock:
+            return {**self.stats, "lru": len(self._lru), "pendentes": len(self._pendentes),
+                    "bloom_bits": self._bloom.m, "bloom_k": self._bloom.k}
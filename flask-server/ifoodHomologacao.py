@@ -3,42 +3,41 @@
 # ===========================
 import os
 import time
+import atexit
 import hmac
 import json
-import queue
 import hashlib
 import threading
 from typing import Any, Dict, Optional, List, Tuple
 
 from dotenv import load_dotenv
-import requests
-from flask import Flask, request, jsonify
-from cs50 import SQL
-from datetime import datetime
+from flask import Flask, Response, request, jsonify
+
+import acoes_ifood
+import faturamento
+from analytics import Analytics
+import particao_pedidos
+import poller_ifood
+from idempotencia import FiltroIdempotencia
+from acoes_ifood import DespachanteAcoes
+from fila_duravel import VISIBILIDADE_S as FILA_VIS_MIN_S, FilaDuravel, Mensagem
+from cache_ifood import CacheTTL
+from motivos_ifood import MotivosCancelamento
+from extracao_ifood import PedidoExtraido, extrair_pedido, parse_iso_br, tz_sp
+from banco import conectar
+from ifood_cliente import ClienteIFood, IFoodErroHTTP, IFoodErroRede
+from token_ifood import GerenciadorToken
+from poller_ifood import MetricasLatencia, PollerIFood
 
 # ---------------- Base Flask & DB ----------------
 app = Flask(__name__)
 
 DATABASE_PATH = os.getenv("IFOOD_DB_PATH", "/data/dados.db")
 os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
-db = SQL("sqlite:///" + DATABASE_PATH)
+db = conectar(DATABASE_PATH)  # WAL + conexão por thread (banco.py)
 
 # ---------------- TZ ----------------
-try:
-    import zoneinfo
-    tz_sp = zoneinfo.ZoneInfo("America/Sao_Paulo")
-except Exception:
-    from datetime import timezone, timedelta
-    tz_sp = timezone(timedelta(hours=-3))
-
-def parse_iso_br(dt_str: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
-    if not dt_str:
-        return None, None
-    try:
-        dt = datetime.fromisoformat(dt_str.replace("Z", "+00:00")).astimezone(tz_sp)
-        return dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M:%S")
-    except Exception:
-        return None, None
+# tz_sp / parse_iso_br ficam em extracao_ifood.py (reexportados aqui)
 
 # ---------------- ENV ----------------
 load_dotenv()
@@ -49,56 +48,49 @@ WEBHOOK_SECRET     = os.getenv("IFOOD_WEBHOOK_SECRET") or SEU_CLIENT_SECRET
 POLL_EVERY_SECONDS = int(os.getenv("IFOOD_POLL_INTERVAL", "30"))  # regra: 30s
 MERCHANT_IDS_ENV   = os.getenv("IFOOD_MERCHANT_IDS")  # "merchantA,merchantB"
 START_POLLING_ENV  = os.getenv("IFOOD_POLLING_START", "0") == "1"
+START_ARQUIVO_ENV  = os.getenv("PEDIDOS_ARQUIVAMENTO_START", "0") == "1"  # partição quente/fria
+
+# ---------------- Token ----------------
+# Renovação fora do lock, single-flight e proativa (token_ifood.py).
+def _buscar_token() -> Tuple[str, int]:
+    "POST no endpoint OAuth. Retorna (access_token, expires_in)."
+    if not SEU_CLIENT_ID or not SEU_CLIENT_SECRET or not TOKEN_URL:
+        raise RuntimeError("SEU_CLIENT_ID/SEU_CLIENT_SECRET/TOKEN_URL não configurados.")
+
+    data = {
+        "grantType": "client_credentials",
+        "clientId": SEU_CLIENT_ID,
+        "clientSecret": SEU_CLIENT_SECRET,
+    }
+    r = cliente.post(TOKEN_URL, data=data, auth=False)  # form-urlencoded
+    r.raise_for_status()
+    payload = r.json() or {}
+    access_token = payload.get("accessToken") or payload.get("access_token")
+    expires_in   = int(payload.get("expiresIn") or payload.get("expires_in") or 0)
+    if not access_token or not expires_in:
+        raise RuntimeError(f"Resposta de token inesperada: {payload}")
+    return access_token, expires_in
 
-# ---------------- HTTP Session ----------------
-SESSION = requests.Session()
-SESSION.headers.update({"Accept": "application/json"})
-ADAPTER_KW = dict(pool_connections=30, pool_maxsize=60, max_retries=0)
-SESSION.mount("https://", requests.adapters.HTTPAdapter(**ADAPTER_KW))
-SESSION.mount("http://",  requests.adapters.HTTPAdapter(**ADAPTER_KW))
-
-# ---------------- Token cache ----------------
-_token_cache = {"accessToken": None, "expiresAt": 0.0}
-_cache_lock = threading.Lock()
+tokens = GerenciadorToken(_buscar_token)
 
 def get_ifood_token() -> Tuple[str, float]:
     """
-    Retorna (access_token, expires_at). Renova 60s antes de expirar.
+    Retorna (access_token, expires_at). Perto de expirar serve o token atual e
+    renova em background; sem token válido, espera a renovação em voo.
     """
-    with _cache_lock:
-        now = time.time()
-        if _token_cache["accessToken"] and (_token_cache["expiresAt"] - now > 60):
-            return _token_cache["accessToken"], _token_cache["expiresAt"]
-
-        if not SEU_CLIENT_ID or not SEU_CLIENT_SECRET or not TOKEN_URL:
-            raise RuntimeError("SEU_CLIENT_ID/SEU_CLIENT_SECRET/TOKEN_URL não configurados.")
-
-        data = {
-            "grantType": "client_credentials",
-            "clientId": SEU_CLIENT_ID,
-            "clientSecret": SEU_CLIENT_SECRET,
-        }
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "Accept": "application/json",
-        }
-        r = SESSION.post(TOKEN_URL, data=data, headers=headers, timeout=20)
-        r.raise_for_status()
-        payload = r.json()
-        access_token = payload.get("accessToken") or payload.get("access_token")
-        expires_in   = int(payload.get("expiresIn") or payload.get("expires_in") or 0)
-        if not access_token or not expires_in:
-            raise RuntimeError(f"Resposta de token inesperada: {payload}")
-
-        expires_at = now + expires_in
-        _token_cache["accessToken"] = access_token
-        _token_cache["expiresAt"]   = expires_at
-        return access_token, expires_at
-
-def invalidate_token():
-    with _cache_lock:
-        _token_cache["accessToken"] = None
-        _token_cache["expiresAt"]   = 0.0
+    return tokens.obter()
+
+def invalidate_token(token_rejeitado: Optional[str] = None):
+    "Após 401/403. Ignorado se o token recusado já foi substituído."
+    tokens.invalidar(token_rejeitado)
+
+# ---------------- Cliente HTTP (aiohttp, sessão única) ----------------
+# Todas as chamadas ao iFood passam pelo mesmo cliente: keep-alive, concorrência
+# limitada, backoff em 429/5xx e re-autenticação em 401/403 (ifood_cliente.py).
+cliente = ClienteIFood(lambda: get_ifood_token()[0], invalidate_token)
+atexit.register(cliente.fechar)
+tokens.iniciar()  # renovação proativa (fica parada até o primeiro token)
+atexit.register(tokens.parar)
 
 # ---------------- Schema mínimo ----------------
 def ensure_schema():
@@ -152,22 +144,212 @@ def ensure_schema():
       valor REAL
     )""")
 
+# ---------------- Migrações versionadas ----------------
+# Cada passo roda uma única vez por banco e fica registrado em schema_migrations.
+# Índices só são criados quando todas as colunas existem na tabela (o pedidos de
+# produção tem comanda/printed/ordem; o criado por ensure_schema, não). Por isso
+# INDICES_PEDIDOS é reaplicado a cada partida, fora dos passos versionados: um
+# índice pulado é criado assim que a coluna aparecer (IF NOT EXISTS = idempotente).
+INDICES_PEDIDOS: List[Tuple[str, str, Tuple[str, ...], Optional[Tuple[str, str]]]] = [
+    # (nome, tabela, colunas, (coluna, condição) do índice parcial)
+    ("idx_pedidos_order_id",            "pedidos", ("order_id",),                   None),
+    ("idx_pedidos_dia_categoria_estado", "pedidos", ("dia", "categoria", "estado"), None),
+    ("idx_pedidos_comanda_ordem",       "pedidos", ("comanda", "ordem"),             None),
+    # só as linhas ainda não impressas (a consulta precisa usar o literal `printed = 0`)
+    ("idx_pedidos_nao_impressos",       "pedidos", ("dia", "categoria"),             ("printed", "= 0")),
+    ("idx_ifood_payments_order_id",     "ifood_pedidos_payments", ("order_id",),     None),
+    ("idx_ifood_benefits_order_id",     "ifood_pedidos_benefits", ("order_id",),     None),
+]
+
+def _colunas(tabela: str) -> set:
+    return {c["name"] for c in db.execute(f"PRAGMA table_info({tabela})")}
+
+def _criar_indices(indices):
+    cache: Dict[str, set] = {}
+    for nome, tabela, cols, where in indices:
+        existentes = cache.setdefault(tabela, _colunas(tabela))
+        faltando = [c for c in cols + ((where[0],) if where else ()) if c not in existentes]
+        if faltando:
+            print(f"[schema] índice {nome} ignorado: {tabela} sem coluna(s) {faltando}")
+            continue
+        sql = f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({', '.join(cols)})"
+        if where:
+            sql += f" WHERE {where[0]} {where[1]}"
+        db.execute(sql)
+
+SCHEMA_MIGRATIONS = [
+    (1, "índices de pedidos e pagamentos/benefícios iFood", lambda: _criar_indices(INDICES_PEDIDOS)),
+    (2, "pedidos_arquivo + view pedidos_todos", lambda: particao_pedidos.ensure_particao(db)),
+    (3, "ifood_events por received_at (poda da janela de idempotência)",
+        lambda: db.execute("CREATE INDEX IF NOT EXISTS idx_ifood_events_received_at ON ifood_events (received_at)")),
+    (4, "ifood_ack_pendentes (ACK durável do polling)", lambda: poller_ifood.ensure_schema(db)),
+    (5, "fila durável de eventos + dead-letter", lambda: FilaDuravel(db).ensure_schema()),
+    (6, "fila de ações de saída (confirm/dispatch/...)", lambda: acoes_ifood.ensure_schema(db)),
+    (7, "agregados de faturamento (dia/hora/categoria) + backfill", lambda: faturamento.instalar(db)),
+]
+
+def migrate_schema():
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+      versao      INTEGER PRIMARY KEY,
+      descricao   TEXT,
+      aplicada_em TEXT
+    )""")
+    atual = db.execute("SELECT COALESCE(MAX(versao), 0) AS v FROM schema_migrations")[0]["v"]
+    for versao, descricao, passo in SCHEMA_MIGRATIONS:
+        if versao <= atual:
+            continue
+        with db.transacao():
+            passo()
+            db.execute("INSERT INTO schema_migrations (versao, descricao, aplicada_em) VALUES (?,?,datetime('now'))",
+                       versao, descricao)
+        print(f"[schema] migração {versao} aplicada: {descricao}")
+    _criar_indices(INDICES_PEDIDOS)
+
+# ---------------- Planos das consultas quentes ----------------
+# Consultas que rodam a cada evento/refresh de tela. verificar_planos() acusa
+# qualquer uma que volte a varrer a tabela inteira (SCAN) em vez de usar índice.
+HOT_QUERIES_PEDIDOS: Dict[str, str] = {
+    "ifood_atualiza_estado": "UPDATE pedidos SET estado=? WHERE order_id=?",
+    "getPedidos":            "SELECT * FROM pedidos WHERE dia=? AND categoria=? ORDER BY id",
+    "getPedidos_abertos":    "SELECT * FROM pedidos WHERE dia=? AND categoria=? AND estado<>?",
+    "getPendingPrintOrders": "SELECT * FROM pedidos WHERE printed = 0 AND dia=? AND categoria=? ORDER BY id",
+    "comanda":               "SELECT * FROM pedidos WHERE comanda=? AND ordem=?",
+    "ifood_payments_replay": "DELETE FROM ifood_pedidos_payments WHERE order_id=?",
+    "historico_por_dia":     "SELECT * FROM pedidos_todos WHERE dia=?",
+}
+
+def verificar_planos(queries: Optional[Dict[str, str]] = None) -> Dict[str, List[str]]:
+    """
+    Roda EXPLAIN QUERY PLAN em cada consulta e retorna {nome: [passos com SCAN]}.
+    Dicionário vazio = nenhuma consulta quente varrendo tabela.
+    """
+    regressoes: Dict[str, List[str]] = {}
+    for nome, sql in (queries or HOT_QUERIES_PEDIDOS).items():
+        args = [None] * sql.count("?")
+        try:
+            plano = db.execute("EXPLAIN QUERY PLAN " + sql, *args)
+        except Exception as e:
+            regressoes[nome] = [f"erro: {e}"]
+            continue
+        scans = [p["detail"] for p in plano if p["detail"].startswith("SCAN")]
+        if scans:
+            regressoes[nome] = scans
+    return regressoes
+
 ensure_schema()
+migrate_schema()
 
 # ---------------- Assinatura HMAC (Webhook) ----------------
-def _valid_signature(req) -> bool:
-    try:
-        raw  = req.get_data(cache=False)  # bytes exatos
-        sent = req.headers.get("X-IFood-Signature", "")
-        if not (raw and sent and WEBHOOK_SECRET):
-            return False
-        mac  = hmac.new(WEBHOOK_SECRET.encode("utf-8"), raw, hashlib.sha256).hexdigest()
-        return hmac.compare_digest(mac, sent)
-    except Exception:
-        return False
-
-# ---------------- Fila e worker ----------------
-_event_q: "queue.SimpleQueue[dict]" = queue.SimpleQueue()
+# O corpo é lido do stream uma única vez, direto para um buffer, e o HMAC é
+# atualizado a cada bloco lido. O JSON é decodificado uma vez desse buffer e
+# cada evento guarda o trecho de texto original, que vai para a fila sem
+# json.dumps de novo.
+WEBHOOK_MAX_BYTES = int(os.getenv("IFOOD_WEBHOOK_MAX_BYTES", str(8 * 1024 * 1024)))
+WEBHOOK_BLOCO     = 64 * 1024
+_json_decoder = json.JSONDecoder()
+_JSON_ESPACOS = " \t\n\r"
+
+class CorpoGrandeDemais(Exception):
+    pass
+
+def _ler_corpo_assinado(req) -> Tuple[bytearray, bool]:
+    """
+    Lê o corpo em blocos para um único bytearray, calculando o HMAC junto.
+    Retorna (corpo, assinatura_ok).
+    """
+    tamanho = req.content_length
+    if tamanho is not None and tamanho > WEBHOOK_MAX_BYTES:
+        raise CorpoGrandeDemais(tamanho)
+    mac = hmac.new((WEBHOOK_SECRET or "").encode("utf-8"), digestmod=hashlib.sha256)
+    stream = req.stream
+
+    if tamanho:
+        corpo = bytearray(tamanho)           # pré-alocado: sem concatenações
+        mv = memoryview(corpo)
+        lidos = 0
+        while lidos < tamanho:
+            n = stream.readinto(mv[lidos:lidos + WEBHOOK_BLOCO])
+            if not n:
+                break
+            mac.update(mv[lidos:lidos + n])
+            lidos += n
+        mv.release()
+        if lidos < tamanho:
+            del corpo[lidos:]
+    else:                                    # chunked / sem Content-Length
+        corpo = bytearray()
+        while True:
+            bloco = stream.read(WEBHOOK_BLOCO)
+            if not bloco:
+                break
+            corpo += bloco
+            if len(corpo) > WEBHOOK_MAX_BYTES:
+                raise CorpoGrandeDemais(len(corpo))
+            mac.update(bloco)
+
+    sent = req.headers.get("X-IFood-Signature", "")
+    if not (corpo and sent and WEBHOOK_SECRET):
+        return corpo, False
+    return corpo, hmac.compare_digest(mac.hexdigest(), sent)
+
+def _eventos_do_corpo(corpo: bytearray) -> List[Tuple[dict, str]]:
+    """
+    Decodifica o corpo (objeto ou lista de objetos) numa passada só e devolve
+    [(evento, texto_json_original)]. Elementos que não são objeto são ignorados.
+    """
+    texto = corpo.decode("utf-8")
+    n = len(texto)
+    i = 0
+    while i < n and texto[i] in _JSON_ESPACOS:
+        i += 1
+    if i >= n:
+        return []
+    if texto[i] != "[":
+        obj, fim = _json_decoder.raw_decode(texto, i)
+        return [(obj, texto[i:fim])] if isinstance(obj, dict) else []
+
+    pares = []
+    i += 1
+    while True:
+        while i < n and texto[i] in _JSON_ESPACOS:
+            i += 1
+        if i >= n:
+            raise ValueError("lista JSON não terminada")
+        if texto[i] == "]":
+            return pares
+        obj, fim = _json_decoder.raw_decode(texto, i)
+        if isinstance(obj, dict):
+            pares.append((obj, texto[i:fim]))
+        i = fim
+        while i < n and texto[i] in _JSON_ESPACOS:
+            i += 1
+        if i < n and texto[i] == ",":
+            i += 1
+
+# ---------------- Fila e workers ----------------
+# Pool de workers com ordenação por pedido: eventos de orderIds diferentes
+# rodam em paralelo, eventos do mesmo orderId saem estritamente em ordem.
+# A fila é durável (fila_duravel.py, tabela ifood_fila_eventos): o evento só
+# sai do banco depois de processado, e só a cabeça de cada orderId é entregue,
+# então uma chave nunca está com dois workers ao mesmo tempo. Falhas voltam
+# com backoff e, esgotadas as tentativas, vão para ifood_fila_mortos.
+# Cada worker reserva uma mensagem por vez: um PLACED lento (detalhes do
+# pedido) não segura eventos de outros pedidos. O lease cobre o pior caso de
+# uma chamada do cliente HTTP e é renovado enquanto o evento está em
+# processamento, então não vence no meio e outro worker não pega o pedido.
+WORKER_COUNT = max(1, int(os.getenv("IFOOD_WORKERS", "4")))
+FILA_FOLGA_S = 30.0  # lease além do pior caso de uma request (token, gravação)
+
+_fila = FilaDuravel(db, visibilidade=max(FILA_VIS_MIN_S, cliente.prazo_total() + FILA_FOLGA_S))
+_em_voo: Dict[int, Mensagem] = {}  # id -> mensagem em processamento (renovadas por _renovar_leases)
+_renovador: Optional[threading.Thread] = None
+_dispatch_cv = threading.Condition()
+_stop_workers = threading.Event()
+_workers: List[threading.Thread] = []
+_accepting_events = True
+_worker_stats = {"processed": 0, "failed": 0, "dead": 0, "in_flight": 0}
+_latency_by_code: Dict[str, Dict[str, float]] = {}
 
 def _event_code(evt: dict) -> str:
     return (evt.get("fullCode") or evt.get("code") or evt.get("event") or evt.get("eventType") or "").upper()
@@ -186,279 +368,423 @@ def _human_state_from_code(code: str) -> Optional[str]:
     }
     return m.get(code)
 
+def _order_key(evt: dict) -> str:
+    return evt.get("orderId") or evt.get("id") or ""
+
+def enqueue_ifood_event(evt: dict) -> bool:
+    """
+    Grava o evento na fila durável do seu pedido. Retorna False se os
+    workers estão sendo encerrados (evento não aceito).
+    """
+    if not _accepting_events:
+        return False
+    _fila.publicar(_order_key(evt), evt)
+    return True
+
+def enqueue_ifood_events(evts: List[dict], textos: Optional[List[str]] = None) -> bool:
+    """
+    Como enqueue_ifood_event, mas grava o lote inteiro numa transação.
+    `textos` (opcional) é o JSON original de cada evento, gravado como está.
+    """
+    if not _accepting_events:
+        return False
+    _fila.publicar_lote([(_order_key(e), e) for e in evts], textos)
+    return True
+
+def _record_latency(code: str, wait_s: float, proc_s: float, ok: bool):
+    # chamado com _dispatch_cv adquirido
+    st = _latency_by_code.get(code)
+    if st is None:
+        st = _latency_by_code[code] = {"count": 0, "errors": 0, "total_ms": 0.0,
+                                       "max_ms": 0.0, "last_ms": 0.0, "wait_total_ms": 0.0}
+    ms = proc_s * 1000.0
+    st["count"] += 1
+    st["errors"] += 0 if ok else 1
+    st["total_ms"] += ms
+    st["last_ms"] = ms
+    st["max_ms"] = max(st["max_ms"], ms)
+    st["wait_total_ms"] += wait_s * 1000.0
+
+# Idempotência: LRU + Bloom na frente de ifood_events (idempotencia.py)
+_filtro_eventos = FiltroIdempotencia(
+    db, lambda evt: (evt.get("id"), evt.get("orderId") or evt.get("id") or "", _event_code(evt)))
+_filtro_eventos.aquecer()
+_filtro_eventos.iniciar_manutencao()  # poda de ifood_events fora da thread do webhook
+atexit.register(_filtro_eventos.parar_manutencao)
+
 def _worker_loop():
-    while True:
-        evt = _event_q.get()
+    while not _stop_workers.is_set():
+        msgs = _fila.reservar(1)
+        if not msgs:
+            _fila.esperar(1.0)  # acorda na próxima publicação (ou lease vencido/backoff)
+            continue
+
+        msg = msgs[0]
+        evt = msg.payload
+        with _dispatch_cv:
+            _worker_stats["in_flight"] += 1
+            _em_voo[msg.id] = msg
+        waited = max(0.0, time.time() - msg.criado_em)
+        started = time.monotonic()
+        erro, morto = None, False
         try:
             _process_ifood_event(evt)
         except Exception as e:
+            erro = str(e)
             print("[webhook_ifood][worker] erro:", e)
+        with _dispatch_cv:
+            _em_voo.pop(msg.id, None)
+        ok = erro is None
+        if ok:
+            _fila.confirmar([msg])  # libera o próximo evento deste pedido
+        else:
+            morto = _fila.falhar(msg, erro)
+        finished = time.monotonic()
+
+        with _dispatch_cv:
+            _worker_stats["in_flight"] -= 1
+            _worker_stats["processed" if ok else "failed"] += 1
+            _worker_stats["dead"] += 1 if morto else 0
+            _record_latency(_event_code(evt) or "?", waited, finished - started, ok)
+
+def _renovar_leases():
+    "Estende, a cada terço da visibilidade, o lease dos eventos que os workers ainda processam."
+    while True:
+        time.sleep(_fila.visibilidade / 3)
+        with _dispatch_cv:
+            msgs = list(_em_voo.values())
+        try:
+            _fila.renovar(msgs)
+        except Exception as e:
+            print("[webhook_ifood][worker] falha ao renovar leases:", e)
+
+def start_event_workers(count: int = WORKER_COUNT):
+    global _accepting_events, _renovador
+    with _dispatch_cv:
+        _accepting_events = True
+        _stop_workers.clear()
+        if _renovador is None or not _renovador.is_alive():
+            _renovador = threading.Thread(target=_renovar_leases, name="ifood-worker-leases", daemon=True)
+            _renovador.start()
+        alive = [t for t in _workers if t.is_alive()]
+        _workers[:] = alive
+        for i in range(len(alive), count):
+            t = threading.Thread(target=_worker_loop, name=f"ifood-worker-{i}", daemon=True)
+            _workers.append(t)
+            t.start()
+
+def stop_event_workers(timeout: float = 30.0) -> bool:
+    """
+    Para de aceitar eventos, espera a fila esvaziar (até `timeout`) e encerra
+    os workers. Retorna True se tudo foi processado dentro do prazo; o que
+    sobrar continua em ifood_fila_eventos para o próximo start.
+    """
+    global _accepting_events
+    deadline = time.monotonic() + timeout
+    with _dispatch_cv:
+        _accepting_events = False
+        workers = list(_workers)
+        _workers.clear()
+    while _fila.status()["profundidade"] and time.monotonic() < deadline and any(t.is_alive() for t in workers):
+        _fila.esperar(min(0.5, max(0.0, deadline - time.monotonic())))
+    _stop_workers.set()
+    for t in workers:
+        t.join(max(0.0, deadline - time.monotonic()))
+    restantes = _fila.status()["profundidade"]
+    if restantes:
+        print(f"[webhook_ifood][worker] encerrado com {restantes} evento(s) na fila durável")
+    return not restantes
+
+def event_worker_stats() -> dict:
+    with _dispatch_cv:
+        by_code = {}
+        for code, st in _latency_by_code.items():
+            n = st["count"] or 1
+            by_code[code] = {
+                "count": st["count"],
+                "errors": st["errors"],
+                "avg_ms": round(st["total_ms"] / n, 2),
+                "max_ms": round(st["max_ms"], 2),
+                "last_ms": round(st["last_ms"], 2),
+                "avg_wait_ms": round(st["wait_total_ms"] / n, 2),
+            }
+        stats = dict(_worker_stats)
+        workers = sum(1 for t in _workers if t.is_alive())
+    fila = _fila.status()
+    return {
+        "workers": workers,
+        "accepting": _accepting_events,
+        "queue_depth": fila["profundidade"],
+        "orders_pending": fila["chaves"],
+        "in_flight": stats["in_flight"],
+        "enqueued": fila["publicados"],
+        "processed": stats["processed"],
+        "failed": stats["failed"],
+        "dead_letter": fila["mortos_total"],
+        "fila": fila,
+        "latency_by_code": by_code,
+    }
 
-threading.Thread(target=_worker_loop, daemon=True).start()
+start_event_workers()
+atexit.register(stop_event_workers)
 
 # ---------------- Extração do Pedido ----------------
 def extrair_pedido_ifood(order: dict) -> dict:
-    total_block = order.get("total") or {}
-    delivery    = order.get("delivery") or {}
-    addr        = delivery.get("deliveryAddress") or {}
-
-    pedido_data, pedido_hora         = parse_iso_br(order.get("createdAt"))
-    agendamento_data, agendamento_h  = parse_iso_br(delivery.get("deliveryDateTime"))
-
-    # Payments
-    payments_out = []
-    methods = (order.get("payments") or {}).get("methods", [])
-    for pm in methods:
-        card   = pm.get("card") or {}
-        amount = (pm.get("amount") or {}).get("value") or 0
-        payments_out.append({
-            "nome": pm.get("name"),
-            "presencial": 1 if pm.get("inPerson") else 0,
-            "bandeira": card.get("brand"),
-            "adquirente": card.get("provider"),
-            "valor": amount/100.0,
-            "liability": pm.get("liability"),
-        })
-
-    # Benefits / Subsídios
-    beneficios_out = []
-    benefits = (order.get("benefits") or {}).get("benefits", [])
-    for b in benefits:
-        for s in (b.get("sponsorships") or []):
-            val = (s.get("amount") or {}).get("value") or 0
-            beneficios_out.append({
-                "alvo": b.get("target"),
-                "responsavel": s.get("liability"),
-                "valor": val/100.0
-            })
-
-    # Itens + complementos
-    itens_out: List[dict] = []
-    for it in order.get("items", []):
-        item_dict = {
-            "produto": it.get("name"),
-            "quantidade": it.get("quantity", 1),
-            "preco_unit": it.get("unitPrice"),
-            "preco_total": it.get("totalPrice"),
-            "observacoes": it.get("observations"),
-            "complementos": []
-        }
-        for opt in it.get("options", []):
-            comp = {
-                "nome": opt.get("name"),
-                "grupo": opt.get("groupName"),
-                "quantidade": opt.get("quantity", 1),
-                "preco": opt.get("price"),
-                "customizacoes": []
-            }
-            for cust in opt.get("customizations", []):
-                comp["customizacoes"].append({
-                    "nome": cust.get("name"),
-                    "grupo": cust.get("groupName"),
-                    "quantidade": cust.get("quantity", 1),
-                    "preco": cust.get("price"),
-                })
-            item_dict["complementos"].append(comp)
-        itens_out.append(item_dict)
-
-    verification_codes = order.get("verificationCodes") or {}
-    pickup_code = verification_codes.get("takeout") or verification_codes.get("pickup") or verification_codes.get("code")
+    """
+    JSON do iFood -> dicionário com os campos da comanda (formato público,
+    usado na rota /ifood/order). O caminho interno usa extrair_pedido()
+    direto, sem montar o dicionário (extracao_ifood.py).
+    """
+    return extrair_pedido(order).para_dict()
+
+# ---------------- Cache de detalhes do pedido ----------------
+# A UI consulta /ifood/order/<id> várias vezes enquanto a equipe olha uma
+# entrega. O JSON bruto e a extração ficam em cache (TTL + LRU) por order_id;
+# qualquer evento de status do pedido invalida a entrada. Entrada vencida com
+# ETag do iFood é revalidada com If-None-Match (304 só renova a validade).
+CACHE_PEDIDOS_TTL = float(os.getenv("IFOOD_CACHE_PEDIDOS_TTL", "60"))
+CACHE_PEDIDOS_MAX = int(os.getenv("IFOOD_CACHE_PEDIDOS_MAX", "500"))
+
+_cache_pedidos = CacheTTL(CACHE_PEDIDOS_TTL, CACHE_PEDIDOS_MAX, "pedidos")
+
+class DetalhePedido:
+    "JSON bruto + extração (feita uma vez, sob demanda) + ETag para a UI."
+    __slots__ = ("raw", "etag", "_pedido", "_dict")
+
+    def __init__(self, raw: dict, conteudo: bytes):
+        self.raw = raw
+        self.etag = hashlib.sha1(conteudo).hexdigest()
+        self._pedido: Optional[PedidoExtraido] = None
+        self._dict: Optional[dict] = None
+
+    @property
+    def pedido(self) -> PedidoExtraido:
+        if self._pedido is None:
+            self._pedido = extrair_pedido(self.raw)
+        return self._pedido
+
+    @property
+    def dict(self) -> dict:
+        "Mesmo formato de extrair_pedido_ifood."
+        if self._dict is None:
+            self._dict = self.pedido.para_dict()
+        return self._dict
+
+def detalhe_pedido(order_id: str, access_token: Optional[str] = None, usar_cache: bool = True) -> DetalhePedido:
+    entrada = _cache_pedidos.obter_entrada(order_id) if usar_cache else None
+    if entrada is not None and not entrada.vencida:
+        return entrada.valor
+
+    geracao = _cache_pedidos.geracao(order_id)
+    headers = {"If-None-Match": entrada.etag} if entrada is not None and entrada.etag else {}
+    resp = cliente.get(f"/order/v1.0/orders/{order_id}", headers=headers, token=access_token)
+    if resp.status_code == 304 and entrada is not None:
+        _cache_pedidos.renovar(order_id)
+        return entrada.valor
+    resp.raise_for_status()
+    det = DetalhePedido(resp.json(), resp.content)
+    _cache_pedidos.gravar(order_id, det, etag=resp.headers.get("ETag"), geracao=geracao)
+    return det
+
+def _merchant_do_pedido(order_id: str) -> Optional[str]:
+    det = _cache_pedidos.espiar(order_id)
+    return ((det.raw.get("merchant") or {}).get("id")) if det is not None else None
+
+# Motivos de cancelamento: prefetch no PLACED, leitura da memória, renovação em
+# background e última lista do merchant quando o iFood estiver lento.
+motivos_cancelamento = MotivosCancelamento(cliente)
+
+def buscar_pedido_ifood(order_id: str, access_token: Optional[str] = None, usar_cache: bool = True) -> dict:
+    "GET orders/{order_id} (JSON bruto do iFood), via cache; retentativas e 401/403 ficam no cliente."
+    return detalhe_pedido(order_id, access_token, usar_cache).raw
+
+# ---------------- Persistência do pedido ----------------
+# Um pedido inteiro (itens + pagamentos + benefícios) vai numa transação só,
+# com INSERTs multi-linha: 1 fsync por pedido em vez de 1 por linha.
+SQLITE_MAX_VARS = 999  # limite conservador de parâmetros por statement
+
+PEDIDOS_COLS = ("pedido", "quantidade", "preco", "categoria", "inicio", "estado", "extra", "nome", "dia",
+                "orderTiming", "endereco_entrega", "order_id", "remetente", "horario_para_entrega",
+                "cpf_cnpj", "codigo_coleta")
+PAYMENTS_COLS = ("order_id", "nome", "presencial", "bandeira", "adquirente", "valor", "liability")
+BENEFITS_COLS = ("order_id", "alvo", "responsavel", "valor")
+
+def _insert_multi(prefixo: str, cols: Tuple[str, ...], rows: List[tuple]):
+    "INSERT multi-linha (VALUES (...),(...)) quebrado em blocos de SQLITE_MAX_VARS parâmetros."
+    if not rows:
+        return
+    per_stmt = max(1, SQLITE_MAX_VARS // len(cols))
+    ph = "(" + ",".join("?" * len(cols)) + ")"
+    head = f"{prefixo} ({', '.join(cols)}) VALUES "
+    for i in range(0, len(rows), per_stmt):
+        chunk = rows[i:i + per_stmt]
+        db.execute(head + ",".join([ph] * len(chunk)), *[v for r in chunk for v in r])
+
+def _linhas_pedido(data) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+    "Converte um PedidoExtraido (ou o dicionário de extrair_pedido_ifood) nas linhas de pedidos/payments/benefits."
+    if not isinstance(data, PedidoExtraido):
+        data = PedidoExtraido.de_dict(data)
+    return data.linhas()
+
+def _order_ids_gravados(order_ids: List[str]) -> set:
+    "order_ids que já têm itens em pedidos ou no arquivo (dia já fechado)."
+    gravados = set()
+    for tabela in (particao_pedidos.TABELA_QUENTE, particao_pedidos.TABELA_ARQUIVO):
+        for i in range(0, len(order_ids), SQLITE_MAX_VARS):
+            chunk = order_ids[i:i + SQLITE_MAX_VARS]
+            ph = ",".join("?" * len(chunk))
+            try:
+                rows = db.execute(f"SELECT DISTINCT order_id FROM {tabela} WHERE order_id IN ({ph})", *chunk)
+            except Exception:
+                rows = []  # arquivo ainda não criado
+            gravados.update(r["order_id"] for r in rows)
+    return gravados
 
-    return {
-        "pedido_id": order.get("id"),
-        "display_id": order.get("displayId"),
-        "cliente_nome": (order.get("customer") or {}).get("name"),
-        "cliente_documento": (order.get("customer") or {}).get("documentNumber"),
-        "produtos": itens_out,
-        "valor_sem_taxas": total_block.get("subTotal"),
-        "valor_com_taxas": total_block.get("orderAmount"),
-        "endereco": {
-            "rua": addr.get("streetName"),
-            "numero": addr.get("streetNumber"),
-            "bairro": addr.get("neighborhood"),
-            "cidade": addr.get("city"),
-            "estado": addr.get("state"),
-            "cep": addr.get("postalCode"),
-            "complemento": addr.get("complement"),
-            "referencia": addr.get("reference"),
-        },
-        "pedido_data": pedido_data,
-        "pedido_hora": pedido_hora,
-        "orderTiming": order.get("orderTiming"),
-        "agendamento_data": agendamento_data,
-        "agendamento_hora": agendamento_h,
-        "delivery_observations": delivery.get("observations"),
-        "payments": payments_out,
-        "beneficios": beneficios_out,
-        "pickup_code": pickup_code,
-        "takeout": order.get("takeout") or {},
-    }
+def salvar_pedidos_em_lote(pedidos: List[Any]):
+    """
+    Persiste vários pedidos (PedidoExtraido ou saída de extrair_pedido_ifood)
+    numa única transação.
+    `pedidos` não tem chave única por order_id: os itens de um pedido que já
+    está no banco (quente ou arquivo) não são inseridos de novo, assim o replay
+    de eventos após queda ou a retentativa da fila durável não duplica linhas
+    nem mexe no estado já andado. Pagamentos/benefícios são regravados.
+    """
+    itens, pagamentos, beneficios, order_ids = [], [], [], []
+    vistos = set()
+    for data in pedidos:
+        oid = data.pedido_id if isinstance(data, PedidoExtraido) else data["pedido_id"]
+        if oid in vistos:
+            continue  # mesmo pedido duas vezes no lote
+        vistos.add(oid)
+        i, p, b = _linhas_pedido(data)
+        itens += i
+        pagamentos += p
+        beneficios += b
+        order_ids.append(oid)
+    if not order_ids:
+        return
 
-def pedido_detalhes(order_id: str, access_token: Optional[str] = None):
-    if not access_token:
-        access_token, _ = get_ifood_token()
-
-    headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
-    url_order = f"https://merchant-api.ifood.com.br/order/v1.0/orders/{order_id}"
-    resp = SESSION.get(url_order, headers=headers, timeout=20)
-    if resp.status_code in (401, 403):
-        invalidate_token()
-        access_token, _ = get_ifood_token()
-        headers["Authorization"] = f"Bearer {access_token}"
-        resp = SESSION.get(url_order, headers=headers, timeout=20)
-    resp.raise_for_status()
-    order = resp.json()
-
-    data = extrair_pedido_ifood(order)
-
-    # Endereço (ou retirada)
-    end = data.get("endereco") or {}
-    endereco = " ".join(s for s in [end.get("rua"), str(end.get("numero") or "").strip()] if s).strip()
-    endereco = endereco or "Retirada no balcão"
-
-    # Observações / complementos
-    for row in data.get("produtos", []):
-        extra = (row.get("observacoes") or "")
-        for comp in row.get("complementos", []):
-            extra += f"\n{comp.get('quantidade',1)} {comp.get('nome','')}"
-
-        hora_entrega = data["agendamento_hora"] or data["pedido_hora"]
-
-        # INSERT item a item (um registro por item do pedido)
-        db.execute(
-            """INSERT OR IGNORE INTO pedidos
-               (pedido, quantidade, preco, categoria, inicio, estado, extra, nome, dia,
-                orderTiming, endereco_entrega, order_id, remetente, horario_para_entrega, cpf_cnpj, codigo_coleta)
-               VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
-            row["produto"], row["quantidade"], row["preco_total"], 3,
-            data["pedido_hora"], "A Fazer", extra, data["cliente_nome"],
-            data["pedido_data"], data["orderTiming"], endereco, data["pedido_id"],
-            "IFOOD", hora_entrega, (data.get("cliente_documento") or ""), (data.get("pickup_code") or "")
-        )
-
-    # Pagamentos
-    for p in data.get("payments", []):
-        db.execute(
-            """INSERT INTO ifood_pedidos_payments
-               (order_id, nome, presencial, bandeira, adquirente, valor, liability)
-               VALUES (?,?,?,?,?,?,?)""",
-            data["pedido_id"], p["nome"], p["presencial"], p["bandeira"], p["adquirente"], p["valor"], p["liability"]
-        )
-
-    # Benefícios/Subsídios
-    for b in data.get("beneficios", []):
-        db.execute(
-            """INSERT INTO ifood_pedidos_benefits
-               (order_id, alvo, responsavel, valor)
-               VALUES (?,?,?,?)""",
-            data["pedido_id"], b["alvo"], b["responsavel"], b["valor"]
-        )
+    pos_order_id = PEDIDOS_COLS.index("order_id")
+    with db.transacao():
+        gravados = _order_ids_gravados(order_ids)
+        # OR IGNORE continua valendo para o pedidos criado por ensure_schema (order_id UNIQUE)
+        _insert_multi("INSERT OR IGNORE INTO pedidos", PEDIDOS_COLS, [r for r in itens if r[pos_order_id] not in gravados])
+        per_stmt = SQLITE_MAX_VARS
+        for i in range(0, len(order_ids), per_stmt):
+            chunk = order_ids[i:i + per_stmt]
+            ph = ",".join("?" * len(chunk))
+            db.execute(f"DELETE FROM ifood_pedidos_payments WHERE order_id IN ({ph})", *chunk)
+            db.execute(f"DELETE FROM ifood_pedidos_benefits WHERE order_id IN ({ph})", *chunk)
+        _insert_multi("INSERT INTO ifood_pedidos_payments", PAYMENTS_COLS, pagamentos)
+        _insert_multi("INSERT INTO ifood_pedidos_benefits", BENEFITS_COLS, beneficios)
+
+def salvar_pedido(data: Any):
+    salvar_pedidos_em_lote([data])
+
+def pedido_detalhes(order_id: str, access_token: Optional[str] = None) -> PedidoExtraido:
+    data = detalhe_pedido(order_id, access_token).pedido  # a extração fica no cache para a UI
+    salvar_pedido(data)
+    return data  # .para_dict() para o formato de extrair_pedido_ifood
+
+def pedidos_detalhes_lote(order_ids: List[str], access_token: Optional[str] = None) -> List[PedidoExtraido]:
+    """
+    Caminho em lote (ex.: replay após indisponibilidade): busca os pedidos em
+    paralelo (sessão compartilhada do cliente) e grava todos de uma vez.
+    Pedidos que falham no GET são ignorados e logados.
+    """
+    extraidos = []
+    for oid, order in zip(order_ids, cliente.buscar_pedidos(order_ids, token=access_token)):
+        if isinstance(order, Exception):
+            print(f"[ifood][lote] falha ao buscar {oid}:", order)
+            continue
+        extraidos.append(extrair_pedido(order))
+    salvar_pedidos_em_lote(extraidos)
+    return extraidos
 
 # ---------------- Processamento de eventos ----------------
+def _atualizar_estado(order_id: str, estado: str) -> int:
+    # pedido de dia já arquivado (ex.: cancelamento tardio) é atualizado no arquivo
+    return particao_pedidos.atualizar_estado(db, order_id, estado)
+
+def _ler_estado(order_id: str) -> Optional[str]:
+    return particao_pedidos.ler_estado(db, order_id)
+
+# ---------------- Ações de saída (confirm, dispatch, ...) ----------------
+# /ifood/action só enfileira: o envio ao iFood, a coalescência de toques
+# duplicados e as retentativas ficam no despachante (acoes_ifood.py).
+acoes = DespachanteAcoes(cliente, db, _atualizar_estado, _ler_estado)
+
+def registrar_notificador_acoes(notificar):
+    """
+    notificar(evento, dados) recebe o progresso de cada ação (pendente,
+    enviando, retentando, ok, erro). O app do socket registra o seu emit:
+        registrar_notificador_acoes(lambda ev, d: socketio.emit(ev, d))
+    """
+    acoes.notificar = notificar
+
+acoes.iniciar()
+atexit.register(acoes.parar)
+
 def _process_ifood_event(evt: dict):
     code     = _event_code(evt)
     order_id = evt.get("orderId") or evt.get("id")
+    _cache_pedidos.invalidar(order_id)  # qualquer mudança de status => detalhe pode ter mudado
 
     # PLACED -> carregar detalhes
     if code in ("PLACED", "PLC"):
         token, _ = get_ifood_token()
         pedido_detalhes(order_id, token)
-        db.execute('UPDATE pedidos SET estado=? WHERE order_id=?', "Novo", order_id)
+        _atualizar_estado(order_id, "Novo")
+        metricas_latencia.registrar(evt)
+        motivos_cancelamento.prefetch(order_id, evt.get("merchantId") or _merchant_do_pedido(order_id))
 
     elif code in ("CONFIRMED", "CFM"):
-        db.execute('UPDATE pedidos SET estado=? WHERE order_id=?', "Confirmado", order_id)
+        _atualizar_estado(order_id, "Confirmado")
 
     elif code in ("READY_TO_PICKUP", "RTP"):
         # manter pickup code (já salvo por pedido_detalhes); aqui só reflete estado
-        db.execute('UPDATE pedidos SET estado=? WHERE order_id=?', "Pronto para retirada", order_id)
+        _atualizar_estado(order_id, "Pronto para retirada")
 
     elif code in ("DISPATCHED", "DSP"):
-        db.execute('UPDATE pedidos SET estado=? WHERE order_id=?', "Despachado", order_id)
+        _atualizar_estado(order_id, "Despachado")
 
     elif code in ("CANCELLATION_REQUESTED", "CANC_REQ"):
-        db.execute('UPDATE pedidos SET estado=? WHERE order_id=?', "Cancelamento solicitado", order_id)
+        _atualizar_estado(order_id, "Cancelamento solicitado")
 
     elif code in ("CANCELLED", "CANCELED", "CANC_APPROVED"):
-        db.execute('UPDATE pedidos SET estado=? WHERE order_id=?', "Cancelado", order_id)
+        _atualizar_estado(order_id, "Cancelado")
+        motivos_cancelamento.invalidar(order_id)
 
     # Plataforma de Negociação de Pedidos / outros códigos:
     # Se precisar, adicione aqui os códigos NEGOTIATION_* => atualize estado/observações específicas.
 
 # ---------------- Polling + ACK + Idempotência ----------------
-_stop_polling = threading.Event()
-_polling_thread = None
-
-def _ack_events(headers: dict, event_ids: List[str]):
-    if not event_ids:
-        return
-    url_ack = "https://merchant-api.ifood.com.br/order/v1.0/events/acknowledgment"
-    try:
-        SESSION.post(url_ack, headers=headers, json={"eventIds": event_ids}, timeout=20)
-    except Exception as e:
-        print("[ifood][ack] erro:", e)
-
-def _polling_loop(merchant_ids: Optional[List[str]] = None):
-    jitter = 0
-    while not _stop_polling.is_set():
-        try:
-            token, _ = get_ifood_token()
-            headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
-            if merchant_ids:
-                headers["x-polling-merchants"] = ",".join(merchant_ids)
-
-            url = "https://merchant-api.ifood.com.br/order/v1.0/events:polling"
-            resp = SESSION.get(url, headers=headers, timeout=20)
-            if resp.status_code in (401, 403):
-                invalidate_token()
-                token, _ = get_ifood_token()
-                headers["Authorization"] = f"Bearer {token}"
-                resp = SESSION.get(url, headers=headers, timeout=20)
-            resp.raise_for_status()
-
-            events = resp.json() or []
-            ids = [e.get("id") for e in events if e.get("id")]
-
-            # ACK imediato de TUDO (independente de processamento)
-            if ids:
-                _ack_events(headers, ids)
-
-            # processar com idempotência
-            for evt in events:
-                eid = evt.get("id")
-                if not eid:
-                    continue
-                exists = db.execute("SELECT 1 FROM ifood_events WHERE event_id=? LIMIT 1", eid)
-                if exists:
-                    continue
-                db.execute(
-                    "INSERT OR IGNORE INTO ifood_events (event_id, order_id, code, received_at) VALUES (?,?,?,datetime('now'))",
-                    eid, evt.get("orderId") or evt.get("id") or "", _event_code(evt)
-                )
-                _event_q.put(evt)
-
-        except Exception as e:
-            print("[ifood][polling] erro:", e)
-
-        time.sleep(POLL_EVERY_SECONDS + jitter)
-        jitter = (jitter + 1) % 3  # jitter leve anti-sincronismo
+# Busca, ACK (durável, em lote) e dedup/entrega rodam em estágios separados
+# (poller_ifood.py). A latência createdAt -> pedidos é registrada no worker.
+metricas_latencia = MetricasLatencia()
+_poller: Optional[PollerIFood] = None
+_poller_lock = threading.Lock()
 
 def start_ifood_polling(merchant_ids: Optional[List[str]] = None):
-    global _polling_thread
-    if _polling_thread and _polling_thread.is_alive():
-        return
-    _stop_polling.clear()
-    _polling_thread = threading.Thread(target=_polling_loop, args=(merchant_ids,), daemon=True)
-    _polling_thread.start()
+    global _poller
+    with _poller_lock:
+        if _poller and _poller.ativo():
+            return
+        _poller = PollerIFood(cliente, db, _filtro_eventos, enqueue_ifood_events, POLL_EVERY_SECONDS,
+                              merchant_ids, metricas_latencia)
+        _poller.iniciar()
 
 def stop_ifood_polling():
-    _stop_polling.set()
+    with _poller_lock:
+        if _poller:
+            _poller.parar()
 
 # ---------------- Rotas ----------------
 @app.route("/ifood/token", methods=["GET"])
 def ifood_token_health():
     try:
         token, exp = get_ifood_token()
-        return jsonify({"ok": True, "accessToken": token, "expiresAt": int(exp)})
+        return jsonify({"ok": True, "accessToken": token, "expiresAt": int(exp), "stats": tokens.status()})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -467,38 +793,41 @@ def ifood_cancellation_reasons():
     order_id = request.args.get("order_id")
     if not order_id:
         return {"ok": False, "error": "order_id obrigatório"}, 400
-    token, _ = get_ifood_token()
-    url = f"https://merchant-api.ifood.com.br/order/v1.0/orders/{order_id}/cancellationReasons"
-    resp = SESSION.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=20)
-    if resp.status_code in (401, 403):
-        invalidate_token()
-        token, _ = get_ifood_token()
-        resp = SESSION.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=20)
+    merchant_id = request.args.get("merchant_id") or _merchant_do_pedido(order_id)
     try:
-        resp.raise_for_status()
-        return {"ok": True, "reasons": resp.json()}
-    except requests.HTTPError:
-        return {"ok": False, "status": resp.status_code, "text": (resp.text or "")[:200]}, 502
+        motivos, origem = motivos_cancelamento.obter(order_id, merchant_id)
+        return {"ok": True, "reasons": motivos, "source": origem}
+    except IFoodErroHTTP as e:
+        return {"ok": False, "status": e.status_code, "text": (e.resposta.text or "")[:200]}, 502
+    except IFoodErroRede as e:
+        return {"ok": False, "error": str(e)}, 502
 
 @app.route('/webhook_ifood', methods=['POST'])
 def webhook_ifood():
     """
-    - Valida HMAC (X-IFood-Signature)
+    - Valida HMAC (X-IFood-Signature) enquanto lê o corpo
     - Responde 202 em até 5s
     - Trata KEEPALIVE (retorna merchantIds)
-    - Enfileira eventos (idempotência no worker/polling)
+    - Publica os eventos na fila durável antes do 202 (503 se falhar)
     """
     try:
-        # 1) assinatura
-        if not _valid_signature(request):
+        # 1) corpo + assinatura (uma leitura do stream)
+        try:
+            corpo, assinatura_ok = _ler_corpo_assinado(request)
+        except CorpoGrandeDemais:
+            return jsonify({"error": "payload too large"}), 413
+        if not assinatura_ok:
             return jsonify({"error": "invalid signature"}), 401
 
         # 2) corpo pode ser lista ou dict ou até vazio (heartbeat)
-        data = request.get_json(silent=True)
-        if data is None:
+        try:
+            pares = _eventos_do_corpo(corpo)
+        except ValueError:
+            return ("", 202)
+        if not pares:
             return ("", 202)
 
-        events = data if isinstance(data, list) else [data]
+        events = [evt for evt, _ in pares]
 
         # 3) KEEPALIVE
         for evt in events:
@@ -509,14 +838,25 @@ def webhook_ifood():
                     return jsonify({"merchantIds": mids}), 202
                 return ("", 202)
 
-        # 4) Enfileira (ACK é somente no polling; no webhook basta 202)
-        for evt in events:
-            _event_q.put(evt)
+        # 4) Deduplica (mesmo filtro do polling) e publica na fila durável na
+        #    mesma transação que grava ifood_events: só responde 202 com o
+        #    evento no banco (ACK é somente no polling; no webhook basta 202)
+        texto_por_evento = {id(evt): txt for evt, txt in pares}
+        novos = _filtro_eventos.novos(events)
 
+        def _publicar():
+            if novos and not enqueue_ifood_events(novos, [texto_por_evento[id(evt)] for evt in novos]):
+                raise RuntimeError("workers encerrando; eventos não aceitos")
+
+        _filtro_eventos.gravar(novos, _publicar)
         return ("", 202)
     except Exception as e:
+        # evento não ficou durável: erro para o iFood reenviar (o filtro já
+        # descartou os ids, então a reentrega não é tratada como duplicada)
         print(f"[webhook_ifood] erro: {e}")
-        return ("", 202)  # manter 202 para evitar retentativas agressivas
+        return jsonify({"error": "evento não aceito, reenviar"}), 503
+
+ACOES_IFOOD = ("confirm", "startPreparation", "readyToPickup", "dispatch", "requestCancellation")
 
 @app.route('/ifood/action', methods=['POST'])
 def ifood_action():
@@ -531,67 +871,44 @@ def ifood_action():
 
     if not order_id or not action:
         return {"ok": False, "error": "order_id e action são obrigatórios"}, 400
+    if action not in ACOES_IFOOD:
+        return {"ok": False, "error": f"action inválida: {action}"}, 400
 
-    def _call(api_token: str):
-        url = f"https://merchant-api.ifood.com.br/order/v1.0/orders/{order_id}/{action}"
-        headers = {
-            "Authorization": f"Bearer {api_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-        }
-        body = {}
-        if action == "requestCancellation":
-            # Exigir reasonCode do front (após listar via /cancellationReasons)
-            reason = data.get("reasonCode")
-            if not reason:
-                return None, {"ok": False, "error": "reasonCode obrigatório para requestCancellation", "status_code": 400}
-            body = {"reason": reason, "description": data.get("reasonDescription") or ""}
-
-        resp = SESSION.post(url, headers=headers, json=body, timeout=20)
-        return resp, None
+    body = {}
+    if action == "requestCancellation":
+        # Exigir reasonCode do front (após listar via /cancellationReasons)
+        reason = data.get("reasonCode")
+        if not reason:
+            return {"ok": False, "error": "reasonCode obrigatório para requestCancellation", "status_code": 400}, 400
+        body = {"reason": reason, "description": data.get("reasonDescription") or ""}
 
     try:
-        token, _ = get_ifood_token()
-        resp, early = _call(token)
-        if early:
-            return early, 400
-        if resp.status_code in (401, 403):
-            invalidate_token()
-            token, _ = get_ifood_token()
-            resp, _ = _call(token)
-
-        ok = (resp.status_code == 202)
-        try:
-            payload = resp.json()
-        except ValueError:
-            payload = {"status": resp.status_code, "text": (resp.text or "")[:200]}
-
-        if ok and estado:
-            try:
-                db.execute('UPDATE pedidos SET estado=? WHERE order_id=?', estado, order_id)
-            except Exception as e:
-                print("[ifood][action] falha ao atualizar estado local:", e)
-
-        return {"ok": ok, "response": payload, "status_code": resp.status_code}
-    except requests.RequestException as e:
-        return {"ok": False, "error": f"HTTP error: {e}", "status_code": getattr(e.response, "status_code", None)}, 502
+        # aceita na hora; o progresso chega pelo socket (evento "ifood_acao")
+        r = acoes.enviar(order_id, action, body, estado)
+        return {"ok": True, "queued": True, "status": r["status"], "id": r["id"], "status_code": 202}, 202
     except Exception as e:
         return {"ok": False, "error": str(e)}, 500
 
+@app.route("/ifood/action/status", methods=["GET"])
+def ifood_action_status():
+    return {"ok": True, **acoes.status(request.args.get("order_id"))}
+
 @app.route("/ifood/order/<order_id>", methods=["GET"])
 def ifood_order_detail(order_id: str):
     "Endpoint utilitário de inspeção (exibir campos cruciais para a UI/comanda)."
-    token, _ = get_ifood_token()
-    url = f"https://merchant-api.ifood.com.br/order/v1.0/orders/{order_id}"
-    resp = SESSION.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=20)
-    if resp.status_code in (401, 403):
-        invalidate_token()
-        token, _ = get_ifood_token()
-        resp = SESSION.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=20)
-    resp.raise_for_status()
-    order = resp.json()
-    data = extrair_pedido_ifood(order)
-    return jsonify({"ok": True, "order": data})
+    det = detalhe_pedido(order_id)
+    resp = jsonify({"ok": True, "order": det.dict})
+    resp.set_etag(det.etag)
+    return resp.make_conditional(request)  # If-None-Match da UI => 304 sem corpo
+
+@app.route("/ifood/cache/stats", methods=["GET"])
+def http_cache_stats():
+    return {"ok": True, "pedidos": _cache_pedidos.status(), "motivos": motivos_cancelamento.status()}
+
+@app.route("/ifood/events/stats", methods=["GET"])
+def http_event_stats():
+    polling = _poller.status() if _poller else {"ativo": False, "latencia": metricas_latencia.status()}
+    return {"ok": True, **event_worker_stats(), "dedup": _filtro_eventos.status(), "polling": polling}
 
 @app.route("/ifood/polling/start", methods=["POST"])
 def http_start_polling():
@@ -607,6 +924,44 @@ def http_stop_polling():
     stop_ifood_polling()
     return {"ok": True, "running": False}
 
+@app.route("/ifood/polling/status", methods=["GET"])
+def http_polling_status():
+    "Shards, cadência/backoff e estatísticas por merchant do polling."
+    if not _poller:
+        return {"ok": True, "ativo": False}
+    return {"ok": True, **_poller.status()}
+
+# ---------------- Analytics (séries JSON + gráficos sob demanda) ----------------
+analytics = Analytics(db)
+atexit.register(analytics.parar)
+
+def _args_analytics() -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    de, ate = request.args.get("de") or None, request.args.get("ate") or None
+    if de and ate and de > ate:
+        de, ate = ate, de
+    return de, ate, request.args.get("carrinho") or None
+
+@app.route("/analytics", methods=["GET"])
+def http_analytics():
+    "Séries do intervalo (?de=&ate=&carrinho=); ETag = versão dos agregados => 304."
+    dados = analytics.series(*_args_analytics())
+    resp = jsonify({"ok": True, **dados})
+    if dados["versao"]:
+        resp.set_etag(dados["versao"])
+    return resp.make_conditional(request)
+
+@app.route("/analytics/grafico/<tipo>.png", methods=["GET"])
+def http_analytics_grafico(tipo: str):
+    try:
+        png = analytics.grafico(tipo, *_args_analytics())
+    except ValueError as e:
+        return {"ok": False, "erro": str(e)}, 400
+    return Response(png, mimetype="image/png", headers={"Cache-Control": "private, max-age=60"})
+
+@app.route("/analytics/stats", methods=["GET"])
+def http_analytics_stats():
+    return {"ok": True, **analytics.status()}
+
 # ---------------- Inicialização opcional do polling ----------------
 if START_POLLING_ENV:
     mids = None
@@ -614,6 +969,9 @@ if START_POLLING_ENV:
         mids = [x.strip() for x in MERCHANT_IDS_ENV.split(",") if x.strip()]
     start_ifood_polling(mids)
 
+if START_ARQUIVO_ENV:
+    particao_pedidos.iniciar_arquivamento_agendado(db)
+
 # ---------------- Main guard (opcional) ----------------
 if __name__ == "__main__":
     # Inicie como preferir (gunicorn/uwsgi em produção; aqui apenas dev)
@@ -0,0 +1,247 @@
+# ===========================
+# IFOOD - CLIENTE HTTP ASSÍNCRONO
+# ===========================
+# Um único aiohttp.ClientSession (keep-alive, pool de conexões) rodando num
+# event loop dedicado em background. Rotas Flask, workers e poller chamam a
+# fachada síncrona (get/post/buscar_pedidos), que só agenda a corrotina no
+# loop; várias chamadas em voo compartilham as mesmas conexões.
+#   - concorrência limitada por semáforo
+#   - retentativa com backoff exponencial + jitter em 429/5xx e erro de rede
+#     (respeita Retry-After)
+#   - 401/403: invalida o token uma vez e repete
+#   - a fachada síncrona espera no máximo o pior caso das retentativas
+#     (prazo_total); estourado, a corrotina é cancelada e sobe IFoodErroRede
+import os
+import json
+import random
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import aiohttp
+from multidict import CIMultiDict
+
+IFOOD_API_BASE   = os.getenv("IFOOD_API_BASE", "https://merchant-api.ifood.com.br").rstrip("/")
+HTTP_CONCORRENCIA = int(os.getenv("IFOOD_HTTP_CONCORRENCIA", "16"))
+HTTP_TENTATIVAS  = int(os.getenv("IFOOD_HTTP_TENTATIVAS", "4"))
+HTTP_TIMEOUT_S   = float(os.getenv("IFOOD_HTTP_TIMEOUT", "20"))
+BACKOFF_BASE_S   = float(os.getenv("IFOOD_HTTP_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX_S    = float(os.getenv("IFOOD_HTTP_BACKOFF_MAX", "8"))
+
+STATUS_RETENTAVEL = {429, 500, 502, 503, 504}
+
+class IFoodErroHTTP(Exception):
+    "Resposta HTTP de erro (após as retentativas). `resposta` traz status/texto."
+    def __init__(self, resposta: "RespostaIFood"):
+        super().__init__(f"HTTP {resposta.status_code}: {resposta.text[:200]}")
+        self.resposta = resposta
+        self.status_code = resposta.status_code
+
+class IFoodErroRede(Exception):
+    "Falha de rede/timeout que persistiu após as retentativas."
+
+class RespostaIFood:
+    "Resposta já lida do corpo (o mesmo formato que as rotas usavam do requests)."
+    __slots__ = ("status_code", "headers", "content")
+
+    def __init__(self, status_code: int, headers: Dict[str, str], content: bytes):
+        self.status_code = status_code
+        # cabeçalhos HTTP não diferenciam maiúsculas: "Retry-After" == "retry-after"
+        self.headers = CIMultiDict(headers)
+        self.content = content
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        if not self.content:
+            return None
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise IFoodErroHTTP(self)
+
+class ClienteIFood:
+    def __init__(self, token_fn: Callable[[], str], invalidar_fn: Callable[[Optional[str]], None],
+                 base_url: str = IFOOD_API_BASE, concorrencia: int = HTTP_CONCORRENCIA,
+                 tentativas: int = HTTP_TENTATIVAS, timeout: float = HTTP_TIMEOUT_S):
+        """
+        token_fn() -> access token atual (síncrono; roda fora do loop).
+        invalidar_fn(token) descarta o token recusado após um 401/403.
+        """
+        self.token_fn = token_fn
+        self.invalidar_fn = invalidar_fn
+        self.base_url = base_url.rstrip("/")
+        self.concorrencia = concorrencia
+        self.tentativas = max(1, tentativas)
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._start_lock = threading.Lock()
+        self.stats = {"requisicoes": 0, "retentativas": 0, "erros": 0, "em_voo": 0}
+
+    # ---------------- Loop em background ----------------
+    def _garantir_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                pronto = threading.Event()
+
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(pronto.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=_run, name="ifood-http", daemon=True)
+                self._thread.start()
+                pronto.wait()
+                self._loop = loop
+        return self._loop
+
+    async def _sessao(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            conector = aiohttp.TCPConnector(limit=self.concorrencia * 2, keepalive_timeout=60,
+                                            ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=conector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Accept": "application/json"},
+            )
+            self._sem = asyncio.Semaphore(self.concorrencia)
+        return self._session
+
+    def agendar(self, coro) -> "concurrent.futures.Future":
+        "Agenda uma corrotina no loop do cliente sem esperar (chamável de qualquer thread)."
+        return asyncio.run_coroutine_threadsafe(coro, self._garantir_loop())
+
+    def executar(self, coro, timeout: Optional[float] = None):
+        """
+        Roda uma corrotina no loop do cliente e espera o resultado (chamável de
+        qualquer thread). Estourado o `timeout`, cancela a corrotina (libera o
+        semáforo/conexão) e levanta IFoodErroRede.
+        """
+        fut = self.agendar(coro)
+        try:
+            return fut.result(timeout)
+        except concurrent.futures.TimeoutError:
+            fut.cancel()
+            self.stats["erros"] += 1
+            raise IFoodErroRede(f"sem resposta em {timeout:.1f}s") from None
+
+    def prazo_total(self, tentativas: Optional[int] = None) -> float:
+        "Pior caso de uma request(): cada tentativa no timeout + backoff máximo, mais o reenvio após 401/403."
+        n = (tentativas or self.tentativas) + 1
+        return n * self.timeout + n * BACKOFF_MAX_S + 1.0
+
+    def fechar(self):
+        if self._loop is None:
+            return
+        async def _fechar():
+            if self._session is not None:
+                await self._session.close()
+        try:
+            self.executar(_fechar(), timeout=5)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # ---------------- Requisição com retentativa ----------------
+    def _url(self, caminho: str) -> str:
+        return caminho if caminho.startswith("http") else f"{self.base_url}{caminho}"
+
+    @staticmethod
+    def _espera(tentativa: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(BACKOFF_MAX_S, float(retry_after))
+            except ValueError:
+                pass
+        base = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** tentativa))
+        return base * (0.5 + random.random() / 2)
+
+    async def request(self, metodo: str, caminho: str, *, json_body: Any = None,
+                      data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+                      auth: bool = True, token: Optional[str] = None,
+                      tentativas: Optional[int] = None) -> RespostaIFood:
+        sessao = await self._sessao()
+        url = self._url(caminho)
+        tentativas = tentativas or self.tentativas
+        reautenticou = False
+        ultimo_erro: Optional[Exception] = None
+
+        tentativa = 0
+        while tentativa < tentativas:
+            hdrs = dict(headers or {})
+            if auth:
+                if token is None:
+                    token = await asyncio.to_thread(self.token_fn)
+                hdrs["Authorization"] = f"Bearer {token}"
+            try:
+                async with self._sem:
+                    self.stats["requisicoes"] += 1
+                    self.stats["em_voo"] += 1
+                    try:
+                        async with sessao.request(metodo, url, json=json_body, data=data, headers=hdrs) as r:
+                            resp = RespostaIFood(r.status, r.headers, await r.read())
+                    finally:
+                        self.stats["em_voo"] -= 1
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                ultimo_erro = e
+                tentativa += 1
+                if tentativa < tentativas:
+                    self.stats["retentativas"] += 1
+                    await asyncio.sleep(self._espera(tentativa - 1, None))
+                continue
+
+            if auth and resp.status_code in (401, 403) and not reautenticou:
+                # token recusado: descarta e tenta de novo uma vez (não conta como retentativa)
+                reautenticou = True
+                await asyncio.to_thread(self.invalidar_fn, token)
+                token = None
+                continue
+            if resp.status_code in STATUS_RETENTAVEL and tentativa + 1 < tentativas:
+                self.stats["retentativas"] += 1
+                await asyncio.sleep(self._espera(tentativa, resp.headers.get("Retry-After")))
+                tentativa += 1
+                continue
+            return resp
+
+        self.stats["erros"] += 1
+        raise IFoodErroRede(f"{metodo} {url}: {ultimo_erro}")
+
+    # ---------------- Fachada síncrona ----------------
+    def get(self, caminho: str, prazo: Optional[float] = None, **kw) -> RespostaIFood:
+        return self.executar(self.request("GET", caminho, **kw),
+                             timeout=prazo or self.prazo_total(kw.get("tentativas")))
+
+    def post(self, caminho: str, prazo: Optional[float] = None, **kw) -> RespostaIFood:
+        return self.executar(self.request("POST", caminho, **kw),
+                             timeout=prazo or self.prazo_total(kw.get("tentativas")))
+
+    # ---------------- Pedidos ----------------
+    async def pedido(self, order_id: str, token: Optional[str] = None) -> dict:
+        resp = await self.request("GET", f"/order/v1.0/orders/{order_id}", token=token)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def pedidos(self, order_ids: List[str], token: Optional[str] = None) -> List[Union[dict, Exception]]:
+        "Busca vários pedidos em paralelo (limitado pelo semáforo). Erros voltam na posição."
+        return await asyncio.gather(*(self.pedido(oid, token) for oid in order_ids), return_exceptions=True)
+
+    def buscar_pedido(self, order_id: str, token: Optional[str] = None) -> dict:
+        return self.executar(self.pedido(order_id, token), timeout=self.prazo_total())
+
+    def buscar_pedidos(self, order_ids: List[str], token: Optional[str] = None) -> List[Union[dict, Exception]]:
+        # em paralelo, mas o semáforo enfileira: uma "onda" por `concorrencia` pedidos
+        ondas = max(1, -(-len(order_ids) // self.concorrencia))
+        return self.executar(self.pedidos(order_ids, token), timeout=ondas * self.prazo_total())
@@ -1,6 +1,11 @@
 from datetime import datetime, timedelta
-from cs50 import SQL
+from banco import conectar
+from dsl_opcoes import opcoes_json
+from sincronizar_semente import imprimir_resumo, sincronizar
+import opcoes_canonicas
 import shutil
+import time
+import sys
 import os
 
 
@@ -315,12 +320,47 @@ dados_estoque_geral = [
 
 
 
+DDL_CARDAPIO = "CREATE TABLE IF NOT EXISTS cardapio (id INTEGER PRIMARY KEY AUTOINCREMENT, item TEXT, preco REAL, categoria_id INTEGER, opcoes TEXT, instrucoes TEXT, image TEXT, preco_base REAL, usable_on_qr INTEGER DEFAULT 1,subcategoria TEXT, subsubcategoria TEXT)"
+DDL_ESTOQUE = "CREATE TABLE IF NOT EXISTS estoque (id INTEGER PRIMARY KEY AUTOINCREMENT, item TEXT, quantidade REAL, estoque_ideal REAL)"
+DDL_ESTOQUE_GERAL = "CREATE TABLE IF NOT EXISTS estoque_geral (id INTEGER PRIMARY KEY AUTOINCREMENT, item TEXT, quantidade REAL, estoque_ideal REAL)"
+COLUNAS_CARDAPIO = ('item', 'preco', 'categoria_id', 'opcoes', 'instrucoes', 'image', 'preco_base', 'usable_on_qr', 'subcategoria', 'subsubcategoria')
+COLUNAS_ESTOQUE = ('item', 'quantidade', 'estoque_ideal')
+
+def linhas_cardapio():
+    "dados_cardapio como vai para a tabela (opções compiladas, preco_base = preco)."
+    return [{**row, 'opcoes': opcoes_json(row.get('opcoes', None)), 'preco_base': row.get('preco', None),
+             'usable_on_qr': row.get('usable_on_qr', 0)} for row in dados_cardapio]
+
+def sincronizar_tudo(db, dry_run=False):
+    "Aplica só a diferença entre as sementes e as tabelas, numa transação. Ids existentes não mudam."
+    t0 = time.perf_counter()
+    colunas_cardapio = COLUNAS_CARDAPIO
+    if opcoes_canonicas.instalada(db):
+        # cardapio.opcoes é gerado das tabelas canônicas: mudar opção é lá (opcoes_canonicas.py)
+        colunas_cardapio = tuple(c for c in COLUNAS_CARDAPIO if c != 'opcoes')
+        print("[semente] fonte canônica de opções instalada: cardapio.opcoes não é sincronizado")
+    with db.transacao():
+        resumos = [
+            sincronizar(db, 'cardapio', linhas_cardapio(), colunas_cardapio, ddl=DDL_CARDAPIO, dry_run=dry_run),
+            sincronizar(db, 'estoque', dados_estoque, COLUNAS_ESTOQUE, ddl=DDL_ESTOQUE, dry_run=dry_run),
+            sincronizar(db, 'estoque_geral', dados_estoque_geral, COLUNAS_ESTOQUE, ddl=DDL_ESTOQUE_GERAL, dry_run=dry_run),
+        ]
+    imprimir_resumo(resumos, time.perf_counter() - t0)
+    return resumos
+
 var = True
-if var:
+recriar = False  # True: comportamento antigo (DROP TABLE e reinserção; os ids mudam)
+if var and not recriar:
+    DATABASE_PATH = "/data/dados.db"
+    if not os.path.exists(DATABASE_PATH):
+        shutil.copy("dados.db", DATABASE_PATH)
+    sincronizar_tudo(conectar(DATABASE_PATH), dry_run="--dry-run" in sys.argv)
+
+elif var:
     DATABASE_PATH = "/data/dados.db"
     if not os.path.exists(DATABASE_PATH):
         shutil.copy("dados.db", DATABASE_PATH)
-    db = SQL("sqlite:///" + DATABASE_PATH)
+    db = conectar(DATABASE_PATH)
     db.execute("DROP TABLE IF EXISTS cardapio")
     db.execute("DROP TABLE IF EXISTS estoque")
     db.execute("DROP TABLE IF EXISTS estoque_geral")
@@ -328,7 +368,7 @@ if var:
     for row in dados_cardapio:
         db.execute(
             "INSERT INTO cardapio (item, preco, categoria_id, opcoes, instrucoes, image, preco_base, usable_on_qr, subcategoria, subsubcategoria) VALUES (?, ?, ?, ?, ?,?,?,?,?,?)",
-            row.get('item',None), row.get('preco',None), row.get('categoria_id',None), row.get('opcoes',None), row.get('instrucoes',None), row.get('image',None), row.get('preco',None), row.get('usable_on_qr',0),row.get('subcategoria',None), row.get('subsubcategoria',None)
+            row.get('item',None), row.get('preco',None), row.get('categoria_id',None), opcoes_json(row.get('opcoes',None)), row.get('instrucoes',None), row.get('image',None), row.get('preco',None), row.get('usable_on_qr',0),row.get('subcategoria',None), row.get('subsubcategoria',None)
             )
     db.execute(
             "CREATE TABLE IF NOT EXISTS estoque (id INTEGER PRIMARY KEY AUTOINCREMENT, item TEXT, quantidade REAL, estoque_ideal REAL)"
@@ -350,7 +390,7 @@ if var:
     
 
 else:
-    db = SQL('sqlite:///data/dados.db')
+    db = conectar('data/dados.db')
 
     hoje = datetime.now().date()
     print(hoje)
@@ -0,0 +1,306 @@
+# ===========================
+# MIGRAÇÃO DE COLUNAS JSON (streaming, paralela, retomável)
+# ===========================
+# Correções como a do deleteAll.py liam a tabela inteira para a memória,
+# reinterpretavam cada JSON e faziam um UPDATE em autocommit por linha, com o
+# servidor em uso. MigracaoJSON generaliza o processo para qualquer coluna JSON:
+#   - leitura    : chunks por keyset (WHERE chave > último ORDER BY chave LIMIT n),
+#                  sem OFFSET e sem carregar a tabela
+#   - transform  : função de módulo (picklável) aplicada num ProcessPool; até
+#                  2 chunks por processo ficam em voo enquanto outro é gravado
+#   - escrita    : um BEGIN IMMEDIATE por chunk, com UPDATE condicional
+#                  (só grava se a coluna ainda tem o texto lido: a escrita
+#                  concorrente do servidor vence e a linha é refeita no fim)
+#   - checkpoint : último id gravado e ids em conflito ainda por refazer, na
+#                  mesma transação (migracoes_json); um restart continua de
+#                  onde parou e refaz os conflitos de antes da queda
+#   - auditoria  : um registro por chunk em opcoes_audit (ids alterados e, no
+#                  dry-run, o diff por linha); dry_run=True só grava a auditoria
+#   - cardapio.opcoes com a fonte canônica instalada: o valor novo vai para
+#                  opcoes_grupos/opcoes (opcoes_canonicas.gravar_grupos) e os
+#                  triggers regeram o JSON; o UPDATE direto seria recusado
+#
+# transformar(dados) recebe o JSON já lido (tolerante a aspas simples) e
+# devolve o novo valor (pode mutar e devolver o mesmo objeto); None = manter.
+#
+#   python migracao_json.py status    [caminho_do_banco]
+#   python migracao_json.py auditoria <nome> [caminho_do_banco]
+import os
+import sys
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import opcoes_canonicas
+from opcoes_canonicas import _load_json_relaxed
+
+MIGRACAO_CHUNK     = int(os.getenv("MIGRACAO_CHUNK", "500"))
+MIGRACAO_PROCESSOS = int(os.getenv("MIGRACAO_PROCESSOS", str(min(4, os.cpu_count() or 1))))
+MIGRACAO_DIFF_MAX  = int(os.getenv("MIGRACAO_DIFF_MAX", "50"))  # caminhos por linha na auditoria
+MIGRACAO_RETENTATIVAS = 3  # rodadas para linhas alteradas pelo servidor no meio do chunk
+
+TABELA_CHECKPOINT = "migracoes_json"
+TABELA_AUDIT      = "opcoes_audit"
+
+def ensure_schema(db):
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABELA_CHECKPOINT} (
+      nome          TEXT PRIMARY KEY,
+      tabela        TEXT,
+      coluna        TEXT,
+      ultimo_id     INTEGER DEFAULT 0,
+      lidas         INTEGER DEFAULT 0,
+      alteradas     INTEGER DEFAULT 0,
+      conflitos     INTEGER DEFAULT 0,
+      erros         INTEGER DEFAULT 0,
+      status        TEXT,
+      iniciada_em   TEXT,
+      atualizada_em TEXT,
+      pendentes     TEXT
+    )""")
+    if "pendentes" not in [c["name"] for c in db.execute(f"PRAGMA table_info({TABELA_CHECKPOINT})")]:
+        db.execute(f"ALTER TABLE {TABELA_CHECKPOINT} ADD COLUMN pendentes TEXT")  # JSON: ids em conflito
+    # mesmo formato da auditoria do /opcoes/bulk-update
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABELA_AUDIT} (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      created_at TEXT DEFAULT (datetime('now')),
+      actor TEXT,
+      where_json TEXT,
+      set_json TEXT,
+      dry_run INTEGER,
+      matched INTEGER,
+      updated INTEGER,
+      items_json TEXT
+    )""")
+
+# ---------------- Diff ----------------
+def diff_json(antes: Any, depois: Any, caminho: str = "", saida: Optional[List[dict]] = None,
+              limite: int = MIGRACAO_DIFF_MAX) -> List[dict]:
+    "Caminhos alterados entre dois JSONs: [{'caminho': '0.options.1.esgotado', 'antes', 'depois'}]."
+    saida = [] if saida is None else saida
+    if len(saida) >= limite:
+        return saida
+    if isinstance(antes, dict) and isinstance(depois, dict):
+        for k in list(antes) + [k for k in depois if k not in antes]:
+            sub = f"{caminho}.{k}" if caminho else str(k)
+            if k not in depois:
+                saida.append({"caminho": sub, "antes": antes[k], "depois": None, "removido": True})
+            elif k not in antes:
+                saida.append({"caminho": sub, "antes": None, "depois": depois[k]})
+            else:
+                diff_json(antes[k], depois[k], sub, saida, limite)
+    elif isinstance(antes, list) and isinstance(depois, list) and len(antes) == len(depois):
+        for i, (a, d) in enumerate(zip(antes, depois)):
+            diff_json(a, d, f"{caminho}.{i}" if caminho else str(i), saida, limite)
+    elif antes != depois or type(antes) is not type(depois):
+        saida.append({"caminho": caminho or "$", "antes": antes, "depois": depois})
+    return saida[:limite]
+
+# ---------------- Transform (roda nos processos) ----------------
+def _transformar_lote(transformar: Callable[[Any], Any], lote: Sequence[Tuple[int, str]],
+                      com_diff: bool = True) -> List[tuple]:
+    "[(id, texto)] -> [(id, novo_texto | None, diff | None, erro | None)]."
+    saida = []
+    for rid, texto in lote:
+        dados, _ = _load_json_relaxed(texto)
+        if dados is None:
+            saida.append((rid, None, None, "JSON ilegível"))
+            continue
+        antes = json.dumps(dados, ensure_ascii=False)
+        try:
+            novo = transformar(dados)
+        except Exception as e:
+            saida.append((rid, None, None, f"{type(e).__name__}: {e}"))
+            continue
+        depois = None if novo is None else json.dumps(novo, ensure_ascii=False)
+        if depois is None or depois == antes:
+            saida.append((rid, None, None, None))
+        else:
+            saida.append((rid, depois, diff_json(json.loads(antes), novo) if com_diff else None, None))
+    return saida
+
+# ---------------- Motor ----------------
+class MigracaoJSON:
+    def __init__(self, db, nome: str, transformar: Callable[[Any], Any], tabela: str = "cardapio",
+                 coluna: str = "opcoes", chave: str = "id", chunk: int = MIGRACAO_CHUNK,
+                 processos: int = MIGRACAO_PROCESSOS, dry_run: bool = False, actor: Optional[str] = None,
+                 com_diff: Optional[bool] = None):
+        """
+        transformar precisa ser uma função de módulo (vai para outro processo).
+        processos <= 1 roda tudo no processo atual (tabelas pequenas).
+        com_diff: diff por linha na auditoria (padrão: só no dry-run; fora
+        dele a auditoria guarda os ids, e o diff custa mais que o transform).
+        """
+        self.db = db
+        self.nome = nome
+        self.transformar = transformar
+        self.tabela, self.coluna, self.chave = tabela, coluna, chave
+        self.chunk = max(1, chunk)
+        self.processos = processos
+        self.dry_run = dry_run
+        self.actor = actor or f"migracao:{nome}"
+        self.com_diff = dry_run if com_diff is None else com_diff
+        # cardapio.opcoes gerado: escreve nas tabelas canônicas
+        self.canonica = (tabela, coluna, chave) == ("cardapio", "opcoes", "id") and opcoes_canonicas.instalada(db)
+        ensure_schema(db)
+
+    def _ler(self, depois_de: int, ids: Optional[List[int]] = None) -> List[Tuple[int, str]]:
+        if ids is not None:
+            marcas = ",".join("?" * len(ids))
+            rows = self.db.execute(f"SELECT {self.chave} AS k, {self.coluna} AS v FROM {self.tabela} "
+                                   f"WHERE {self.chave} IN ({marcas})", *ids)
+        else:
+            rows = self.db.execute(f"SELECT {self.chave} AS k, {self.coluna} AS v FROM {self.tabela} "
+                                   f"WHERE {self.chave} > ? AND {self.coluna} IS NOT NULL AND {self.coluna} != '' "
+                                   f"ORDER BY {self.chave} LIMIT ?", depois_de, self.chunk)
+        return [(r["k"], r["v"]) for r in rows if r["v"]]
+
+    def _checkpoint(self) -> Optional[dict]:
+        r = self.db.execute(f"SELECT * FROM {TABELA_CHECKPOINT} WHERE nome = ?", self.nome)
+        return r[0] if r else None
+
+    def _gravar(self, lote: List[Tuple[int, str]], resultados: List[tuple], rel: Dict[str, Any],
+                checkpoint: bool = True, pendentes: Sequence[int] = ()) -> List[int]:
+        """
+        Um chunk numa transação: UPDATEs condicionais + auditoria + checkpoint.
+        `pendentes` são os conflitos acumulados antes deste chunk; o checkpoint
+        guarda eles mais os novos. Retorna os conflitos do chunk.
+        """
+        originais = dict(lote)
+        alteradas = [(rid, novo, diff) for rid, novo, diff, erro in resultados if novo is not None]
+        erros = [{"id": rid, "erro": erro} for rid, _, _, erro in resultados if erro]
+        conflitos: List[int] = []
+        agora = datetime.now().isoformat(timespec="seconds")
+        with self.db.transacao():
+            if not self.dry_run:
+                for rid, novo, _ in alteradas:
+                    if self.canonica:
+                        atual = self.db.execute("SELECT opcoes FROM cardapio WHERE id = ?", rid)
+                        if not atual or atual[0]["opcoes"] != originais[rid]:
+                            conflitos.append(rid)
+                            continue
+                        opcoes_canonicas.gravar_grupos(self.db, rid, json.loads(novo))
+                        continue
+                    n = self.db.execute(f"UPDATE {self.tabela} SET {self.coluna} = ? "
+                                        f"WHERE {self.chave} = ? AND {self.coluna} IS ?", novo, rid, originais[rid])
+                    if not n:
+                        conflitos.append(rid)
+            gravadas = [(rid, diff) for rid, _, diff in alteradas if rid not in conflitos]
+            if gravadas or erros:
+                self.db.execute(
+                    f"INSERT INTO {TABELA_AUDIT} (actor, where_json, set_json, dry_run, matched, updated, items_json) "
+                    f"VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    self.actor,
+                    json.dumps({"migracao": self.nome, "tabela": self.tabela, "coluna": self.coluna,
+                                "de_id": lote[0][0], "ate_id": lote[-1][0]}, ensure_ascii=False),
+                    json.dumps({"diffs": [{"id": rid, "diff": d} for rid, d in gravadas], "erros": erros},
+                               ensure_ascii=False, default=str),
+                    1 if self.dry_run else 0, len(lote), len(gravadas),
+                    json.dumps([rid for rid, _ in gravadas]))
+            rel["lidas"] += len(lote) if checkpoint else 0
+            rel["alteradas"] += len(gravadas)
+            rel["erros"] += len(erros)
+            rel["conflitos"] += len(conflitos)
+            rel["chunks"] += 1
+            if checkpoint and not self.dry_run:
+                self.db.execute(f"UPDATE {TABELA_CHECKPOINT} SET ultimo_id = ?, lidas = ?, alteradas = ?, "
+                                f"conflitos = ?, erros = ?, pendentes = ?, atualizada_em = ? WHERE nome = ?",
+                                lote[-1][0], rel["lidas"], rel["alteradas"], rel["conflitos"],
+                                rel["erros"], json.dumps(list(pendentes) + conflitos), agora, self.nome)
+        for e in erros:
+            print(f"[migracao][{self.nome}] {self.tabela}.{self.chave}={e['id']}: {e['erro']}")
+        return conflitos
+
+    def executar(self, reiniciar: bool = False) -> Dict[str, Any]:
+        """
+        Roda até o fim (ou continua a execução interrompida com o mesmo nome).
+        reiniciar=True ignora o checkpoint. Retorna o relatório.
+        """
+        t0 = time.perf_counter()
+        agora = datetime.now().isoformat(timespec="seconds")
+        rel = {"nome": self.nome, "dry_run": self.dry_run, "lidas": 0, "alteradas": 0, "conflitos": 0,
+               "erros": 0, "chunks": 0, "retomada_de": None}
+        inicio = 0
+        conflitos: List[int] = []
+        ck = None if self.dry_run else self._checkpoint()
+        if ck and ck["status"] == "em_andamento" and not reiniciar:
+            inicio = ck["ultimo_id"] or 0
+            conflitos = json.loads(ck["pendentes"] or "[]")  # conflitos de antes da queda
+            rel.update(lidas=ck["lidas"], alteradas=ck["alteradas"], conflitos=ck["conflitos"],
+                       erros=ck["erros"], retomada_de=inicio)
+            print(f"[migracao][{self.nome}] retomando depois de {self.chave}={inicio}"
+                  f"{f' com {len(conflitos)} conflito(s) pendente(s)' if conflitos else ''}")
+        elif not self.dry_run:
+            self.db.execute(f"INSERT OR REPLACE INTO {TABELA_CHECKPOINT} (nome, tabela, coluna, ultimo_id, status, "
+                            f"iniciada_em, atualizada_em, pendentes) VALUES (?, ?, ?, 0, 'em_andamento', ?, ?, '[]')",
+                            self.nome, self.tabela, self.coluna, agora, agora)
+
+        pool = ProcessPoolExecutor(self.processos) if self.processos > 1 else None
+        try:
+            em_voo: deque = deque()
+            ultimo_lido, fim = inicio, False
+            while True:
+                while not fim and len(em_voo) < (2 * self.processos if pool else 1):
+                    lote = self._ler(ultimo_lido)
+                    if not lote:
+                        fim = True
+                        break
+                    ultimo_lido = lote[-1][0]
+                    em_voo.append((lote, pool.submit(_transformar_lote, self.transformar, lote, self.com_diff) if pool
+                                   else _transformar_lote(self.transformar, lote, self.com_diff)))
+                if not em_voo:
+                    break
+                lote, fut = em_voo.popleft()
+                conflitos += self._gravar(lote, fut.result() if pool else fut, rel, pendentes=conflitos)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        # linhas que o servidor mudou entre a leitura e a escrita: refeitas sobre o valor novo
+        for _ in range(MIGRACAO_RETENTATIVAS):
+            if not conflitos:
+                break
+            lote = self._ler(0, ids=conflitos)
+            conflitos = self._gravar(lote, _transformar_lote(self.transformar, lote, self.com_diff), rel, checkpoint=False) if lote else []
+            if not self.dry_run:
+                self.db.execute(f"UPDATE {TABELA_CHECKPOINT} SET pendentes = ? WHERE nome = ?",
+                                json.dumps(conflitos), self.nome)
+        rel["pendentes"] = conflitos
+
+        if not self.dry_run:
+            self.db.execute(f"UPDATE {TABELA_CHECKPOINT} SET status = ?, conflitos = ?, alteradas = ?, "
+                            f"pendentes = ?, atualizada_em = ? WHERE nome = ?",
+                            "concluida" if not conflitos else "com_pendencias", rel["conflitos"], rel["alteradas"],
+                            json.dumps(conflitos), datetime.now().isoformat(timespec="seconds"), self.nome)
+        rel["segundos"] = round(time.perf_counter() - t0, 3)
+        rel["linhas_por_s"] = round(rel["lidas"] / rel["segundos"]) if rel["segundos"] else None
+        return rel
+
+# ---------------- CLI ----------------
+def main(argv: List[str]):
+    from banco import conectar
+    if not argv or argv[0] not in ("status", "auditoria") or (argv[0] == "auditoria" and len(argv) < 2):
+        print("uso: python migracao_json.py status [banco] | auditoria <nome> [banco]")
+        sys.exit(2)
+    if argv[0] == "status":
+        db = conectar(argv[1] if len(argv) > 1 else "data/dados.db")
+        ensure_schema(db)
+        for r in db.execute(f"SELECT * FROM {TABELA_CHECKPOINT} ORDER BY atualizada_em DESC"):
+            print(json.dumps(r, ensure_ascii=False))
+        return
+    db = conectar(argv[2] if len(argv) > 2 else "data/dados.db")
+    ensure_schema(db)
+    for r in db.execute(f"SELECT * FROM {TABELA_AUDIT} WHERE actor = ? ORDER BY id", f"migracao:{argv[1]}"):
+        alvo = json.loads(r["where_json"])
+        print(f"#{r['id']} {r['created_at']} {'[dry-run] ' if r['dry_run'] else ''}"
+              f"ids {alvo['de_id']}..{alvo['ate_id']}: {r['updated']}/{r['matched']} alteradas")
+        for d in json.loads(r["set_json"])["diffs"]:
+            for c in d["diff"] or []:
+                print(f"    {d['id']}: {c['caminho']}: {c['antes']!r} -> {c['depois']!r}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
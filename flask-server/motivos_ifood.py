@@ -0,0 +1,123 @@
+# ===========================
+# IFOOD - CACHE DE MOTIVOS DE CANCELAMENTO
+# ===========================
+# O diálogo de cancelamento do caixa chamava o iFood ao vivo a cada abertura.
+# Os motivos quase nunca mudam entre pedidos do mesmo merchant, então:
+#   - prefetch  : ao processar o PLACED, os motivos do pedido são buscados em
+#                 background (sem segurar o worker)
+#   - obter     : entrada válida sai da memória; vencida sai da memória e
+#                 dispara a renovação em background (stale-while-revalidate)
+#   - fallback  : sem entrada do pedido, espera o iFood até `timeout`; se ele
+#                 estiver lento ou falhar, serve a última lista conhecida do
+#                 merchant (marcada como origem "merchant")
+# Uma busca por pedido em voo por vez (single-flight), no loop do ClienteIFood.
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FuturoTimeout
+from typing import Deque, Dict, List, Optional, Tuple
+
+from cache_ifood import CacheTTL
+from poller_ifood import _percentis
+
+MOTIVOS_TTL_S          = float(os.getenv("IFOOD_MOTIVOS_TTL", "600"))
+MOTIVOS_MERCHANT_TTL_S = float(os.getenv("IFOOD_MOTIVOS_MERCHANT_TTL", "86400"))
+MOTIVOS_MAX            = int(os.getenv("IFOOD_MOTIVOS_MAX", "2000"))
+MOTIVOS_TIMEOUT_S      = float(os.getenv("IFOOD_MOTIVOS_TIMEOUT", "1.5"))
+LATENCIAS_JANELA       = int(os.getenv("IFOOD_LATENCIA_JANELA", "2000"))
+
+class MotivosCancelamento:
+    def __init__(self, cliente, ttl: float = MOTIVOS_TTL_S, timeout: float = MOTIVOS_TIMEOUT_S,
+                 max_itens: int = MOTIVOS_MAX, ttl_merchant: float = MOTIVOS_MERCHANT_TTL_S):
+        self.cliente = cliente
+        self.timeout = timeout
+        self.por_pedido = CacheTTL(ttl, max_itens, "motivos_pedido")
+        self.por_merchant = CacheTTL(ttl_merchant, 500, "motivos_merchant")
+        self._lock = threading.Lock()
+        self._em_voo: Dict[str, Future] = {}
+        self._latencias: Dict[str, Deque[float]] = {}
+        self.stats = {"prefetch": 0, "buscas": 0, "falhas": 0, "renovacoes_bg": 0}
+
+    # ---------------- Busca (single-flight) ----------------
+    async def _baixar(self, order_id: str) -> List[dict]:
+        resp = await self.cliente.request("GET", f"/order/v1.0/orders/{order_id}/cancellationReasons")
+        resp.raise_for_status()
+        return resp.json() or []
+
+    def _buscar(self, order_id: str, merchant_id: Optional[str]) -> Future:
+        with self._lock:
+            fut = self._em_voo.get(order_id)
+            if fut is not None:
+                return fut
+            geracao = self.por_pedido.geracao(order_id)
+            fut = self.cliente.agendar(self._baixar(order_id))
+            self._em_voo[order_id] = fut
+            self.stats["buscas"] += 1
+
+        def _fim(f: Future):
+            with self._lock:
+                self._em_voo.pop(order_id, None)
+            if f.exception() is not None:
+                self.stats["falhas"] += 1
+                print(f"[ifood][motivos] falha ao buscar {order_id}:", f.exception())
+                return
+            motivos = f.result()
+            self.por_pedido.gravar(order_id, motivos, geracao=geracao)
+            if merchant_id and motivos:
+                self.por_merchant.gravar(merchant_id, motivos)
+
+        fut.add_done_callback(_fim)
+        return fut
+
+    def prefetch(self, order_id: str, merchant_id: Optional[str] = None):
+        "Dispara a busca em background (não bloqueia). Chamar no PLACED."
+        if self.por_pedido.obter(order_id) is None:
+            self.stats["prefetch"] += 1
+            self._buscar(order_id, merchant_id)
+
+    def invalidar(self, order_id: str):
+        self.por_pedido.invalidar(order_id)
+
+    # ---------------- Leitura ----------------
+    def obter(self, order_id: str, merchant_id: Optional[str] = None) -> Tuple[List[dict], str]:
+        """
+        Retorna (motivos, origem), origem em: cache, cache_vencido, ifood, merchant.
+        Levanta o erro do iFood só quando não há nenhuma lista para servir.
+        """
+        t0 = time.perf_counter()
+        e = self.por_pedido.obter_entrada(order_id)
+        if e is not None:
+            if e.vencida:
+                self.stats["renovacoes_bg"] += 1
+                self._buscar(order_id, merchant_id)
+            origem, motivos = ("cache_vencido" if e.vencida else "cache"), e.valor
+        else:
+            fut = self._buscar(order_id, merchant_id)
+            reserva = self.por_merchant.obter_entrada(merchant_id) if merchant_id else None
+            try:
+                # com lista do merchant à mão, o iFood só tem `timeout` para responder
+                motivos, origem = fut.result(self.timeout if reserva is not None else None), "ifood"
+            except FuturoTimeout:
+                motivos, origem = reserva.valor, "merchant"
+            except Exception:
+                if reserva is None:
+                    raise
+                motivos, origem = reserva.valor, "merchant"
+        self._registrar(origem, (time.perf_counter() - t0) * 1000)
+        return motivos, origem
+
+    # ---------------- Métricas ----------------
+    def _registrar(self, origem: str, ms: float):
+        with self._lock:
+            d = self._latencias.get(origem)
+            if d is None:
+                d = self._latencias[origem] = deque(maxlen=LATENCIAS_JANELA)
+            d.append(ms)
+
+    def status(self) -> dict:
+        with self._lock:
+            latencias = {o: _percentis(list(d)) for o, d in self._latencias.items()}
+            em_voo = len(self._em_voo)
+        return {**self.stats, "em_voo": em_voo, "latencia_por_origem": latencias,
+                "por_pedido": self.por_pedido.status(), "por_merchant": self.por_merchant.status()}
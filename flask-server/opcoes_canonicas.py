@@ -0,0 +1,454 @@
+# ===========================
+# OPÇÕES DO CARDÁPIO - FONTE CANÔNICA
+# ===========================
+# Antes as opções existiam duas vezes: o JSON em cardapio.opcoes (lido com
+# _load_json_relaxed a cada uso, inclusive com aspas simples) e a tabela
+# `opcoes` (por grupo_slug/opcao_slug). Agora a fonte é uma só:
+#   - opcoes_grupos : um grupo por (id_cardapio, grupo_slug) com nome, ids,
+#                     max_selected, obrigatorio e ordem
+#   - opcoes        : uma opção por (id_cardapio, grupo_slug, opcao_slug),
+#                     com índice único
+#   - cardapio.opcoes passa a ser GERADO: triggers nas duas tabelas refazem o
+#     JSON do item (mesmo formato de antes) a cada escrita, venha de onde vier.
+#     Chaves do JSON que as colunas não cobrem vão para `extras` e voltam no
+#     JSON gerado
+#   - escrita direta em cardapio.opcoes (UPDATE/INSERT com outro JSON) é
+#     RECUSADA por trigger, em vez de sumir na próxima regeração: quem gravava
+#     o JSON usa gravar_grupos(db, id, grupos), que reparte nas tabelas
+#   - IndiceOpcoes  : preço/esgotado por (item, grupo, opção) em O(1), refeito
+#                     quando a versão do cardápio muda (cache_cardapio)
+#   - verificar()   : acusa divergências; migrar() converte os dois formatos
+#
+#   python opcoes_canonicas.py migrar    [caminho_do_banco] [--dry-run]   (idempotente; instala o que faltar)
+#   python opcoes_canonicas.py verificar [caminho_do_banco]
+import re
+import sys
+import json
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import cache_cardapio
+
+TABELA_GRUPOS = "opcoes_grupos"
+TABELA_OPCOES = "opcoes"
+
+# chaves do JSON com coluna própria; o resto do objeto vai para `extras`
+CHAVES_GRUPO = ("nome", "ids", "options", "opcoes", "max_selected", "obrigatorio")
+CHAVES_OPCAO = ("nome", "valor_extra", "esgotado")
+ERRO_ESCRITA_DIRETA = "cardapio.opcoes é gerado das tabelas opcoes_grupos/opcoes: use opcoes_canonicas.gravar_grupos"
+
+# ---------------- Utilitários (vindos do deleteAll.py) ----------------
+def _to_float(x, default=0.0):
+    try:
+        return float(x)
+    except Exception:
+        return float(default)
+
+def _to_01(v, default=1):
+    """
+    Converte vários formatos (bool, str, num) em 0/1.
+    'true','sim','1' -> 1 ; 'false','nao','0' -> 0 ; caso indefinido -> default.
+    """
+    if isinstance(v, bool):
+        return 1 if v else 0
+    if isinstance(v, (int, float)):
+        return 1 if float(v) != 0.0 else 0
+    if isinstance(v, str):
+        s = v.strip().lower()
+        if s in ("1", "true", "verdadeiro", "sim", "yes", "y"):
+            return 1
+        if s in ("0", "false", "falso", "nao", "não", "no", "n"):
+            return 0
+    return int(default)
+
+def _load_json_relaxed(text):
+    """
+    Tenta fazer o parse do JSON de forma tolerante:
+    - primeiro json.loads normal
+    - se falhar, troca aspas simples por duplas
+    Retorna (obj, erro) onde obj é o JSON parseado ou None.
+    """
+    if text is None:
+        return None, None
+    try:
+        return json.loads(text), None
+    except Exception as e1:
+        try:
+            return json.loads(text.replace("'", '"')), None
+        except Exception as e2:
+            return None, (e1, e2)
+
+def slug(texto: Any) -> str:
+    "'Cebola Empanada' -> 'cebola-empanada' (mesmo formato da tabela opcoes)."
+    s = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", s.lower()).strip("-")
+
+def grupos_do_json(texto: Optional[str]) -> Tuple[Optional[List[dict]], Optional[str]]:
+    "JSON legado de cardapio.opcoes (ou a DSL do manipule.py) -> (lista de grupos, erro)."
+    if not texto:
+        return [], None
+    data, err = _load_json_relaxed(texto)
+    if data is None:
+        import dsl_opcoes  # importa slug daqui
+        try:
+            return dsl_opcoes.parse_opcoes(texto), None
+        except ValueError:
+            return None, "JSON ilegível"
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return None, f"formato inesperado: {type(data).__name__}"
+    return [g for g in data if isinstance(g, dict)], None
+
+# ---------------- Schema + geração do JSON ----------------
+def _sql_gerar(id_expr: str) -> str:
+    "SELECT que monta o JSON de cardapio.opcoes do item `id_expr` a partir das tabelas."
+    return f"""(
+    SELECT json_group_array(json(g.grupo)) FROM (
+      SELECT json_patch(json_object(
+        'nome', gr.nome_grupo, 'ids', COALESCE(gr.ids, ''),
+        'options', (SELECT json_group_array(json(o.opcao)) FROM (
+            SELECT json_patch(json_object('nome', op.opcao, 'valor_extra', op.valor_extra,
+                                          'esgotado', op.esgotado_bool), COALESCE(op.extras, '{{}}')) AS opcao
+            FROM {TABELA_OPCOES} op
+            WHERE op.id_cardapio = gr.id_cardapio AND op.grupo_slug = gr.grupo_slug
+            ORDER BY op.ordem, op.rowid) o),
+        'max_selected', gr.max_selected, 'obrigatorio', gr.obrigatorio), COALESCE(gr.extras, '{{}}')) AS grupo
+      FROM {TABELA_GRUPOS} gr WHERE gr.id_cardapio = {id_expr}
+      ORDER BY gr.ordem, gr.grupo_slug) g)"""
+
+def _existe(db, tabela: str) -> bool:
+    return bool(db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", tabela))
+
+def _colunas(db, tabela: str) -> List[str]:
+    return [c["name"] for c in db.execute(f"PRAGMA table_info({tabela})")]
+
+def ensure_tabelas(db):
+    "Tabelas e colunas da fonte canônica (sem índice único nem triggers)."
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABELA_OPCOES} (
+      id_cardapio INTEGER, item TEXT, nome_grupo TEXT, opcao TEXT, valor_extra REAL,
+      esgotado_bool INTEGER DEFAULT 1, grupo_slug TEXT, opcao_slug TEXT, updated_at TEXT
+    )""")
+    colunas = _colunas(db, TABELA_OPCOES)
+    if "ordem" not in colunas:
+        db.execute(f"ALTER TABLE {TABELA_OPCOES} ADD COLUMN ordem INTEGER DEFAULT 0")
+    if "extras" not in colunas:
+        db.execute(f"ALTER TABLE {TABELA_OPCOES} ADD COLUMN extras TEXT")
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABELA_GRUPOS} (
+      id_cardapio  INTEGER NOT NULL,
+      grupo_slug   TEXT NOT NULL,
+      nome_grupo   TEXT,
+      ids          TEXT DEFAULT '',
+      max_selected INTEGER DEFAULT 1,
+      obrigatorio  INTEGER DEFAULT 1,
+      ordem        INTEGER DEFAULT 0,
+      updated_at   TEXT,
+      extras       TEXT,
+      PRIMARY KEY (id_cardapio, grupo_slug)
+    )""")
+    if "extras" not in _colunas(db, TABELA_GRUPOS):
+        db.execute(f"ALTER TABLE {TABELA_GRUPOS} ADD COLUMN extras TEXT")
+
+def ensure_schema(db):
+    """
+    Índice único, triggers de geração e a trava contra escrita direta em
+    cardapio.opcoes. Exige a tabela `opcoes` sem duplicatas (rode migrar()
+    antes na primeira vez).
+    """
+    ensure_tabelas(db)
+    db.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_opcoes_item_grupo_opcao "
+               f"ON {TABELA_OPCOES} (id_cardapio, grupo_slug, opcao_slug)")
+    for tabela in (TABELA_OPCOES, TABELA_GRUPOS):
+        for op, alvos in (("INSERT", ("NEW",)), ("DELETE", ("OLD",)), ("UPDATE", ("OLD", "NEW"))):
+            corpo = "".join(
+                f"  UPDATE cardapio SET opcoes = COALESCE({_sql_gerar(f'{a}.id_cardapio')}, '[]') "
+                f"WHERE id = {a}.id_cardapio;\n" for a in alvos)
+            db.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{tabela}_gerar_{op.lower()} "
+                       f"AFTER {op} ON {tabela}\nBEGIN\n{corpo}END")
+    # o único valor aceito em cardapio.opcoes é o gerado; os triggers acima
+    # (e regenerar) gravam exatamente ele, então passam pela trava
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS trg_cardapio_opcoes_gerado_update "
+               f"BEFORE UPDATE OF opcoes ON cardapio "
+               f"WHEN NEW.opcoes IS NOT OLD.opcoes AND NEW.opcoes IS NOT COALESCE({_sql_gerar('NEW.id')}, '[]')\n"
+               f"BEGIN SELECT RAISE(ABORT, '{ERRO_ESCRITA_DIRETA}'); END")
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS trg_cardapio_opcoes_gerado_insert "
+               f"BEFORE INSERT ON cardapio WHEN COALESCE(NEW.opcoes, '') NOT IN ('', '[]')\n"
+               f"BEGIN SELECT RAISE(ABORT, '{ERRO_ESCRITA_DIRETA}'); END")
+    cache_cardapio.ensure_schema(db)  # IndiceOpcoes se guia pela versão do cardápio
+
+def instalada(db) -> bool:
+    "True se a fonte canônica já foi migrada neste banco."
+    return _existe(db, TABELA_GRUPOS)
+
+def gerar_json(db, id_cardapio: int) -> str:
+    "JSON de cardapio.opcoes do item, gerado das tabelas (o mesmo que os triggers gravam)."
+    return db.execute(f"SELECT COALESCE({_sql_gerar('?')}, '[]') AS js", id_cardapio)[0]["js"]
+
+def regenerar(db, ids: Optional[List[int]] = None) -> int:
+    "Regrava cardapio.opcoes dos itens (todos os que têm grupos, se ids=None)."
+    if ids is None:
+        return db.execute(f"UPDATE cardapio SET opcoes = COALESCE({_sql_gerar('cardapio.id')}, '[]') "
+                          f"WHERE id IN (SELECT DISTINCT id_cardapio FROM {TABELA_GRUPOS})")
+    n = 0
+    for i in ids:
+        n += db.execute(f"UPDATE cardapio SET opcoes = COALESCE({_sql_gerar('?')}, '[]') WHERE id = ?", i, i)
+    return n
+
+# ---------------- Migração dos formatos legados ----------------
+_SQL_INSERIR_GRUPO = (f"INSERT INTO {TABELA_GRUPOS} (id_cardapio, grupo_slug, nome_grupo, ids, max_selected, "
+                      f"obrigatorio, ordem, updated_at, extras) VALUES (?,?,?,?,?,?,?,?,?)")
+_SQL_INSERIR_OPCAO = (f"INSERT INTO {TABELA_OPCOES} (id_cardapio, item, nome_grupo, opcao, valor_extra, "
+                      f"esgotado_bool, grupo_slug, opcao_slug, updated_at, ordem, extras) VALUES (?,?,?,?,?,?,?,?,?,?,?)")
+
+def _extras(obj: dict, chaves: Tuple[str, ...]) -> Optional[str]:
+    "Chaves do objeto sem coluna própria, em JSON (None se não houver)."
+    resto = {k: v for k, v in obj.items() if k not in chaves and v is not None}
+    return json.dumps(resto, ensure_ascii=False) if resto else None
+
+def _ler_grupos(iid: int, gs: List[dict], agora: str, grupos: Dict[Tuple[int, str], dict],
+                opcoes: Dict[Tuple[int, str, str], dict]):
+    "Grupos do JSON de um item -> `grupos`/`opcoes` (o primeiro de cada slug vence)."
+    for gi, g in enumerate(gs):
+        gslug = slug(g.get("nome"))
+        grupos.setdefault((iid, gslug), {
+            "nome": g.get("nome"), "ids": g.get("ids") or "", "ordem": gi,
+            "max_selected": int(_to_float(g.get("max_selected"), 1)),
+            "obrigatorio": _to_01(g.get("obrigatorio"), default=1), "extras": _extras(g, CHAVES_GRUPO)})
+        for oi, o in enumerate(g.get("options") or g.get("opcoes") or []):
+            if not isinstance(o, dict):
+                continue
+            opcoes.setdefault((iid, gslug, slug(o.get("nome"))), {
+                "grupo": g.get("nome"), "opcao": o.get("nome"), "ordem": oi,
+                "valor_extra": _to_float(o.get("valor_extra")), "esgotado": _to_01(o.get("esgotado"), 0),
+                "updated_at": agora, "origem": "json", "extras": _extras(o, CHAVES_OPCAO)})
+
+def _linhas(grupos: Dict[Tuple[int, str], dict], opcoes: Dict[Tuple[int, str, str], dict],
+            nomes: Dict[int, str], agora: str) -> Tuple[List[tuple], List[tuple]]:
+    "Dicts de _ler_grupos -> parâmetros de _SQL_INSERIR_GRUPO/_SQL_INSERIR_OPCAO."
+    linhas_grupos = [(iid, gs, g["nome"], g["ids"], g["max_selected"], g["obrigatorio"], g["ordem"], agora,
+                      g.get("extras")) for (iid, gs), g in grupos.items()]
+    linhas_opcoes = [(iid, nomes[iid], grupos[(iid, gs)]["nome"], o["opcao"], o["valor_extra"],
+                      o["esgotado"], gs, os_, o["updated_at"], o["ordem"], o.get("extras"))
+                     for (iid, gs, os_), o in opcoes.items()]
+    return linhas_grupos, linhas_opcoes
+
+def _normalizar_grupos(db) -> Tuple[List[tuple], List[tuple], Dict[str, Any]]:
+    """
+    Junta os dois formatos legados. O JSON dá a estrutura (grupos, ordem,
+    ids, max_selected, obrigatorio, chaves extras); a tabela `opcoes`
+    (editada pelas telas, com updated_at) prevalece em valor_extra/esgotado,
+    e opções que só existem nela entram no fim do grupo. Linhas duplicadas:
+    fica a mais recente.
+    """
+    itens = {r["id"]: r for r in db.execute("SELECT id, item, opcoes FROM cardapio")}
+    rel = {"itens": 0, "grupos": 0, "opcoes": 0, "conflitos": 0, "so_na_tabela": 0, "so_no_json": 0,
+           "duplicadas": 0, "orfas": 0, "ilegiveis": []}
+    grupos: Dict[Tuple[int, str], dict] = {}
+    opcoes: Dict[Tuple[int, str, str], dict] = {}
+    agora = datetime.now().isoformat(timespec="seconds")
+
+    for iid, row in itens.items():
+        gs, erro = grupos_do_json(row["opcoes"])
+        if gs is None:
+            rel["ilegiveis"].append({"id": iid, "item": row["item"], "erro": erro})
+            continue
+        _ler_grupos(iid, gs, agora, grupos, opcoes)
+
+    vistos = {}
+    legado = db.execute(f"SELECT rowid AS rid, * FROM {TABELA_OPCOES} ORDER BY COALESCE(updated_at, ''), rowid") \
+        if _existe(db, TABELA_OPCOES) else []
+    for r in legado:
+        if r["id_cardapio"] not in itens:
+            rel["orfas"] += 1
+            continue
+        gslug = r.get("grupo_slug") or slug(r["nome_grupo"])
+        chave = (r["id_cardapio"], gslug, r.get("opcao_slug") or slug(r["opcao"]))
+        if chave in vistos:
+            rel["duplicadas"] += 1  # ordenado por updated_at: a última vence
+        vistos[chave] = True
+        if (chave[0], gslug) not in grupos:
+            grupos[(chave[0], gslug)] = {"nome": r["nome_grupo"], "ids": "", "max_selected": 1, "obrigatorio": 1,
+                                         "ordem": 1000 + len(grupos)}
+        atual = opcoes.get(chave)
+        novo = {"valor_extra": _to_float(r["valor_extra"]), "esgotado": _to_01(r["esgotado_bool"], 0)}
+        if atual is None:
+            rel["so_na_tabela"] += 1
+            opcoes[chave] = {"grupo": r["nome_grupo"], "opcao": r["opcao"], "ordem": 1000 + r["rid"],
+                             "updated_at": r["updated_at"] or agora, "origem": "tabela", "extras": r.get("extras"),
+                             **novo}
+            continue
+        if atual["origem"] == "json" and (atual["valor_extra"], atual["esgotado"]) != (novo["valor_extra"], novo["esgotado"]):
+            rel["conflitos"] += 1
+        atual.update(novo, updated_at=r["updated_at"] or atual["updated_at"], origem="tabela")
+    rel["so_no_json"] = sum(1 for o in opcoes.values() if o["origem"] == "json")
+
+    linhas_grupos, linhas_opcoes = _linhas(grupos, opcoes, {iid: r["item"] for iid, r in itens.items()}, agora)
+    rel.update(itens=len({k[0] for k in grupos}), grupos=len(linhas_grupos), opcoes=len(linhas_opcoes))
+    return linhas_grupos, linhas_opcoes, rel
+
+def migrar(db, dry_run: bool = False) -> Dict[str, Any]:
+    "Converte JSON + tabela legada para a fonte canônica e regera cardapio.opcoes."
+    linhas_grupos, linhas_opcoes, rel = _normalizar_grupos(db)
+    if dry_run:
+        return {**rel, "dry_run": True}  # nada é gravado, nem o schema
+    with db.transacao():
+        ensure_tabelas(db)
+        # triggers fora durante a carga (senão regeraria o JSON a cada linha)
+        for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_%_gerar_%'"):
+            db.execute(f"DROP TRIGGER {r['name']}")
+        db.execute(f"DELETE FROM {TABELA_OPCOES}")
+        db.execute(f"DELETE FROM {TABELA_GRUPOS}")
+        db.executemany(_SQL_INSERIR_GRUPO, linhas_grupos)
+        db.executemany(_SQL_INSERIR_OPCAO, linhas_opcoes)
+        ensure_schema(db)
+        rel["regenerados"] = regenerar(db)
+    return {**rel, "dry_run": False}
+
+# ---------------- Escrita a partir do JSON ----------------
+def gravar_grupos(db, id_cardapio: int, grupos: Any) -> Dict[str, int]:
+    """
+    Substitui as opções do item pelas de `grupos` (lista no formato de
+    cardapio.opcoes, ou o texto JSON/DSL) numa transação; os triggers regeram
+    cardapio.opcoes. É o caminho de quem gravava o JSON direto (rotas
+    /opcoes, MigracaoJSON), que agora é recusado pelo trigger de trava.
+    valor_extra/esgotado/extras vêm de `grupos`, como no UPDATE de antes.
+    """
+    if grupos is None or isinstance(grupos, str):
+        gs, erro = grupos_do_json(grupos)
+        if gs is None:
+            raise ValueError(f"opções ilegíveis: {erro}")
+    else:
+        gs = [grupos] if isinstance(grupos, dict) else [g for g in grupos if isinstance(g, dict)]
+    item = db.execute("SELECT item FROM cardapio WHERE id = ?", id_cardapio)
+    if not item:
+        raise ValueError(f"item {id_cardapio} não existe no cardápio")
+    agora = datetime.now().isoformat(timespec="seconds")
+    g: Dict[Tuple[int, str], dict] = {}
+    o: Dict[Tuple[int, str, str], dict] = {}
+    _ler_grupos(id_cardapio, gs, agora, g, o)
+    linhas_grupos, linhas_opcoes = _linhas(g, o, {id_cardapio: item[0]["item"]}, agora)
+    with db.transacao():
+        db.execute(f"DELETE FROM {TABELA_OPCOES} WHERE id_cardapio = ?", id_cardapio)
+        db.execute(f"DELETE FROM {TABELA_GRUPOS} WHERE id_cardapio = ?", id_cardapio)
+        db.executemany(_SQL_INSERIR_GRUPO, linhas_grupos)
+        db.executemany(_SQL_INSERIR_OPCAO, linhas_opcoes)
+    return {"grupos": len(linhas_grupos), "opcoes": len(linhas_opcoes)}
+
+# ---------------- Verificação ----------------
+def verificar(db) -> List[dict]:
+    "Lista de divergências entre cardapio.opcoes e a fonte canônica (vazia = consistente)."
+    problemas: List[dict] = []
+    existe = {r["name"] for r in db.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    if TABELA_GRUPOS not in existe:
+        return [{"tipo": "sem_fonte_canonica", "detalhe": "rode: python opcoes_canonicas.py migrar"}]
+    faltando = [f"trg_{t}_gerar_{op}" for t in (TABELA_OPCOES, TABELA_GRUPOS) for op in ("insert", "update", "delete")
+                if f"trg_{t}_gerar_{op}" not in existe]
+    faltando += [f"trg_cardapio_opcoes_gerado_{op}" for op in ("update", "insert")
+                 if f"trg_cardapio_opcoes_gerado_{op}" not in existe]
+    if faltando:
+        problemas.append({"tipo": "triggers_ausentes", "detalhe": faltando})
+
+    for r in db.execute(f"SELECT id_cardapio, grupo_slug, opcao_slug, COUNT(*) AS n FROM {TABELA_OPCOES} "
+                        f"GROUP BY 1, 2, 3 HAVING n > 1"):
+        problemas.append({"tipo": "duplicada", **r})
+    for r in db.execute(f"SELECT DISTINCT o.id_cardapio FROM {TABELA_OPCOES} o "
+                        f"LEFT JOIN cardapio c ON c.id = o.id_cardapio WHERE c.id IS NULL"):
+        problemas.append({"tipo": "opcao_orfa", "id_cardapio": r["id_cardapio"]})
+    for r in db.execute(f"SELECT DISTINCT o.id_cardapio, o.grupo_slug FROM {TABELA_OPCOES} o "
+                        f"LEFT JOIN {TABELA_GRUPOS} g ON g.id_cardapio = o.id_cardapio AND g.grupo_slug = o.grupo_slug "
+                        f"WHERE g.id_cardapio IS NULL"):
+        problemas.append({"tipo": "opcao_sem_grupo", **r})
+    for r in db.execute(f"SELECT o.id_cardapio, o.item, c.item AS item_cardapio FROM {TABELA_OPCOES} o "
+                        f"JOIN cardapio c ON c.id = o.id_cardapio WHERE o.item IS NOT c.item GROUP BY o.id_cardapio"):
+        problemas.append({"tipo": "nome_do_item_divergente", **r})
+
+    com_grupos = {r["id_cardapio"] for r in db.execute(f"SELECT DISTINCT id_cardapio FROM {TABELA_GRUPOS}")}
+    for r in db.execute("SELECT id, item, opcoes FROM cardapio"):
+        gravado, erro = grupos_do_json(r["opcoes"])
+        if gravado is None:
+            problemas.append({"tipo": "json_ilegivel", "id": r["id"], "item": r["item"], "erro": erro})
+            continue
+        if r["id"] not in com_grupos:
+            if gravado:
+                problemas.append({"tipo": "json_sem_fonte", "id": r["id"], "item": r["item"]})
+            continue
+        if gravado != json.loads(gerar_json(db, r["id"])):
+            problemas.append({"tipo": "json_divergente", "id": r["id"], "item": r["item"]})
+    return problemas
+
+# ---------------- Índice O(1) ----------------
+class Opcao:
+    __slots__ = ("id_cardapio", "grupo", "opcao", "valor_extra", "esgotado")
+
+    def __init__(self, id_cardapio: int, grupo: str, opcao: str, valor_extra: float, esgotado: int):
+        self.id_cardapio = id_cardapio
+        self.grupo = grupo
+        self.opcao = opcao
+        self.valor_extra = valor_extra
+        self.esgotado = bool(esgotado)
+
+class IndiceOpcoes:
+    """
+    Dicionário (id_cardapio, grupo_slug, opcao_slug) -> Opcao, mais nome do
+    item -> id. Refeito só quando cardapio_versao muda; consulta = um SELECT
+    da versão (chave primária) + acesso ao dict.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.versao = None
+        self._opcoes: Dict[Tuple[int, str, str], Opcao] = {}
+        self._ids: Dict[str, int] = {}
+
+    def _atual(self):
+        versao = cache_cardapio.versao_atual(self.db)
+        if versao != self.versao:
+            opcoes = {(r["id_cardapio"], r["grupo_slug"], r["opcao_slug"]):
+                      Opcao(r["id_cardapio"], r["nome_grupo"], r["opcao"], r["valor_extra"] or 0.0,
+                            r["esgotado_bool"] or 0)
+                      for r in self.db.execute(f"SELECT id_cardapio, grupo_slug, opcao_slug, nome_grupo, opcao, "
+                                               f"valor_extra, esgotado_bool FROM {TABELA_OPCOES}")}
+            ids = {slug(r["item"]): r["id"] for r in self.db.execute("SELECT id, item FROM cardapio")}
+            self._opcoes, self._ids, self.versao = opcoes, ids, versao
+        return self._opcoes
+
+    def id_do_item(self, item: Any) -> Optional[int]:
+        self._atual()
+        return item if isinstance(item, int) else self._ids.get(slug(item))
+
+    def obter(self, item: Any, grupo: str, opcao: str) -> Optional[Opcao]:
+        "item = id_cardapio ou nome; grupo/opção por nome ou slug."
+        opcoes = self._atual()
+        iid = item if isinstance(item, int) else self._ids.get(slug(item))
+        return opcoes.get((iid, slug(grupo), slug(opcao)))
+
+    def valor_extra(self, item: Any, grupo: str, opcao: str) -> Optional[float]:
+        o = self.obter(item, grupo, opcao)
+        return None if o is None else o.valor_extra
+
+    def disponivel(self, item: Any, grupo: str, opcao: str) -> Optional[bool]:
+        o = self.obter(item, grupo, opcao)
+        return None if o is None else not o.esgotado
+
+# ---------------- CLI ----------------
+def main(argv: List[str]):
+    from banco import conectar
+    if not argv or argv[0] not in ("migrar", "verificar"):
+        print("uso: python opcoes_canonicas.py migrar|verificar [caminho_do_banco] [--dry-run]")
+        return 2
+    args = [a for a in argv[1:] if not a.startswith("--")]
+    db = conectar(args[0] if args else "data/dados.db")
+    if argv[0] == "migrar":
+        rel = migrar(db, dry_run="--dry-run" in argv)
+        for k, v in rel.items():
+            print(f"[opcoes] {k}: {v}")
+    problemas = verificar(db)
+    for p in problemas:
+        print("[opcoes][verificar]", p)
+    print(f"[opcoes] {len(problemas)} divergência(s)")
+    return 1 if problemas else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+# ===========================
+# PEDIDOS - PARTIÇÃO QUENTE/FRIA
+# ===========================
+# `pedidos` guarda só o dia de serviço corrente (tabela quente, pequena).
+# Dias fechados vão para `pedidos_arquivo`; leituras que cruzam os dois lados
+# usam a view `pedidos_todos`. Quem só olha o dia atual (cozinha/bar) continua
+# consultando `pedidos` e não paga pelo histórico.
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+try:
+    import zoneinfo
+    tz_sp = zoneinfo.ZoneInfo("America/Sao_Paulo")
+except Exception:
+    from datetime import timezone
+    tz_sp = timezone(timedelta(hours=-3))
+
+TABELA_QUENTE  = "pedidos"
+TABELA_ARQUIVO = "pedidos_arquivo"
+VIEW_TODOS     = "pedidos_todos"
+# madrugada ainda pertence ao dia anterior: o dia de serviço vira às VIRADA_HORA
+VIRADA_HORA    = int(os.getenv("PEDIDOS_VIRADA_HORA", "5"))
+
+_arquivo_lock = threading.Lock()
+
+def dia_de_servico(agora: Optional[datetime] = None) -> str:
+    agora = agora or datetime.now(tz_sp)
+    return (agora - timedelta(hours=VIRADA_HORA)).strftime("%Y-%m-%d")
+
+def _colunas(db, tabela: str) -> List[dict]:
+    return db.execute(f"PRAGMA table_info({tabela})")
+
+def ensure_particao(db) -> List[str]:
+    """
+    Cria/atualiza a tabela de arquivo e a view unificada. Colunas novas em
+    `pedidos` são replicadas no arquivo (ALTER TABLE ADD COLUMN) e a view é
+    recriada com a lista explícita de colunas. Retorna essa lista.
+    """
+    quente = _colunas(db, TABELA_QUENTE)
+    nomes = [c["name"] for c in quente]
+
+    # mesma forma da quente, sem AUTOINCREMENT/UNIQUE: os ids vêm de `pedidos`
+    db.execute(f"CREATE TABLE IF NOT EXISTS {TABELA_ARQUIVO} AS SELECT * FROM {TABELA_QUENTE} WHERE 0")
+    no_arquivo = {c["name"] for c in _colunas(db, TABELA_ARQUIVO)}
+    for c in quente:
+        if c["name"] not in no_arquivo:
+            db.execute(f'ALTER TABLE {TABELA_ARQUIVO} ADD COLUMN "{c["name"]}" {c["type"] or ""}')
+
+    db.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABELA_ARQUIVO}_dia ON {TABELA_ARQUIVO} (dia)")
+    db.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABELA_ARQUIVO}_order_id ON {TABELA_ARQUIVO} (order_id)")
+    db.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABELA_ARQUIVO}_id ON {TABELA_ARQUIVO} (id)")
+
+    cols = ", ".join(f'"{n}"' for n in nomes)
+    db.execute(f"DROP VIEW IF EXISTS {VIEW_TODOS}")
+    db.execute(f"""
+    CREATE VIEW {VIEW_TODOS} AS
+      SELECT {cols} FROM {TABELA_QUENTE}
+      UNION ALL
+      SELECT {cols} FROM {TABELA_ARQUIVO}""")
+    return nomes
+
+def arquivar_pedidos(db, ate_dia: Optional[str] = None) -> int:
+    """
+    Move para o arquivo todas as linhas com dia < ate_dia (padrão: dia de
+    serviço atual). INSERT + DELETE na mesma transação. Retorna quantas linhas.
+    Linhas sem `dia` ficam na tabela quente.
+    """
+    ate_dia = ate_dia or dia_de_servico()
+    with _arquivo_lock:
+        nomes = ensure_particao(db)
+        cols = ", ".join(f'"{n}"' for n in nomes)
+        with db.transacao():
+            n = db.execute(f"SELECT COUNT(*) AS n FROM {TABELA_QUENTE} WHERE dia < ?", ate_dia)[0]["n"]
+            if n:
+                db.execute(f"INSERT INTO {TABELA_ARQUIVO} ({cols}) SELECT {cols} FROM {TABELA_QUENTE} WHERE dia < ?", ate_dia)
+                db.execute(f"DELETE FROM {TABELA_QUENTE} WHERE dia < ?", ate_dia)
+    if n:
+        print(f"[pedidos][arquivo] {n} linha(s) com dia < {ate_dia} arquivadas")
+    return n
+
+def atualizar_estado(db, order_id: str, estado: str) -> int:
+    "UPDATE de estado por order_id; se o pedido já foi arquivado, atualiza no arquivo."
+    n = db.execute(f"UPDATE {TABELA_QUENTE} SET estado=? WHERE order_id=?", estado, order_id)
+    if not n:
+        try:
+            n = db.execute(f"UPDATE {TABELA_ARQUIVO} SET estado=? WHERE order_id=?", estado, order_id)
+        except Exception:
+            n = 0  # arquivo ainda não criado
+    return n or 0
+
+def ler_estado(db, order_id: str) -> Optional[str]:
+    "Estado atual por order_id (quente primeiro, depois o arquivo). None se não existe."
+    for tabela in (TABELA_QUENTE, TABELA_ARQUIVO):
+        try:
+            rows = db.execute(f"SELECT estado FROM {tabela} WHERE order_id=? LIMIT 1", order_id)
+        except Exception:
+            rows = []  # arquivo ainda não criado
+        if rows:
+            return rows[0]["estado"]
+    return None
+
+def iniciar_arquivamento_agendado(db, hora: int = VIRADA_HORA):
+    """
+    Agenda arquivar_pedidos diariamente às hora:05 (apscheduler) e já roda
+    uma vez para recuperar dias que ficaram para trás. Retorna o scheduler.
+    """
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    def _job():
+        try:
+            arquivar_pedidos(db)
+        except Exception as e:
+            print("[pedidos][arquivo] erro:", e)
+
+    sched = BackgroundScheduler(timezone=tz_sp, daemon=True)
+    sched.add_job(_job, "cron", hour=hora, minute=5, id="arquivar_pedidos",
+                  coalesce=True, max_instances=1, replace_existing=True)
+    sched.start()
+    threading.Thread(target=_job, daemon=True).start()
+    return sched
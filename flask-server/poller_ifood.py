@@ -0,0 +1,374 @@
+# ===========================
+# IFOOD - POLLER EM PIPELINE (events:polling)
+# ===========================
+# Três estágios em threads separadas, ligados por filas:
+#   1) busca   : GET events:polling no ritmo de `intervalo`, medido do INÍCIO
+#                do ciclo (etapas lentas não empurram o próximo poll). Os
+#                merchants são repartidos em shards de até POLL_POR_SHARD, cada
+#                um com sua thread, cadência (defasada) e backoff. Merchant que
+#                derruba a chamada do shard (4xx) é isolado: passa a ser
+#                consultado sozinho, com backoff próprio, até voltar a responder
+#   2) entrega : dedup (FiltroIdempotencia) e, numa transação só, publica os
+#                novos na fila durável, grava ifood_events e põe os ids do
+#                ciclo em ifood_ack_pendentes. Se a publicação falha nada é
+#                gravado nem confirmado: o iFood devolve os eventos no próximo poll
+#   3) ACK     : os ids de ifood_ack_pendentes (já publicados) são confirmados
+#                em lote, com retentativa e backoff; o que sobrar de uma queda
+#                é confirmado no próximo start
+# Também mede a latência ponta a ponta: createdAt do evento no iFood -> pedido
+# gravado em `pedidos` (registrada por quem grava, via metricas.registrar).
+import os
+import time
+import queue
+import random
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional
+
+ACK_LOTE           = int(os.getenv("IFOOD_ACK_LOTE", "2000"))   # limite de ids por ACK
+ACK_TENTATIVAS_MAX = int(os.getenv("IFOOD_ACK_TENTATIVAS", "20"))
+ACK_BACKOFF_MAX_S  = float(os.getenv("IFOOD_ACK_BACKOFF_MAX", "30"))
+LATENCIAS_JANELA   = int(os.getenv("IFOOD_LATENCIA_JANELA", "2000"))
+POLL_POR_SHARD     = max(1, int(os.getenv("IFOOD_POLL_MERCHANTS_POR_SHARD", "20")))
+POLL_BACKOFF_MAX_S = float(os.getenv("IFOOD_POLL_BACKOFF_MAX", "300"))
+
+def ensure_schema(db):
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS ifood_ack_pendentes (
+      event_id   TEXT PRIMARY KEY,
+      criado_em  TEXT,
+      tentativas INTEGER NOT NULL DEFAULT 0
+    )""")
+
+def _epoch(iso: Optional[str]) -> Optional[float]:
+    if not iso:
+        return None
+    try:
+        return datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def particionar(merchant_ids: Optional[List[str]], por_shard: int = POLL_POR_SHARD) -> List[Optional[List[str]]]:
+    """
+    Reparte os merchants em shards equilibrados (i % n). Sem lista, um shard
+    único sem x-polling-merchants (todos os merchants do token).
+    """
+    ids = sorted(set(m for m in (merchant_ids or []) if m))
+    if not ids:
+        return [None]
+    n = -(-len(ids) // por_shard)
+    return [ids[i::n] for i in range(n)]
+
+def _erro_do_merchant(e: Exception) -> bool:
+    "4xx (menos 408/429) aponta para um merchant específico; 5xx/rede é geral."
+    status = getattr(e, "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+def _percentis(valores) -> dict:
+    if not valores:
+        return {"n": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    v = sorted(valores)
+    def p(q):
+        return round(v[min(len(v) - 1, int(q * len(v)))], 1)
+    return {"n": len(v), "p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99), "max_ms": round(v[-1], 1)}
+
+# ---------------- Métricas de latência ----------------
+class MetricasLatencia:
+    "Janela deslizante das latências createdAt -> busca e createdAt -> gravado em pedidos."
+    def __init__(self, janela: int = LATENCIAS_JANELA):
+        self._lock = threading.Lock()
+        self._busca: Deque[float] = deque(maxlen=janela)
+        self._ponta_a_ponta: Deque[float] = deque(maxlen=janela)
+
+    def registrar_busca(self, evt: dict, agora: Optional[float] = None):
+        t = _epoch(evt.get("createdAt"))
+        if t is not None:
+            with self._lock:
+                self._busca.append(((agora or time.time()) - t) * 1000)
+
+    def registrar(self, evt: dict, agora: Optional[float] = None):
+        "Chamar logo após o pedido do evento ser gravado em `pedidos`."
+        t = _epoch(evt.get("createdAt"))
+        if t is not None:
+            with self._lock:
+                self._ponta_a_ponta.append(((agora or time.time()) - t) * 1000)
+
+    def status(self) -> dict:
+        with self._lock:
+            busca, e2e = list(self._busca), list(self._ponta_a_ponta)
+        return {"created_ate_busca": _percentis(busca), "created_ate_pedidos": _percentis(e2e)}
+
+# ---------------- Poller ----------------
+class PollerIFood:
+    def __init__(self, cliente, db, filtro, enfileirar: Callable[[List[dict]], object], intervalo: float,
+                 merchant_ids: Optional[List[str]] = None, metricas: Optional[MetricasLatencia] = None,
+                 nome: str = "ifood-poller"):
+        """
+        cliente: ClienteIFood; filtro: FiltroIdempotencia; enfileirar(evts)
+        publica os eventos novos do ciclo na fila durável (um lote por ciclo)
+        e roda dentro da transação do filtro; False ou exceção = não publicado.
+        """
+        self.cliente = cliente
+        self.db = db
+        self.filtro = filtro
+        self.enfileirar = enfileirar
+        self.intervalo = intervalo
+        self.merchant_ids = merchant_ids
+        self.metricas = metricas or MetricasLatencia()
+        self.nome = nome
+        self.shards = particionar(merchant_ids)
+        self._lock = threading.Lock()
+        self._shard_stats = [{"merchants": s, "ciclos": 0, "erros": 0, "erros_seguidos": 0, "backoff_s": 0.0,
+                              "ultima_busca_ms": None} for s in self.shards]
+        self._merchants: Dict[str, dict] = {m: self._novo_merchant() for m in (merchant_ids or []) if m}
+        self._parar = threading.Event()
+        self._acordar_ack = threading.Event()
+        self._entrega_q: "queue.Queue[Optional[List[dict]]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self.stats: Dict[str, object] = {
+            "ciclos": 0, "erros_busca": 0, "eventos": 0, "novos": 0, "duplicados": 0,
+            "falhas_entrega": 0, "acks_enviados": 0, "ack_lotes": 0, "ack_falhas": 0, "ack_descartados": 0,
+            "atrasos_ciclo": 0, "ultima_busca_ms": None, "ultimo_erro": None,
+        }
+
+    # ---------------- Ciclo de vida ----------------
+    def ativo(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def iniciar(self):
+        if self.ativo():
+            return
+        self._parar.clear()
+        self._acordar_ack.set()  # confirma ACKs que ficaram pendentes de uma execução anterior
+        self._threads = [
+            threading.Thread(target=self._loop_busca, args=(i,), name=f"{self.nome}-busca-{i}", daemon=True)
+            for i in range(len(self.shards))
+        ] + [
+            threading.Thread(target=self._loop_ack, name=f"{self.nome}-ack", daemon=True),
+            threading.Thread(target=self._loop_entrega, name=f"{self.nome}-entrega", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def parar(self, timeout: float = 10.0):
+        self._parar.set()
+        self._acordar_ack.set()
+        self._entrega_q.put(None)
+        prazo = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(max(0.0, prazo - time.monotonic()))
+
+    # ---------------- Estágio 1: busca (um loop por shard) ----------------
+    @staticmethod
+    def _novo_merchant() -> dict:
+        return {"eventos": 0, "buscas": 0, "erros": 0, "erros_seguidos": 0, "isolado": False,
+                "suspenso_ate": 0.0, "ultimo_evento": None, "ultimo_ok": None, "ultimo_erro": None}
+
+    def _merchant(self, mid: str) -> dict:
+        st = self._merchants.get(mid)
+        if st is None:
+            st = self._merchants[mid] = self._novo_merchant()
+        return st
+
+    def _loop_busca(self, i: int):
+        sst = self._shard_stats[i]
+        # shards defasados dentro do intervalo: não batem no iFood ao mesmo tempo
+        proximo = time.monotonic() + self.intervalo * i / len(self.shards)
+        if self._parar.wait(proximo - time.monotonic()):
+            return
+        while not self._parar.is_set():
+            inicio = time.monotonic()
+            try:
+                self._ciclo_shard(self.shards[i])
+                sst["erros_seguidos"], sst["backoff_s"] = 0, 0.0
+            except Exception as e:
+                with self._lock:
+                    self.stats["erros_busca"] += 1
+                    self.stats["ultimo_erro"] = str(e)[:200]
+                sst["erros"] += 1
+                sst["erros_seguidos"] += 1
+                print(f"[ifood][polling][shard {i}] erro:", e)
+            sst["ciclos"] += 1
+            sst["ultima_busca_ms"] = round((time.monotonic() - inicio) * 1000, 1)
+            with self._lock:
+                self.stats["ciclos"] += 1
+                self.stats["ultima_busca_ms"] = sst["ultima_busca_ms"]
+
+            # cadência a partir do início do ciclo; jitter leve anti-sincronismo.
+            # Erro geral (5xx/rede) no shard: backoff só deste shard.
+            passo = self.intervalo
+            if sst["erros_seguidos"]:
+                passo = min(max(POLL_BACKOFF_MAX_S, self.intervalo),
+                            self.intervalo * (2 ** (sst["erros_seguidos"] - 1)))
+            sst["backoff_s"] = round(passo - self.intervalo, 1)
+            proximo += passo
+            agora = time.monotonic()
+            if proximo < agora:  # ciclo estourou o intervalo: não acumula atraso
+                with self._lock:
+                    self.stats["atrasos_ciclo"] += 1
+                proximo = agora
+            self._parar.wait(proximo - agora + random.uniform(0, min(1.0, self.intervalo / 10)))
+
+    def _ciclo_shard(self, merchants: Optional[List[str]]):
+        if merchants is None:
+            self._buscar(None)
+            return
+        agora = time.monotonic()
+        with self._lock:
+            grupo = [m for m in merchants if not self._merchants[m]["isolado"]]
+            isolados = [m for m in merchants
+                        if self._merchants[m]["isolado"] and self._merchants[m]["suspenso_ate"] <= agora]
+        if grupo:
+            try:
+                self._buscar(grupo)
+            except Exception as e:
+                if not _erro_do_merchant(e):
+                    raise  # erro geral: backoff do shard inteiro
+                if len(grupo) == 1:
+                    self._falha_merchant(grupo[0], e)
+                else:
+                    # alguém do grupo derrubou a chamada: consulta um a um para achar quem
+                    print(f"[ifood][polling] {e}; isolando merchants do shard")
+                    isolados = grupo + isolados
+        for m in isolados:
+            try:
+                self._buscar([m])
+            except Exception as e:
+                self._falha_merchant(m, e)
+                if not _erro_do_merchant(e):
+                    raise
+
+    def _falha_merchant(self, mid: str, e: Exception):
+        with self._lock:
+            st = self._merchant(mid)
+            st["erros"] += 1
+            st["erros_seguidos"] += 1
+            st["ultimo_erro"] = str(e)[:200]
+            if _erro_do_merchant(e):
+                st["isolado"] = True
+                espera = min(max(POLL_BACKOFF_MAX_S, self.intervalo),
+                             self.intervalo * (2 ** (st["erros_seguidos"] - 1)))
+                st["suspenso_ate"] = time.monotonic() + espera
+
+    def _buscar(self, merchants: Optional[List[str]]):
+        headers = {}
+        if merchants:
+            headers["x-polling-merchants"] = ",".join(merchants)
+        resp = self.cliente.get("/order/v1.0/events:polling", headers=headers)
+        resp.raise_for_status()
+        events = [e for e in (resp.json() or []) if isinstance(e, dict)]  # 204 = sem eventos
+        agora = time.time()
+        with self._lock:
+            for m in merchants or ():
+                st = self._merchant(m)
+                st["buscas"] += 1
+                st["ultimo_ok"] = agora
+                st["erros_seguidos"], st["isolado"], st["suspenso_ate"] = 0, False, 0.0
+            for e in events:
+                mid = e.get("merchantId")
+                if mid:
+                    st = self._merchant(mid)
+                    st["eventos"] += 1
+                    st["ultimo_evento"] = agora
+            self.stats["eventos"] += len(events)
+        if not events:
+            return
+        for e in events:
+            self.metricas.registrar_busca(e, agora)
+        self._entrega_q.put(events)
+
+    # ---------------- Estágio 2: dedup + publicação ----------------
+    def _loop_entrega(self):
+        while True:
+            events = self._entrega_q.get()
+            if events is None:
+                return
+            try:
+                self._entregar(events)
+            except Exception as e:
+                # sem ACK: o iFood devolve esses eventos no próximo poll
+                self.stats["falhas_entrega"] += 1
+                self.stats["ultimo_erro"] = f"entrega: {str(e)[:200]}"
+                print("[ifood][polling] erro na entrega (eventos voltam no próximo poll):", e)
+
+    def _entregar(self, events: List[dict]):
+        com_id = [e for e in events if e.get("id")]
+        novos = self.filtro.novos(com_id)
+
+        def _publicar():
+            if novos and self.enfileirar(novos) is False:
+                raise RuntimeError("fila não aceitou os eventos (workers encerrando)")
+            # ACK de TUDO o que veio no ciclo (novos e duplicados), só depois de publicado
+            self.db.executemany(
+                "INSERT OR IGNORE INTO ifood_ack_pendentes (event_id, criado_em) VALUES (?, datetime('now'))",
+                [(e["id"],) for e in com_id])
+
+        self.filtro.gravar(novos, _publicar)
+        self.stats["novos"] += len(novos)
+        self.stats["duplicados"] += len(events) - len(novos)
+        if com_id:
+            self._acordar_ack.set()
+
+    # ---------------- Estágio 3: ACK ----------------
+    def _loop_ack(self):
+        falhas = 0
+        while True:
+            self._acordar_ack.wait()
+            self._acordar_ack.clear()
+            while True:
+                lote = self.db.execute(
+                    "SELECT event_id, tentativas FROM ifood_ack_pendentes ORDER BY rowid LIMIT ?", ACK_LOTE)
+                if not lote:
+                    falhas = 0
+                    break
+                if self._ack_lote(lote):
+                    falhas = 0
+                    continue
+                falhas += 1
+                # backoff exponencial; parar() interrompe a espera
+                espera = min(ACK_BACKOFF_MAX_S, 0.5 * (2 ** falhas)) * (0.5 + random.random() / 2)
+                if self._parar.wait(espera):
+                    break
+            if self._parar.is_set():
+                return
+
+    def _ack_lote(self, lote: List[dict]) -> bool:
+        ids = [r["event_id"] for r in lote]
+        ph = ",".join("?" * len(ids))
+        try:
+            resp = self.cliente.post("/order/v1.0/events/acknowledgment", json_body={"eventIds": ids})
+            resp.raise_for_status()
+        except Exception as e:
+            self.stats["ack_falhas"] += 1
+            self.stats["ultimo_erro"] = f"ack: {str(e)[:200]}"
+            print("[ifood][ack] erro:", e)
+            with self.db.transacao():
+                self.db.execute(f"UPDATE ifood_ack_pendentes SET tentativas = tentativas + 1 "
+                                f"WHERE event_id IN ({ph})", *ids)
+                n = self.db.execute("DELETE FROM ifood_ack_pendentes WHERE tentativas >= ?", ACK_TENTATIVAS_MAX)
+            if n:
+                self.stats["ack_descartados"] += n
+                print(f"[ifood][ack] {n} evento(s) descartado(s) após {ACK_TENTATIVAS_MAX} tentativas")
+            return False
+        self.db.execute(f"DELETE FROM ifood_ack_pendentes WHERE event_id IN ({ph})", *ids)
+        self.stats["acks_enviados"] += len(ids)
+        self.stats["ack_lotes"] += 1
+        return True
+
+    def status(self) -> dict:
+        pendentes = self.db.execute("SELECT COUNT(*) AS n FROM ifood_ack_pendentes")[0]["n"]
+        agora_m, agora = time.monotonic(), time.time()
+        with self._lock:
+            stats = dict(self.stats)
+            shards = [dict(s) for s in self._shard_stats]
+            por_merchant = {
+                m: {**{k: v for k, v in st.items() if k not in ("suspenso_ate", "ultimo_evento", "ultimo_ok")},
+                    "suspenso_s": round(max(0.0, st["suspenso_ate"] - agora_m), 1),
+                    "seg_desde_evento": round(agora - st["ultimo_evento"], 1) if st["ultimo_evento"] else None,
+                    "seg_desde_ok": round(agora - st["ultimo_ok"], 1) if st["ultimo_ok"] else None}
+                for m, st in self._merchants.items()}
+        return {**stats, "ativo": self.ativo(), "merchants": self.merchant_ids,
+                "intervalo_s": self.intervalo, "ack_pendentes": pendentes,
+                "fila_entrega": self._entrega_q.qsize(), "shards": shards, "por_merchant": por_merchant,
+                "latencia": self.metricas.status()}
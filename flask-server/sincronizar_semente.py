@@ -0,0 +1,101 @@
+# ===========================
+# SEMENTE - SINCRONIZAÇÃO INCREMENTAL (manipule.py)
+# ===========================
+# O manipule.py (var=True) fazia DROP TABLE em cardapio/estoque/estoque_geral
+# e reinseria tudo, uma linha por statement: os ids mudavam (quebrando
+# opcoes.id_cardapio) e o banco ficava travado o tempo todo. Agora a semente é
+# comparada com a tabela e só a diferença é aplicada:
+#   - casamento : pela chave natural (item); nomes repetidos casam pela ordem
+#                 de ocorrência (k-ésimo 'X' da semente = k-ésimo 'X' por rowid)
+#   - diff      : só as colunas da semente que existem na tabela; JSON é
+#                 comparado já lido (formatação diferente não conta)
+#   - escrita   : executemany de INSERT/UPDATE/DELETE, numa transação que o
+#                 chamador abre (as três tabelas juntas); linha igual não é
+#                 tocada, então os triggers de versão do cardápio só disparam
+#                 se algo mudou de fato
+# Menu sem mudanças: um SELECT por tabela e nenhuma escrita.
+import json
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+def _igual(a: Any, b: Any) -> bool:
+    if a == b:
+        return True
+    if isinstance(a, str) and isinstance(b, str) and a.lstrip()[:1] in ("[", "{") and b.lstrip()[:1] in ("[", "{"):
+        try:
+            return json.loads(a) == json.loads(b)
+        except ValueError:
+            return False
+    return False
+
+def _colunas(db, tabela: str) -> List[str]:
+    return [c["name"] for c in db.execute(f"PRAGMA table_info({tabela})")]
+
+def sincronizar(db, tabela: str, linhas: Iterable[Dict[str, Any]], colunas: Sequence[str],
+                chave: str = "item", ddl: Optional[str] = None, apagar: bool = True,
+                dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Deixa `tabela` igual a `linhas` (dicts com as `colunas`) mexendo só no que
+    difere. Não abre transação: rode dentro de db.transacao(). Retorna o resumo.
+    """
+    if ddl:
+        db.execute(ddl)
+    existentes = _colunas(db, tabela)
+    colunas = [c for c in colunas if c in existentes]
+    if chave not in colunas:
+        raise ValueError(f"{tabela}: coluna-chave {chave!r} ausente")
+
+    por_chave: Dict[Any, List[dict]] = {}
+    for r in db.execute(f"SELECT rowid AS _rid, {', '.join(colunas)} FROM {tabela} ORDER BY rowid"):
+        por_chave.setdefault(r[chave], []).append(r)
+
+    inserir, atualizar, alteradas = [], [], Counter()
+    iguais = 0
+    vistos: Counter = Counter()
+    for linha in linhas:
+        k = linha.get(chave)
+        i = vistos[k]
+        vistos[k] += 1
+        candidatos = por_chave.get(k) or []
+        novo = [linha.get(c) for c in colunas]
+        if i >= len(candidatos):
+            inserir.append(novo)
+            continue
+        atual = candidatos[i]
+        mudou = [c for c, v in zip(colunas, novo) if not _igual(atual[c], v)]
+        if not mudou:
+            iguais += 1
+            continue
+        alteradas.update(mudou)
+        atualizar.append(novo + [atual["_rid"]])
+    apagar_rids = [r["_rid"] for k, rs in por_chave.items() for r in rs[vistos[k]:]] if apagar else []
+
+    if not dry_run:
+        if inserir:
+            db.executemany(f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+                           inserir)
+        if atualizar:
+            db.executemany(f"UPDATE {tabela} SET {', '.join(f'{c} = ?' for c in colunas)} WHERE rowid = ?",
+                           atualizar)
+        if apagar_rids:
+            db.executemany(f"DELETE FROM {tabela} WHERE rowid = ?", [(r,) for r in apagar_rids])
+
+    chave_de = {r["_rid"]: r[chave] for rs in por_chave.values() for r in rs}
+    return {"tabela": tabela, "inseridas": len(inserir), "atualizadas": len(atualizar),
+            "apagadas": len(apagar_rids), "iguais": iguais, "colunas_alteradas": dict(alteradas),
+            "novos": [n[colunas.index(chave)] for n in inserir][:20],
+            "removidos": [chave_de[r] for r in apagar_rids][:20], "dry_run": dry_run}
+
+def imprimir_resumo(resumos: List[Dict[str, Any]], segundos: float):
+    for r in resumos:
+        extra = ""
+        if r["colunas_alteradas"]:
+            extra += " | colunas: " + ", ".join(f"{c}={n}" for c, n in sorted(r["colunas_alteradas"].items()))
+        if r["novos"]:
+            extra += f" | novos: {r['novos']}"
+        if r["removidos"]:
+            extra += f" | removidos: {r['removidos']}"
+        print(f"[semente]{'[dry-run]' if r['dry_run'] else ''} {r['tabela']}: +{r['inseridas']} "
+              f"~{r['atualizadas']} -{r['apagadas']} ={r['iguais']}{extra}")
+    print(f"[semente] {sum(r['inseridas'] + r['atualizadas'] + r['apagadas'] for r in resumos)} mudança(s) "
+          f"em {segundos * 1000:.1f}ms")
@@ -0,0 +1,167 @@
+# ===========================
+# IFOOD - GERENCIADOR DE TOKEN (OAuth client_credentials)
+# ===========================
+# O lock protege só o estado em memória; a chamada HTTP de renovação roda fora
+# dele. Comportamento:
+#   - single-flight: várias threads que precisam renovar ao mesmo tempo
+#     esperam a MESMA requisição (uma só ida ao endpoint de token)
+#   - stale-while-revalidate: enquanto renova, quem chega recebe o token
+#     atual se ele ainda vale (não bloqueia rota/worker)
+#   - renovação proativa em background RENOVAR_ANTES_S antes de expirar; se
+#     o token vive menos que isso, renova na metade da vida, e nunca com
+#     menos de RENOVAR_MIN_S entre uma renovação proativa e a seguinte
+#   - invalidar(token) só descarta se o token recusado ainda é o atual
+#     (401 concorrentes não disparam uma renovação cada)
+import os
+import time
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional, Tuple
+
+RENOVAR_ANTES_S  = int(os.getenv("IFOOD_TOKEN_RENOVAR_ANTES", "300"))  # renovação proativa
+MARGEM_MINIMA_S  = int(os.getenv("IFOOD_TOKEN_MARGEM", "60"))          # abaixo disso não serve o token
+ESPERA_MAX_S     = float(os.getenv("IFOOD_TOKEN_ESPERA_MAX", "30"))
+RETRY_FALHA_S    = float(os.getenv("IFOOD_TOKEN_RETRY_FALHA", "15"))   # backoff da renovação em background
+RENOVAR_MIN_S    = float(os.getenv("IFOOD_TOKEN_RENOVAR_MIN", "30"))   # intervalo mínimo entre renovações proativas
+
+class GerenciadorToken:
+    def __init__(self, buscar_fn: Callable[[], Tuple[str, int]],
+                 renovar_antes: int = RENOVAR_ANTES_S, margem_minima: int = MARGEM_MINIMA_S):
+        """
+        buscar_fn() -> (access_token, expires_in em segundos). Faz o POST no
+        endpoint de token; é chamada sempre fora do lock.
+        """
+        self.buscar_fn = buscar_fn
+        self.renovar_antes = renovar_antes
+        self.margem_minima = margem_minima
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expira_em = 0.0
+        self._renovar_em = 0.0                   # quando a renovação proativa deve acontecer
+        self._voo: Optional[Future] = None       # renovação em andamento (single-flight)
+        self._acordar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        self.stats = {"renovacoes": 0, "falhas": 0, "coalescidos": 0, "servidos_stale": 0,
+                      "invalidacoes": 0, "invalidacoes_ignoradas": 0,
+                      "latencia_ultima_ms": None, "latencia_media_ms": None, "latencia_max_ms": 0.0,
+                      "ultimo_erro": None}
+
+    # ---------------- Leitura ----------------
+    def obter(self) -> Tuple[str, float]:
+        "Retorna (access_token, expires_at)."
+        agora = time.time()
+        with self._lock:
+            token, expira = self._token, self._expira_em
+            valido = token is not None and expira - agora > self.margem_minima
+            if valido:
+                if agora >= self._renovar_em:
+                    # SWR: serve o atual e dispara a renovação (se ninguém disparou)
+                    self.stats["servidos_stale"] += 1
+                    self._iniciar_voo_locked(em_background=True)
+                return token, expira
+            voo, lider = self._iniciar_voo_locked(em_background=False)
+
+        if lider:
+            self._executar_voo(voo)
+        return voo.result(ESPERA_MAX_S)
+
+    def _iniciar_voo_locked(self, em_background: bool) -> Tuple[Future, bool]:
+        "Com o lock: reaproveita a renovação em voo ou cria uma. Retorna (future, sou_lider)."
+        if self._voo is not None:
+            self.stats["coalescidos"] += 1
+            return self._voo, False
+        voo = self._voo = Future()
+        if em_background:
+            threading.Thread(target=self._executar_voo, args=(voo,), name="ifood-token", daemon=True).start()
+            return voo, False
+        return voo, True
+
+    def _executar_voo(self, voo: Future):
+        t0 = time.perf_counter()
+        try:
+            token, expires_in = self.buscar_fn()
+        except Exception as e:
+            with self._lock:
+                self._voo = None
+                self.stats["falhas"] += 1
+                self.stats["ultimo_erro"] = str(e)[:200]
+            voo.set_exception(e)
+            return
+        ms = (time.perf_counter() - t0) * 1000
+        agora = time.time()
+        expira = agora + expires_in
+        with self._lock:
+            self._token, self._expira_em = token, expira
+            self._renovar_em = self._ponto_renovacao(agora, expira)
+            self._voo = None
+            n = self.stats["renovacoes"] = self.stats["renovacoes"] + 1
+            media = self.stats["latencia_media_ms"] or 0.0
+            self.stats["latencia_media_ms"] = media + (ms - media) / n
+            self.stats["latencia_ultima_ms"] = ms
+            self.stats["latencia_max_ms"] = max(self.stats["latencia_max_ms"], ms)
+            self.stats["ultimo_erro"] = None
+        voo.set_result((token, expira))
+        self._acordar.set()  # reagenda a renovação proativa
+
+    def _ponto_renovacao(self, agora: float, expira: float) -> float:
+        """
+        RENOVAR_ANTES_S antes de expirar, mas não antes da metade da vida do
+        token (expires_in <= renovar_antes faria a thread girar renovando) nem
+        antes de RENOVAR_MIN_S a partir de agora.
+        """
+        return max(expira - self.renovar_antes, agora + (expira - agora) / 2, agora + RENOVAR_MIN_S)
+
+    # ---------------- Invalidação ----------------
+    def invalidar(self, token_rejeitado: Optional[str] = None):
+        """
+        Descarta o token após 401/403. Se `token_rejeitado` não é mais o atual
+        (outra thread já renovou), não faz nada.
+        """
+        with self._lock:
+            if token_rejeitado is not None and token_rejeitado != self._token:
+                self.stats["invalidacoes_ignoradas"] += 1
+                return
+            self.stats["invalidacoes"] += 1
+            self._token, self._expira_em, self._renovar_em = None, 0.0, 0.0
+
+    # ---------------- Renovação proativa ----------------
+    def iniciar(self):
+        "Sobe a thread que renova o token RENOVAR_ANTES_S antes de expirar."
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop_renovacao, name="ifood-token-refresh", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def _loop_renovacao(self):
+        while not self._parar.is_set():
+            with self._lock:
+                tem_token = self._token is not None
+                espera = self._renovar_em - time.time()
+            if not tem_token:
+                espera = None  # sem token ainda: espera a primeira obtenção
+            elif espera <= 0:
+                try:
+                    with self._lock:
+                        voo, lider = self._iniciar_voo_locked(em_background=False)
+                    if lider:
+                        self._executar_voo(voo)
+                    voo.result(ESPERA_MAX_S)
+                    continue
+                except Exception as e:
+                    print("[ifood][token] renovação proativa falhou:", e)
+                    espera = RETRY_FALHA_S
+            self._acordar.wait(espera)
+            self._acordar.clear()
+
+    def status(self) -> dict:
+        with self._lock:
+            restante = self._expira_em - time.time() if self._token else None
+            return {**self.stats, "tem_token": self._token is not None,
+                    "expira_em_s": None if restante is None else round(restante, 1),
+                    "renovando": self._voo is not None}